@@ -9,7 +9,9 @@ This module provides a FastAPI server to expose the chatbot functionality via RE
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import asyncio
 import logging
 import os
 import sys
@@ -20,13 +22,26 @@ from datetime import datetime
 # Add src directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from generation_executor import generation_executor, GenerationQueueFull
+from token_streaming import TokenStream, run_with_token_stream, format_sse
+from single_flight import SingleFlight
+
 # Import chatbot components with fallback
 try:
     from response_generators import generate_lightweight_response
     from data_loader import InformationFeed
-    from model_manager import load_model
+    from model_manager import load_model, start_background_load, get_model_readiness, get_model_info
+    from response_generators import warm_response_fragments
+    from semantic_cache import response_cache
+    from fragment_cache import response_fragments
+    from faq_index import faq_answers
 except ImportError as e:
     logger.warning(f"Failed to import ML components: {e}")
+    response_cache = None
+    response_fragments = None
+    faq_answers = None
+    def warm_response_fragments(info_feed):
+        pass
     # Define fallback functions
     def generate_lightweight_response(generator, user_input, info_feed):
         return f"ML components not available. Fallback response for: {user_input}"
@@ -37,6 +52,15 @@ except ImportError as e:
     
     def load_model(lightweight_mode=True):
         return None, None
+    
+    def start_background_load(lightweight_mode=True):
+        return None
+    
+    def get_model_readiness():
+        return {"status": "unavailable"}
+    
+    def get_model_info():
+        return {"status": "No model loaded"}
 
 # Set up logging with more detail
 logging.basicConfig(
@@ -66,27 +90,41 @@ info_feed = None
 model = None
 tokenizer = None
 
+# Concurrent first requests share one InformationFeed construction
+_component_inits = SingleFlight()
+
+def _create_info_feed():
+    """Build the InformationFeed (called through the single-flight guard)"""
+    if info_feed is not None:
+        return info_feed
+    try:
+        logger.info("Initializing InformationFeed...")
+        feed = InformationFeed()
+        logger.info("InformationFeed initialized successfully")
+        warm_response_fragments(feed)
+        return feed
+    except Exception as e:
+        logger.error(f"Error initializing InformationFeed: {str(e)}")
+        return "fallback"  # Mark as attempted
+
 def initialize_components():
     """Lazy initialization for serverless environments"""
     global info_feed, model, tokenizer
     
     if info_feed is None:
-        try:
-            logger.info("Initializing InformationFeed...")
-            info_feed = InformationFeed()
-            logger.info("InformationFeed initialized successfully")
-        except Exception as e:
-            logger.error(f"Error initializing InformationFeed: {str(e)}")
-            info_feed = "fallback"  # Mark as attempted
+        info_feed = _component_inits.do("info_feed", _create_info_feed)
     
     if model is None:
-        try:
-            logger.info("Loading model...")
+        # The model loads in a background thread; never block a request on it
+        readiness = get_model_readiness()
+        if readiness["status"] == "ready":
             model, tokenizer = load_model(lightweight_mode=True)
             logger.info("Model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading model: {str(e)}")
+        elif readiness["status"] in ("failed", "unavailable"):
+            logger.error(f"Error loading model: {readiness.get('error')}")
             model = "fallback"  # Mark as attempted
+        else:
+            start_background_load(lightweight_mode=True)
 
 def generate_fallback_response(user_input: str) -> str:
     """Generate ATL-specific fallback responses when ML components fail"""
@@ -116,6 +154,18 @@ class ChatResponse(BaseModel):
     session_id: Optional[str]
     metadata: Optional[Dict[str, Any]] = None
 
+async def initialize_components_async():
+    """Run initialize_components off the event loop (a cold InformationFeed build takes seconds)"""
+    await asyncio.get_running_loop().run_in_executor(None, initialize_components)
+
+@app.on_event("startup")
+async def startup_event():
+    """Start warming the model and build the InformationFeed as soon as the server boots"""
+    logger.info("Starting background model load...")
+    start_background_load(lightweight_mode=True)
+    # Built before serving (and before a preforking launcher forks), so requests find it ready
+    await initialize_components_async()
+
 @app.get("/")
 async def root():
     """Root endpoint to check if API is running"""
@@ -128,17 +178,20 @@ async def root():
 async def health_check():
     """Health check endpoint for Docker health checks"""
     try:
-        # Check if model is loaded
-        model_status = "ok" if model is not None else "error"
-        info_feed_status = "ok" if info_feed is not None else "error"
+        # Liveness: the server answers. Readiness: the model has finished loading.
+        readiness = get_model_readiness()
+        model_status = "ok" if readiness["status"] == "ready" else readiness["status"]
+        info_feed_status = "ok" if info_feed not in (None, "fallback") else "error"
         
         return {
             "status": "healthy",
+            "ready": readiness["status"] == "ready",
             "timestamp": str(datetime.now()),
             "services": {
                 "model": model_status,
                 "info_feed": info_feed_status
             },
+            "readiness": readiness,
             "message": "ATL Chatbot API is healthy"
         }
     except Exception as e:
@@ -149,6 +202,18 @@ async def health_check():
             "message": "ATL Chatbot API health check failed"
         }
 
+@app.get("/metrics")
+async def metrics():
+    """Generation queue metrics: occupancy, rejections, queue wait vs. compute time"""
+    return {
+        "timestamp": str(datetime.now()),
+        "generation": generation_executor.get_stats(),
+        "model": get_model_info(),
+        "response_cache": response_cache.get_stats() if response_cache is not None else None,
+        "response_fragments": response_fragments.get_stats() if response_fragments is not None else None,
+        "faq_answers": faq_answers.get_stats() if faq_answers is not None else None
+    }
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
@@ -165,13 +230,19 @@ async def chat(request: ChatRequest):
         logger.info(f"Received chat request with message: {request.message}")
         
         # Initialize components lazily
-        initialize_components()
+        await initialize_components_async()
         
         # Generate response with fallback for serverless
-        if model != "fallback" and info_feed != "fallback":
+        model_ready = model not in (None, "fallback")
+        if info_feed != "fallback":
+            if not model_ready:
+                # Model still loading (or failed): serve the rule-based path instead of waiting
+                logger.info("Model not ready - using rule-based response path")
             logger.debug("Calling generate_lightweight_response...")
-            response = generate_lightweight_response(
-                generator=model,
+            # Generation blocks for seconds; run it on the bounded worker pool, not the event loop
+            response = await generation_executor.run(
+                generate_lightweight_response,
+                generator=model if model_ready else None,
                 user_input=request.message,
                 info_feed=info_feed
             )
@@ -189,7 +260,8 @@ async def chat(request: ChatRequest):
             metadata={
                 "timestamp": str(datetime.now()),
                 "message_length": len(request.message),
-                "response_length": len(response)
+                "response_length": len(response),
+                "model_ready": model_ready
             }
         )
         
@@ -198,6 +270,13 @@ async def chat(request: ChatRequest):
         
         return chat_response
         
+    except GenerationQueueFull as e:
+        logger.warning(f"Rejecting chat request: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail="The chatbot is busy right now. Please try again in a moment.",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         tb = traceback.format_exc()
         logger.error(f"Error processing chat request: {str(e)}\n{tb}")
@@ -207,6 +286,71 @@ async def chat(request: ChatRequest):
             detail=f"An error occurred while processing your request: {str(e)}\n{tb}"
         )
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint (Server-Sent Events)
+    
+    Emits a `token` event for each chunk of text as the model generates it, then a
+    `done` trailer with the final response (terminology standardized, links appended)
+    and metadata. Rule-based answers produce no `token` events, only the trailer.
+    When the final response doesn't use the streamed text, a `discard` event precedes `done`.
+    """
+    logger.info(f"Received streaming chat request with message: {request.message}")
+    await initialize_components_async()
+    
+    model_ready = model not in (None, "fallback")
+    stream = TokenStream()
+    if info_feed != "fallback":
+        try:
+            generation = generation_executor.submit(
+                run_with_token_stream,
+                stream,
+                generate_lightweight_response,
+                generator=model if model_ready else None,
+                user_input=request.message,
+                info_feed=info_feed
+            )
+        except GenerationQueueFull as e:
+            logger.warning(f"Rejecting streaming chat request: {e}")
+            raise HTTPException(
+                status_code=429,
+                detail="The chatbot is busy right now. Please try again in a moment.",
+                headers={"Retry-After": "1"}
+            )
+    else:
+        generation = None
+    
+    async def events():
+        if generation is None:
+            response = generate_fallback_response(request.message)
+        else:
+            async for chunk in stream:
+                yield format_sse("token", {"text": chunk})
+            try:
+                response = await generation
+            except Exception as e:
+                logger.error(f"Error processing streaming chat request: {e}")
+                yield format_sse("error", {"detail": f"An error occurred while processing your request: {str(e)}"})
+                return
+            if not stream.kept_in(response):
+                # The final answer doesn't use the generated text (enhancement rejected, structured fallback)
+                yield format_sse("discard", {"streamed_chunks": stream.chunks})
+        
+        yield format_sse("done", {
+            "response": response,
+            "session_id": request.session_id,
+            "metadata": {
+                "timestamp": str(datetime.now()),
+                "message_length": len(request.message),
+                "response_length": len(response),
+                "model_ready": model_ready,
+                "streamed_chunks": stream.chunks
+            }
+        })
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 # For local development
 if __name__ == "__main__":
     import uvicorn
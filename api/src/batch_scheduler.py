@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Batch Scheduler Module for ATL Chatbot
+
+This module batches concurrent text-generation calls in front of the
+transformers pipeline returned by model_manager.load_model:
+- Collects requests for up to N milliseconds or B items
+- Runs them as one padded, batched generate call
+- Prompts that start with a cached static prefix (model_manager.PrefixCache) are batched
+  on top of the prefix's past-key-values, so only their suffixes are prefilled
+- Per-request stopping criteria (e.g. generation deadlines) stop only their own sequence
+- Scatters the results back to the waiting callers
+"""
+
+import os
+import time
+import queue
+import logging
+import weakref
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List
+
+logger = logging.getLogger("batch_scheduler")
+
+# How long the scheduler waits to fill a batch, and the largest batch it builds
+BATCH_WINDOW_MS = float(os.environ.get("GENERATION_BATCH_WINDOW_MS", "10"))
+MAX_BATCH_SIZE = int(os.environ.get("GENERATION_MAX_BATCH", "8"))
+
+# Wakes a scheduler thread whose generator has been garbage-collected, so it exits
+_STOP = object()
+
+# Live generators, held weakly so neither the fork hook nor this set keeps one alive
+_generators = weakref.WeakSet()
+
+def _restart_workers():
+    """Threads don't survive fork(); preforked server workers get a fresh scheduler thread per generator"""
+    for generator in list(_generators):
+        generator._start_worker()
+
+os.register_at_fork(after_in_child=_restart_workers)
+
+def _serve(generator_ref, requests: queue.Queue):
+    """
+    Scheduler thread body. It waits for requests holding only a weak reference, so an
+    unused generator can be collected; its finalizer then wakes the thread with _STOP.
+    """
+    while True:
+        request = requests.get()
+        generator = generator_ref()
+        if request is _STOP or generator is None:
+            return
+        generator._run(request)
+        del generator
+
+class _BatchRequest:
+    """A single prompt waiting to be batched"""
+
+    def __init__(self, prompt: str, generate_kwargs: Dict[str, Any], prefix=None):
+        self.prompt = prompt
+        # Stop conditions belong to this request only; they are applied per sequence, not grouped on
+        self.stopping_criteria = list(generate_kwargs.pop("stopping_criteria", None) or [])
+        self.generate_kwargs = generate_kwargs
+        # (prompt token ids, prefix token count, prefix past_key_values) from PrefixCache.match
+        self.prefix = prefix
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.group_key = self._make_group_key(generate_kwargs, prefix)
+
+    @staticmethod
+    def _make_group_key(generate_kwargs, prefix):
+        """Requests can only share a generate call if their generation settings (and cached prefix) match"""
+        if generate_kwargs.get("streamer") is not None:
+            # Streamers follow a single sequence
+            return object()
+        try:
+            key = (tuple(sorted(generate_kwargs.items())), id(prefix[2]) if prefix is not None else None)
+            hash(key)
+            return key
+        except TypeError:
+            # Other unhashable settings always run on their own
+            return object()
+
+class _PerSequenceStopping:
+    """
+    Logits processor that gives each row of a batched generate call its own stopping
+    criteria: once a row's criteria fire, that row can only produce EOS, which finishes
+    it while the rest of the batch keeps generating.
+    """
+
+    def __init__(self, criteria_per_request: List[list], eos_token_id: int):
+        self.criteria = criteria_per_request
+        self.eos_token_id = eos_token_id
+        self.stopped = [False] * len(criteria_per_request)
+
+    def __call__(self, input_ids, scores):
+        # num_return_sequences > 1 gives each request several consecutive rows
+        rows_per_request = max(1, input_ids.shape[0] // len(self.criteria))
+        for row in range(input_ids.shape[0]):
+            request = min(row // rows_per_request, len(self.criteria) - 1)
+            if not self.stopped[request] and any(
+                    bool(criterion(input_ids[row:row + 1], scores[row:row + 1])) for criterion in self.criteria[request]):
+                self.stopped[request] = True
+            if self.stopped[request]:
+                scores[row, :] = float("-inf")
+                scores[row, self.eos_token_id] = 0.0
+        return scores
+
+class MicroBatchingGenerator:
+    """
+    Drop-in replacement for a text-generation pipeline that batches concurrent calls.
+
+    Single-prompt calls block the calling thread until their batch has run, so callers
+    (e.g. the generation executor's worker threads) see the same interface as the pipeline.
+    """
+
+    def __init__(self, generator, window_ms: float = None, max_batch_size: int = None, prefix_cache=None):
+        self.generator = generator
+        self.tokenizer = generator.tokenizer
+        self.model = generator.model
+        self.prefix_cache = prefix_cache
+        self.window = (BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.max_batch_size = max(1, max_batch_size or MAX_BATCH_SIZE)
+
+        # Batched decoder-only generation needs a pad token and left padding
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.tokenizer.padding_side = "left"
+
+        self._stats = {"requests": 0, "batches": 0, "batched_requests": 0, "largest_batch": 0, "prefix_requests": 0}
+        self._start_worker()
+        _generators.add(self)
+
+    def _start_worker(self):
+        """Create the request queue and start the scheduler thread"""
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=_serve, args=(weakref.ref(self), self._queue), name="micro-batcher", daemon=True)
+        self._worker.start()
+        weakref.finalize(self, self._queue.put, _STOP)
+
+    def __call__(self, text_inputs, **generate_kwargs):
+        """Generate for a prompt with the same arguments and return value as the pipeline"""
+        if not isinstance(text_inputs, str):
+            # Callers that already batch go straight to the pipeline
+            return self.generator(text_inputs, **generate_kwargs)
+
+        prefix = None
+        if self.prefix_cache is not None and generate_kwargs.get("num_return_sequences", 1) == 1:
+            prefix = self.prefix_cache.match(text_inputs)
+        request = _BatchRequest(text_inputs, generate_kwargs, prefix)
+        self._queue.put(request)
+        return request.future.result()
+
+    def _collect_batch(self, first: _BatchRequest) -> List[_BatchRequest]:
+        """Starting from the first waiting request, gather more until the window closes or the batch is full"""
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Window closed: still take anything that is already waiting
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, first: _BatchRequest):
+        """Collect a batch behind the first waiting request and run it"""
+        batch = self._collect_batch(first)
+        groups: Dict[Any, List[_BatchRequest]] = {}
+        for request in batch:
+            groups.setdefault(request.group_key, []).append(request)
+        for group in groups.values():
+            self._execute(group)
+
+    def _execute(self, group: List[_BatchRequest]):
+        """Run one generate call for a group of compatible requests and scatter the results"""
+        generate_kwargs = dict(group[0].generate_kwargs, **self._stopping_kwargs(group))
+        try:
+            if group[0].prefix is not None:
+                outputs = self._generate_with_prefix(group, generate_kwargs)
+            elif len(group) == 1:
+                outputs = [self.generator(group[0].prompt, **generate_kwargs)]
+            else:
+                outputs = self.generator(
+                    [request.prompt for request in group],
+                    batch_size=len(group),
+                    **generate_kwargs
+                )
+        except Exception as e:
+            logger.error(f"Batched generation failed for {len(group)} request(s): {e}")
+            for request in group:
+                request.future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats["requests"] += len(group)
+            self._stats["batches"] += 1
+            if len(group) > 1:
+                self._stats["batched_requests"] += len(group)
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(group))
+            if group[0].prefix is not None:
+                self._stats["prefix_requests"] += len(group)
+
+        for request, output in zip(group, outputs):
+            request.future.set_result(output)
+
+    def _stopping_kwargs(self, group: List[_BatchRequest]) -> Dict[str, Any]:
+        """generate() arguments that apply each request's stopping criteria to its own sequence"""
+        if not any(request.stopping_criteria for request in group):
+            return {}
+        if len(group) == 1:
+            return {"stopping_criteria": group[0].stopping_criteria}
+        eos_token_id = group[0].generate_kwargs.get("eos_token_id", self.tokenizer.eos_token_id)
+        if isinstance(eos_token_id, (list, tuple)):
+            eos_token_id = eos_token_id[0] if eos_token_id else None
+        if eos_token_id is None:
+            # No EOS to end a single row with: the whole batch stops at the first criterion that fires
+            return {"stopping_criteria": [c for request in group for c in request.stopping_criteria]}
+        return {"logits_processor": [_PerSequenceStopping([request.stopping_criteria for request in group], eos_token_id)]}
+
+    def _generate_with_prefix(self, group: List[_BatchRequest], generate_kwargs: Dict[str, Any]) -> List[Any]:
+        """
+        One generate call for prompts sharing a cached prefix: the prefix's past-key-values are
+        shared by every row and only the suffixes are prefilled. Rows are laid out as
+        prefix + padding + suffix; the attention mask hides the padding and the model derives
+        position ids from the mask, so each suffix continues right after the prefix.
+        """
+        import torch
+        prompt_ids, prefix_length, past_key_values = group[0].prefix
+        suffixes = [request.prefix[0][prefix_length:] for request in group]
+        longest = max(len(suffix) for suffix in suffixes)
+        rows, masks = [], []
+        for suffix in suffixes:
+            padding = longest - len(suffix)
+            rows.append(prompt_ids[:prefix_length] + [self.tokenizer.pad_token_id] * padding + suffix)
+            masks.append([1] * prefix_length + [0] * padding + [1] * len(suffix))
+
+        device = self.model.device
+        input_ids = torch.tensor(rows, device=device)
+        batch_past = tuple(
+            (key.expand(len(group), -1, -1, -1), value.expand(len(group), -1, -1, -1)) for key, value in past_key_values
+        )
+        generate_kwargs = {k: v for k, v in generate_kwargs.items() if k not in ("num_return_sequences", "batch_size")}
+        with torch.inference_mode():
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.tensor(masks, device=device),
+                past_key_values=batch_past,
+                **generate_kwargs
+            )
+        completions = self.tokenizer.batch_decode(output_ids[:, input_ids.shape[1]:], skip_special_tokens=True)
+        # Same shape as the pipeline's output for a single prompt
+        return [[{"generated_text": request.prompt + completion}] for request, completion in zip(group, completions)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batching counters: requests, batches run and the average batch size"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["window_ms"] = self.window * 1000
+        stats["max_batch_size"] = self.max_batch_size
+        stats["average_batch_size"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0
+        return stats
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Fragment Cache Module for ATL Chatbot
+
+This module memoizes response generators whose output depends only on the loaded data:
+- Fragments are keyed by generator name, the InformationFeed data version and language
+- `data_fragment` wraps a generator(info_feed, user_input) so repeat calls are dict lookups
+- Cleared by InformationFeed.reload_all_data, and warmed once at startup
+- Hit/miss metrics
+"""
+
+import time
+import logging
+import threading
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from text_processors import detect_language
+
+logger = logging.getLogger("fragment_cache")
+
+class ResponseFragmentCache:
+    """Formatted responses keyed by (generator, data version, language)"""
+
+    def __init__(self):
+        self._fragments: Dict[Tuple[Hashable, ...], str] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "build_seconds": 0.0}
+
+    def get_or_build(self, key: Tuple[Hashable, ...], build: Callable[[], str]) -> str:
+        """Return the cached fragment for `key`, building and storing it on a miss"""
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._stats["hits"] += 1
+                return fragment
+            self._stats["misses"] += 1
+        # Build outside the lock; concurrent misses on a cold key just build twice
+        start = time.perf_counter()
+        fragment = build()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats["build_seconds"] += elapsed
+            if fragment:
+                self._fragments[key] = fragment
+        return fragment
+
+    def clear(self):
+        """Drop every fragment (the data they were built from changed)"""
+        with self._lock:
+            self._fragments.clear()
+            self._stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate, size and time spent building fragments"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._fragments)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["build_seconds"] = round(stats["build_seconds"], 3)
+        return stats
+
+# Global cache shared by all InformationFeed instances (keys carry the feed's data version)
+response_fragments = ResponseFragmentCache()
+
+def data_fragment(generator):
+    """
+    Memoize generator(info_feed, user_input) for responses that only depend on info_feed data.
+    user_input only picks the language, so it is reduced to that for the key.
+    """
+    @wraps(generator)
+    def wrapper(info_feed, user_input):
+        version = getattr(info_feed, "data_version", None)
+        if version is None:
+            return generator(info_feed, user_input)
+        key = (generator.__name__, version, detect_language(user_input))
+        return response_fragments.get_or_build(key, lambda: generator(info_feed, user_input))
+    wrapper.uncached = generator
+    return wrapper
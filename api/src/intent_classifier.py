@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Intent Classifier Module for ATL Chatbot
+
+This module routes questions with a small trained model instead of keyword counts:
+- TF-IDF over words + multinomial logistic regression, trained offline (scikit-learn)
+  on the FAQ questions of website_conversations.json and website_info.js, labelled
+  with their subtopic and mapped to the router's intents
+- Exported to a NumPy .npz file (vocabulary, idf, weights) with no pickled objects
+- Inference is a few dict lookups and one small matrix-vector product in NumPy
+  (tens of microseconds); scikit-learn is only needed to train
+- Loaded once through the model registry as "intent_classifier"
+- Confidence scores gate both the routing and whether model generation is used
+
+Usage:
+    python src/intent_classifier.py train      # fit on the FAQ data and write the .npz
+    python src/intent_classifier.py evaluate   # cross-validated accuracy vs. confidence
+    python src/intent_classifier.py predict "how much is the xr space"
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Add src to path for imports when run as a script
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_registry import model_registry
+from query_parser import parse_query
+
+logger = logging.getLogger("intent_classifier")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTENT_CLASSIFIER_PATH = os.environ.get(
+    "INTENT_CLASSIFIER_PATH", os.path.join(BASE_DIR, "data", "models", "intent_classifier.npz")
+)
+
+# Classifier intents are used when their probability reaches this; below it, keyword scoring decides
+INTENT_CONFIDENCE_THRESHOLD = float(os.environ.get("INTENT_CONFIDENCE_THRESHOLD", "0.6"))
+# At this confidence the FAQ answer is served as is, without model enhancement (1 = always use the model)
+INTENT_SKIP_MODEL_CONFIDENCE = float(os.environ.get("INTENT_SKIP_MODEL_CONFIDENCE", "0.8"))
+
+# Inverse regularisation strength of the logistic regression
+INTENT_CLASSIFIER_C = 30.0
+
+# FAQ subtopics (data_loader) -> router intents (response_generators.INTENT_KEYWORDS)
+SUBTOPIC_INTENTS = {
+    "facilities": "facility",
+    "pricing": "pricing",
+    "equipment": "equipment",
+    "software": "software",
+    "staff": "staff",
+    "internships": "internship",
+    "events": "event",
+    "policies": "policy",
+    "tools": "tool",
+    "general": "general",
+}
+
+# scikit-learn's default token pattern, so training and inference split text the same way
+_TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+class IntentClassifier:
+    """TF-IDF (sublinear tf, l2-normalised) + multinomial logistic regression, evaluated with NumPy"""
+
+    def __init__(self, terms: Sequence[str], idf: np.ndarray, coef: np.ndarray,
+                 intercept: np.ndarray, classes: Sequence[str]):
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.classes = [str(label) for label in classes]
+
+    @classmethod
+    def from_sklearn(cls, vectorizer, model) -> "IntentClassifier":
+        terms = vectorizer.get_feature_names_out()
+        return cls(terms, vectorizer.idf_, model.coef_, model.intercept_, model.classes_)
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["terms"].tolist(), data["idf"], data["coef"], data["intercept"], data["classes"].tolist())
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        np.savez_compressed(path, terms=np.array(terms), idf=self.idf, coef=self.coef,
+                            intercept=self.intercept, classes=np.array(self.classes))
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        """Class probabilities for `text` (in self.classes order)"""
+        counts: Dict[int, int] = {}
+        for token in _TOKEN_PATTERN.findall(text.lower()):
+            column = self.vocabulary.get(token)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        scores = self.intercept.copy()
+        if counts:
+            columns = np.fromiter(counts, dtype=np.int64, count=len(counts))
+            weights = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))) * self.idf[columns]
+            scores += self.coef[:, columns] @ (weights / np.linalg.norm(weights))
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Most likely intent and its probability"""
+        probabilities = self.predict_proba(text)
+        best = int(probabilities.argmax())
+        return self.classes[best], float(probabilities[best])
+
+def load_intent_classifier() -> IntentClassifier:
+    """Trained classifier from INTENT_CLASSIFIER_PATH (raises if it has not been trained)"""
+    if not os.path.exists(INTENT_CLASSIFIER_PATH):
+        raise FileNotFoundError(f"No intent classifier at {INTENT_CLASSIFIER_PATH}; run intent_classifier.py train")
+    return IntentClassifier.load(INTENT_CLASSIFIER_PATH)
+
+model_registry.register("intent_classifier", load_intent_classifier)
+
+if not os.path.exists(INTENT_CLASSIFIER_PATH):
+    # e.g. ml-api, whose BASE_DIR is the repository root: routing differs from the API's, so say so up front
+    logger.warning(f"No intent classifier at {INTENT_CLASSIFIER_PATH}; routing on keywords only "
+                   f"(set INTENT_CLASSIFIER_PATH, or run intent_classifier.py train)")
+
+_classifier_unavailable = False
+
+def classify_intent(query) -> Tuple[Optional[str], float]:
+    """(intent, confidence) for a question string or ParsedQuery; (None, 0.0) without a trained classifier"""
+    global _classifier_unavailable
+    if _classifier_unavailable:
+        return None, 0.0
+    try:
+        with model_registry.use("intent_classifier") as classifier:
+            return classifier.predict(parse_query(query).lower)
+    except Exception as e:
+        # Missing or unreadable model file: keep routing on keywords without retrying every request
+        logger.warning(f"Intent classifier unavailable, using keyword routing: {e}")
+        _classifier_unavailable = True
+        return None, 0.0
+
+def training_examples(info_feed=None) -> Tuple[List[str], List[str]]:
+    """FAQ questions and their intents, from the subtopics InformationFeed files them under"""
+    if info_feed is None:
+        from data_loader import InformationFeed
+        info_feed = InformationFeed()
+    # The router has a booking path but the FAQ has no booking subtopic: split those questions out
+    # (at word starts, so "booked" counts and "preservation" does not)
+    from response_generators import INTENT_KEYWORDS
+    booking = re.compile(r"\b(?:" + "|".join(map(re.escape, INTENT_KEYWORDS["booking"])) + ")", re.IGNORECASE)
+    questions, intents = [], []
+    for subtopic, items in info_feed.subtopics.items():
+        for item in items:
+            question = item["conversations"][0]["content"]
+            questions.append(question)
+            intents.append("booking" if booking.search(question) else SUBTOPIC_INTENTS.get(subtopic, "general"))
+    return questions, intents
+
+def fit_intent_classifier(questions: Sequence[str], intents: Sequence[str], c: float = INTENT_CLASSIFIER_C) -> IntentClassifier:
+    """Fit TF-IDF + logistic regression with scikit-learn and export it"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    vectorizer = TfidfVectorizer(sublinear_tf=True, token_pattern=_TOKEN_PATTERN.pattern)
+    model = LogisticRegression(C=c, max_iter=2000)
+    model.fit(vectorizer.fit_transform(questions), intents)
+    return IntentClassifier.from_sklearn(vectorizer, model)
+
+def evaluate(questions: Sequence[str], intents: Sequence[str], folds: int = 5, c: float = INTENT_CLASSIFIER_C):
+    """Cross-validated accuracy and coverage at several confidence thresholds"""
+    from sklearn.model_selection import KFold
+    results = []
+    for train, test in KFold(folds, shuffle=True, random_state=0).split(questions):
+        classifier = fit_intent_classifier([questions[i] for i in train], [intents[i] for i in train], c)
+        results.extend((classifier.predict(questions[i]), intents[i]) for i in test)
+    print(f"{'threshold':>10}{'coverage':>10}{'accuracy':>10}")
+    for threshold in (0.0, 0.4, 0.5, INTENT_CONFIDENCE_THRESHOLD, 0.7, INTENT_SKIP_MODEL_CONFIDENCE):
+        kept = [predicted == actual for (predicted, confidence), actual in results if confidence >= threshold]
+        accuracy = sum(kept) / len(kept) if kept else 0.0
+        print(f"{threshold:>10.2f}{len(kept) / len(results):>10.2f}{accuracy:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent classifier for ATL Chatbot routing")
+    parser.add_argument("command", choices=["train", "evaluate", "predict"], help="Action to run")
+    parser.add_argument("text", nargs="?", help="Question to classify (predict)")
+    parser.add_argument("--c", type=float, default=INTENT_CLASSIFIER_C, help="Inverse regularisation strength")
+    args = parser.parse_args()
+
+    if args.command == "predict":
+        classifier = load_intent_classifier()
+        start = time.perf_counter()
+        intent, confidence = classifier.predict(args.text or "")
+        print(f"{intent} ({confidence:.2f}) in {(time.perf_counter() - start) * 1e6:.0f} us")
+        return
+
+    questions, intents = training_examples()
+    if args.command == "evaluate":
+        evaluate(questions, intents, c=args.c)
+    else:
+        classifier = fit_intent_classifier(questions, intents, args.c)
+        classifier.save(INTENT_CLASSIFIER_PATH)
+        print(f"Trained on {len(questions)} questions ({len(classifier.classes)} intents, "
+              f"{len(classifier.vocabulary)} terms) -> {INTENT_CLASSIFIER_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Near Duplicates Module for ATL Chatbot
+
+This module groups near-duplicate texts (word-set Jaccard similarity) without
+rebuilding and comparing Python sets pair by pair:
+- Each text is tokenized and its words mapped to integer ids once
+- Texts are rows of a sparse binary text x word matrix, kept in NumPy arrays in both
+  row (CSR) and column (per-word posting list) layouts
+- Multiplying the matrix by one text's row gives its intersection with every other
+  text at once, and Jaccard = intersection / (|a| + |b| - intersection)
+- Large inputs use MinHash signatures with LSH banding to find candidate pairs,
+  which are then checked exactly (a pair can be missed, never wrongly grouped)
+- The MinHash helpers (minhash_signatures, lsh_band_keys) are shared with faq_index
+"""
+
+import logging
+from typing import List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("near_duplicates")
+
+# Below this many texts, comparing the (once-built) word sets directly is cheaper
+VECTORIZE_MIN_TEXTS = 32
+# Above this many texts, candidates come from MinHash/LSH instead of exact products
+MINHASH_MIN_TEXTS = 50000
+
+# MinHash signature length and LSH banding (32 bands of 4 rows: ~99% recall at Jaccard 0.6)
+MINHASH_PERMUTATIONS = 128
+MINHASH_BAND_ROWS = 4
+# Universal hashing (a * x + b) mod p; with p < 2^32 the products fit in 64 bits
+_MERSENNE_PRIME = (1 << 31) - 1
+# Fixed hash functions, so signatures from separate calls are comparable
+_rng = np.random.RandomState(0)
+_HASH_A = _rng.randint(1, _MERSENNE_PRIME, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+_HASH_B = _rng.randint(0, _MERSENNE_PRIME, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+_BAND_MIX = _rng.randint(1, _MERSENNE_PRIME, size=MINHASH_BAND_ROWS).astype(np.uint64)
+
+def _token_ids(texts: Sequence[str]):
+    """CSR layout of the text x word matrix: (indptr, word ids, vocabulary size)"""
+    vocabulary = {}
+    ids = []
+    indptr = [0]
+    for text in texts:
+        row = {vocabulary.setdefault(word, len(vocabulary)) for word in text.lower().split()}
+        ids.extend(sorted(row))
+        indptr.append(len(ids))
+    return np.array(indptr, dtype=np.int64), np.array(ids, dtype=np.int64), len(vocabulary)
+
+def _greedy_groups(n: int, neighbors) -> List[List[int]]:
+    """
+    Each text not yet grouped starts a group and takes every later ungrouped text
+    in neighbors(i, used) (ascending indices above i).
+    """
+    used = np.zeros(n, dtype=bool)
+    groups = []
+    for i in range(n):
+        if used[i]:
+            continue
+        members = [i]
+        members.extend(int(j) for j in neighbors(i, used))
+        used[members] = True
+        groups.append(members)
+    return groups
+
+def _set_neighbors(texts: Sequence[str], threshold: float):
+    sets = [set(text.lower().split()) for text in texts]
+
+    def neighbors(i, used):
+        words = sets[i]
+        return [j for j in range(i + 1, len(sets)) if not used[j] and (words | sets[j])
+                and len(words & sets[j]) / len(words | sets[j]) > threshold]
+    return neighbors
+
+def _matrix_neighbors(indptr, ids, width: int, threshold: float):
+    n = len(indptr) - 1
+    sizes = np.diff(indptr)
+    # Column layout: the texts containing each word, in text order
+    rows = np.repeat(np.arange(n), sizes)
+    order = np.argsort(ids, kind="stable")
+    postings = rows[order]
+    posting_ptr = np.concatenate(([0], np.cumsum(np.bincount(ids, minlength=width))))
+
+    def neighbors(i, used):
+        words = ids[indptr[i]:indptr[i + 1]]
+        # Row i of matrix @ matrix.T: one count per text sharing each of text i's words
+        hits = np.concatenate([postings[posting_ptr[w]:posting_ptr[w + 1]] for w in words]) if len(words) else postings[:0]
+        intersection = np.bincount(hits, minlength=n)[i + 1:]
+        union = sizes[i] + sizes[i + 1:] - intersection
+        with np.errstate(divide="ignore", invalid="ignore"):
+            similar = (union > 0) & (intersection / union > threshold) & ~used[i + 1:]
+        return np.flatnonzero(similar) + i + 1
+    return neighbors
+
+def minhash_signatures(indptr, ids) -> np.ndarray:
+    """
+    MinHash signature of each CSR row (text): per hash function, the minimum hash over
+    its word ids. Empty rows get all-max signatures.
+    """
+    n = len(indptr) - 1
+    nonempty = np.diff(indptr) > 0
+    signatures = np.full((n, MINHASH_PERMUTATIONS), np.iinfo(np.uint64).max, dtype=np.uint64)
+    if len(ids):
+        hashes = (np.outer(np.asarray(ids, dtype=np.uint64), _HASH_A) + _HASH_B) % np.uint64(_MERSENNE_PRIME)
+        signatures[nonempty] = np.minimum.reduceat(hashes, np.asarray(indptr[:-1])[nonempty], axis=0)
+    return signatures
+
+def lsh_band_keys(signatures: np.ndarray) -> np.ndarray:
+    """One bucket key per (text, band); texts agreeing on every row of a band share its key"""
+    bands = signatures.reshape(len(signatures), -1, MINHASH_BAND_ROWS)
+    return (bands * _BAND_MIX).sum(axis=2)
+
+def _minhash_neighbors(indptr, ids, threshold: float):
+    n = len(indptr) - 1
+    nonempty = np.diff(indptr) > 0
+    band_keys = lsh_band_keys(minhash_signatures(indptr, ids))
+
+    bands = []
+    for keys in band_keys.T:
+        _, labels = np.unique(keys, return_inverse=True)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(labels.max() + 2))
+        bands.append((labels, order, bounds))
+
+    word_sets = [set(ids[indptr[i]:indptr[i + 1]].tolist()) for i in range(n)]
+
+    def neighbors(i, used):
+        if not nonempty[i]:
+            return []
+        candidates = np.unique(np.concatenate([order[bounds[labels[i]]:bounds[labels[i] + 1]]
+                                               for labels, order, bounds in bands]))
+        candidates = candidates[candidates > i]
+        words = word_sets[i]
+        return [j for j in candidates[~used[candidates]].tolist()
+                if len(words & word_sets[j]) / len(words | word_sets[j]) > threshold]
+    return neighbors
+
+def group_near_duplicates(texts: Sequence[str], threshold: float = 0.6) -> List[List[int]]:
+    """
+    Greedy grouping in input order: each text not yet grouped starts a group and takes
+    every later ungrouped text whose word-set Jaccard similarity is above `threshold`.
+    Returns the groups as lists of indices, each in ascending order.
+    """
+    n = len(texts)
+    if n < VECTORIZE_MIN_TEXTS:
+        return _greedy_groups(n, _set_neighbors(texts, threshold))
+
+    indptr, ids, width = _token_ids(texts)
+    if n > MINHASH_MIN_TEXTS:
+        return _greedy_groups(n, _minhash_neighbors(indptr, ids, threshold))
+    return _greedy_groups(n, _matrix_neighbors(indptr, ids, width, threshold))
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ONNX Backend Module for ATL Chatbot
+
+This module runs text generation through ONNX Runtime instead of PyTorch:
+- One-time export of the causal LM to ONNX with past-key-value inputs and outputs
+- CPU execution provider with full graph optimizations
+- A generator with the same call signature and output as the text-generation pipeline
+- Cached past-key-values for static prompt prefixes
+"""
+
+import os
+import json
+import time
+import inspect
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ort = None
+    ONNXRUNTIME_AVAILABLE = False
+
+logger = logging.getLogger("onnx_backend")
+
+# Intra-op threads for ONNX Runtime (0 lets ONNX Runtime decide)
+ONNX_THREADS = int(os.environ.get("ONNX_THREADS", "0"))
+
+# Used when a request sets neither max_new_tokens nor max_length
+DEFAULT_MAX_NEW_TOKENS = int(os.environ.get("GENERATION_DEFAULT_MAX_NEW_TOKENS", "256"))
+
+MODEL_FILE = "model.onnx"
+EXPORT_CONFIG_FILE = "onnx_export.json"
+
+def export_onnx_model(model_name: str, output_dir: str, opset: int = 14):
+    """
+    Export a causal LM and its tokenizer to output_dir.
+
+    The graph takes input_ids, attention_mask, position_ids and past_key_values.{i}.key/value
+    and returns logits and present.{i}.key/value. This is the only step that needs PyTorch.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    start = time.time()
+    model = AutoModelForCausalLM.from_pretrained(model_name).eval()
+    config = model.config
+    num_layers = config.num_hidden_layers
+    num_heads = config.num_attention_heads
+    head_dim = config.hidden_size // num_heads
+
+    class _DecoderWithPast(torch.nn.Module):
+        """Flattens the tuple cache into separate graph inputs and outputs"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, position_ids, *past):
+            past_key_values = tuple((past[2 * i], past[2 * i + 1]) for i in range(num_layers))
+            outputs = self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=past_key_values,
+                use_cache=True,
+                return_dict=True
+            )
+            present = outputs.past_key_values
+            if hasattr(present, "to_legacy_cache"):
+                present = present.to_legacy_cache()
+            return (outputs.logits,) + tuple(t for key_value in present for t in key_value)
+
+    past_names = [f"past_key_values.{i}.{kind}" for i in range(num_layers) for kind in ("key", "value")]
+    present_names = [f"present.{i}.{kind}" for i in range(num_layers) for kind in ("key", "value")]
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "total_sequence"},
+        "position_ids": {0: "batch", 1: "sequence"},
+        "logits": {0: "batch", 1: "sequence"}
+    }
+    dynamic_axes.update({name: {0: "batch", 2: "past_sequence"} for name in past_names})
+    dynamic_axes.update({name: {0: "batch", 2: "total_sequence"} for name in present_names})
+
+    # Trace with a non-empty past so the cache concatenation stays dynamic
+    past_length, sequence_length = 2, 3
+    dummy_inputs = (
+        torch.ones((1, sequence_length), dtype=torch.long),
+        torch.ones((1, past_length + sequence_length), dtype=torch.long),
+        torch.arange(past_length, past_length + sequence_length).unsqueeze(0),
+        *[torch.zeros((1, num_heads, past_length, head_dim)) for _ in past_names]
+    )
+
+    os.makedirs(output_dir, exist_ok=True)
+    temp_path = os.path.join(output_dir, MODEL_FILE + ".tmp")
+    # Newer torch versions default to the dynamo exporter; the tracing exporter handles the tuple cache
+    export_kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            _DecoderWithPast(model),
+            dummy_inputs,
+            temp_path,
+            input_names=["input_ids", "attention_mask", "position_ids"] + past_names,
+            output_names=["logits"] + present_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            **export_kwargs
+        )
+
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+    with open(os.path.join(output_dir, EXPORT_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "num_layers": num_layers,
+            "num_heads": num_heads,
+            "head_dim": head_dim,
+            "max_positions": getattr(config, "max_position_embeddings", 1024),
+            "do_sample": bool(getattr(model.generation_config, "do_sample", False))
+        }, f, indent=2)
+    os.replace(temp_path, os.path.join(output_dir, MODEL_FILE))
+    logger.info(f"Exported {model_name} to ONNX in {time.time() - start:.1f}s")
+
+class OnnxTokenizer:
+    """
+    Minimal tokenizer over the exported tokenizer.json, using the `tokenizers` library
+    directly because importing transformers also imports PyTorch
+    """
+
+    def __init__(self, model_dir: str):
+        from tokenizers import Tokenizer
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        special_tokens = {}
+        special_tokens_path = os.path.join(model_dir, "special_tokens_map.json")
+        if os.path.exists(special_tokens_path):
+            with open(special_tokens_path, "r", encoding="utf-8") as f:
+                special_tokens = json.load(f)
+        for name in ("eos", "bos", "pad", "unk"):
+            token = special_tokens.get(f"{name}_token")
+            if isinstance(token, dict):
+                token = token.get("content")
+            setattr(self, f"{name}_token", token)
+            setattr(self, f"{name}_token_id", self._tokenizer.token_to_id(token) if token else None)
+
+    def __call__(self, text: str, add_special_tokens: bool = True) -> Dict[str, List[int]]:
+        return {"input_ids": self._tokenizer.encode(text, add_special_tokens=add_special_tokens).ids}
+
+    def decode(self, token_ids, skip_special_tokens: bool = False) -> str:
+        return self._tokenizer.decode(list(token_ids), skip_special_tokens=skip_special_tokens)
+
+class OnnxGenerator:
+    """
+    Text generator backed by an ONNX Runtime session, called like the text-generation
+    pipeline: generator(prompt, **generate_kwargs) -> [{'generated_text': ...}]
+    """
+
+    device = "cpu"
+    backend = "onnxruntime"
+
+    def __init__(self, model_dir: str, prefixes: List[str] = None):
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("onnxruntime is not installed (pip install -r requirements-onnx.txt)")
+
+        with open(os.path.join(model_dir, EXPORT_CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.num_layers = self.config["num_layers"]
+        self.max_positions = self.config["max_positions"]
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        # Response generators check generator.model before using the model path
+        self.model = self.session
+        self.tokenizer = OnnxTokenizer(model_dir)
+
+        self._past_names = [f"past_key_values.{i}.{kind}" for i in range(self.num_layers) for kind in ("key", "value")]
+        self._empty_past = [
+            np.zeros((1, self.config["num_heads"], 0, self.config["head_dim"]), dtype=np.float32)
+            for _ in self._past_names
+        ]
+        self._prefixes = {}
+        for prefix in prefixes or []:
+            self.register_prefix(prefix)
+
+    def register_prefix(self, prefix: str):
+        """Precompute the past-key-values of a static prompt prefix"""
+        token_ids = self.tokenizer(prefix)["input_ids"]
+        _, past = self._forward(token_ids, self._empty_past, 0)
+        self._prefixes[prefix] = (token_ids, past)
+
+    def _forward(self, token_ids: List[int], past: List[np.ndarray], past_length: int):
+        """Run new tokens through the graph; returns the last position's logits and the new cache"""
+        total_length = past_length + len(token_ids)
+        feed = {
+            "input_ids": np.array([token_ids], dtype=np.int64),
+            "attention_mask": np.ones((1, total_length), dtype=np.int64),
+            "position_ids": np.arange(past_length, total_length, dtype=np.int64)[None, :]
+        }
+        feed.update(zip(self._past_names, past))
+        outputs = self.session.run(None, feed)
+        return outputs[0][0, -1], outputs[1:]
+
+    def __call__(self, text_inputs, num_return_sequences=1, **generate_kwargs):
+        if not isinstance(text_inputs, str):
+            return [self(text, num_return_sequences=num_return_sequences, **generate_kwargs) for text in text_inputs]
+        return [
+            {"generated_text": text_inputs + self.generate(text_inputs, **generate_kwargs)}
+            for _ in range(num_return_sequences)
+        ]
+
+    def generate(self, prompt: str, max_new_tokens: int = None, max_length: int = None, do_sample: bool = None,
+                 temperature: float = None, top_k: int = None, top_p: float = None, eos_token_id=None,
+                 logits_processor=None, stopping_criteria=None, streamer=None, **_unused) -> str:
+        """Generate a continuation of prompt and return only the new text"""
+        prompt_ids = self.tokenizer(prompt)["input_ids"]
+        if max_new_tokens is None:
+            max_new_tokens = max_length - len(prompt_ids) if max_length else DEFAULT_MAX_NEW_TOKENS
+        max_new_tokens = max(1, min(max_new_tokens, self.max_positions // 2))
+        if do_sample is None:
+            do_sample = self.config.get("do_sample", False)
+        eos_token_id = self.tokenizer.eos_token_id if eos_token_id is None else eos_token_id
+        eos_token_ids = set(eos_token_id) if isinstance(eos_token_id, (list, tuple)) else {eos_token_id}
+
+        # Start from a cached prefix when the prompt has one, and keep the most recent context
+        prefix = max((p for p in self._prefixes if prompt.startswith(p)), key=len, default=None)
+        budget = self.max_positions - max_new_tokens
+        token_ids, past, past_length = prompt_ids, self._empty_past, 0
+        if prefix is not None:
+            prefix_ids, prefix_past = self._prefixes[prefix]
+            if prompt_ids[:len(prefix_ids)] != prefix_ids:
+                prompt_ids = prefix_ids + self.tokenizer(prompt[len(prefix):], add_special_tokens=False)["input_ids"]
+            if len(prefix_ids) < len(prompt_ids) <= budget:
+                token_ids, past, past_length = prompt_ids[len(prefix_ids):], prefix_past, len(prefix_ids)
+        if past_length == 0:
+            prompt_ids = token_ids = prompt_ids[-budget:]
+
+        if streamer is not None:
+            streamer.put(np.array([prompt_ids]))
+        all_ids = list(prompt_ids)
+        generated = []
+        try:
+            while len(generated) < max_new_tokens:
+                logits, past = self._forward(token_ids, past, past_length)
+                past_length += len(token_ids)
+                for processor in logits_processor or []:
+                    logits = processor(np.array([all_ids]), logits[None, :])[0]
+                next_token = self._choose_token(logits, do_sample, temperature, top_k, top_p)
+                if next_token in eos_token_ids:
+                    break
+                generated.append(next_token)
+                all_ids.append(next_token)
+                token_ids = [next_token]
+                if streamer is not None:
+                    streamer.put(np.array([next_token]))
+                if stopping_criteria and any(
+                    bool(criterion(np.array([all_ids]), logits[None, :])) for criterion in stopping_criteria
+                ):
+                    break
+        finally:
+            if streamer is not None:
+                streamer.end()
+        return self.tokenizer.decode(generated, skip_special_tokens=True)
+
+    @staticmethod
+    def _choose_token(logits: np.ndarray, do_sample: bool, temperature: float, top_k: int, top_p: float) -> int:
+        """Greedy or temperature/top-k/top-p sampling over one position's logits"""
+        if not do_sample:
+            return int(np.argmax(logits))
+        logits = logits.astype(np.float64) / max(temperature or 1.0, 1e-5)
+        if top_k:
+            # Like transformers' TopKLogitsWarper, a top_k above the vocabulary size keeps every token
+            top_k = min(top_k, logits.shape[-1])
+            kth_value = np.partition(logits, -top_k)[-top_k]
+            logits = np.where(logits < kth_value, -np.inf, logits)
+        probs = np.exp(logits - np.max(logits))
+        probs /= probs.sum()
+        if top_p and top_p < 1.0:
+            order = np.argsort(-probs)
+            cumulative = np.cumsum(probs[order])
+            # Keep the smallest set of tokens whose probability reaches top_p
+            keep = order[:int(np.searchsorted(cumulative, top_p)) + 1]
+            filtered = np.zeros_like(probs)
+            filtered[keep] = probs[keep]
+            probs = filtered / filtered.sum()
+        return int(np.random.choice(len(probs), p=probs))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Describe the backend for get_model_info"""
+        return {
+            "backend": self.backend,
+            "providers": self.session.get_providers(),
+            "model_name": self.config.get("model_name"),
+            "cached_prefixes": len(self._prefixes)
+        }
+
+def load_onnx_generator(model_name: str, model_dir: str, prefixes: List[str] = None) -> OnnxGenerator:
+    """Load the exported ONNX model, exporting it first if it isn't in model_dir yet"""
+    if not os.path.exists(os.path.join(model_dir, MODEL_FILE)):
+        logger.info(f"No ONNX export of {model_name} in {model_dir}, exporting...")
+        export_onnx_model(model_name, model_dir)
+    return OnnxGenerator(model_dir, prefixes=prefixes)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Single Flight Module for ATL Chatbot
+
+This module de-duplicates expensive concurrent initialisation (model loading,
+InformationFeed construction):
+- The first caller for a key runs the function
+- Concurrent callers for the same key wait on its future and share the result (or exception)
+- Counters for how many calls ran and how many were shared
+"""
+
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger("single_flight")
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers wait for its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """Call fn(*args, **kwargs), or wait for the call already running under `key`"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            logger.info(f"Waiting for in-flight call '{key}'")
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Calls executed, and calls that waited on another caller's result"""
+        with self._lock:
+            return {"executed": self.executed, "shared": self.shared, "in_flight": len(self._in_flight)}
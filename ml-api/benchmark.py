@@ -0,0 +1,935 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark Script for ATL Chatbot
+
+This script measures the throughput and latency of the chatbot's generation paths.
+"""
+import sys
+import os
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_registry import current_rss_mb
+
+# Get the project root directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_QUESTIONS = [
+    "How do I book the XR space?",
+    "What events are happening?",
+    "What equipment is available?",
+    "How much does the meeting room cost?",
+    "Who can I contact?"
+]
+
+def load_survey_questions(limit=None):
+    """Load the unique user questions from the exported survey chats"""
+    questions = []
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, "data", "survey", "*.json"))):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                chat = json.load(f)
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        for message in chat.get("Messages", []):
+            text = message.get("Text", "").strip()
+            if text and not message.get("Is_Bot") and text not in questions:
+                questions.append(text)
+    if not questions:
+        questions = list(DEFAULT_QUESTIONS)
+    return questions[:limit] if limit else questions
+
+def build_prompts(questions):
+    """Wrap questions in the same enhancement prompt the response generators use"""
+    return [f"Enhance and expand this answer about ATL in English, with bullet points: {q}" for q in questions]
+
+def load_info_feed():
+    """Load the InformationFeed used to build prompt contexts, or None if the data is unavailable"""
+    try:
+        from data_loader import InformationFeed
+        return InformationFeed()
+    except Exception as e:
+        print(f"Data not available, using questions as context: {e}")
+        return None
+
+def build_comprehensive_prompt(question, info_feed, context_chars=1500):
+    """Build the prompt generate_comprehensive_response sends, with the context trimmed to fit the model"""
+    from model_manager import ASSISTANT_PROMPT_PREFIX
+    context = info_feed.get_context_for_question(question) if info_feed else question
+    return ASSISTANT_PROMPT_PREFIX + f"""
+
+Relevant Information:
+{context[:context_chars]}
+
+User Question: {question}
+
+Please provide a comprehensive, well-structured response with specific details. Use bullet points and clear formatting where appropriate."""
+
+def build_generation_workload(questions, short_tokens, long_tokens):
+    """
+    Build (prompt, max_new_tokens) pairs mixing the two model calls in response_generators:
+    long comprehensive prompts with long replies and short enhancement prompts with short replies
+    """
+    info_feed = load_info_feed()
+    workload = []
+    for i, question in enumerate(questions):
+        if i % 2 == 0:
+            workload.append((build_comprehensive_prompt(question, info_feed), long_tokens))
+        else:
+            workload.append((build_prompts([question])[0], short_tokens))
+    return workload
+
+def summarize_latencies(samples):
+    """Summarise latency samples (seconds) as milliseconds"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "mean_ms": 0.0}
+    return {
+        "p50_ms": ordered[int(0.50 * (len(ordered) - 1))] * 1000,
+        "p95_ms": ordered[int(0.95 * (len(ordered) - 1))] * 1000,
+        "mean_ms": sum(ordered) / len(ordered) * 1000
+    }
+
+def run_concurrent(generate, prompts, concurrency):
+    """Call generate(prompt) for every prompt from `concurrency` threads; return (wall seconds, latencies)"""
+    latencies = []
+
+    def _one(prompt):
+        start = time.perf_counter()
+        generate(prompt)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(_one, prompts))
+    return time.perf_counter() - start, latencies
+
+def load_pipeline():
+    """Load a plain text-generation pipeline for the configured model"""
+    from transformers import pipeline
+    from model_manager import MODEL_NAME
+    print(f"Loading {MODEL_NAME}...")
+    return pipeline('text-generation', model=MODEL_NAME, tokenizer=MODEL_NAME)
+
+def benchmark_batching(windows, concurrency, num_requests, max_new_tokens):
+    """Compare per-request pipeline calls with micro-batching across batch windows"""
+    from batch_scheduler import MicroBatchingGenerator
+
+    generator = load_pipeline()
+    questions = load_survey_questions()
+    prompts = build_prompts((questions * (num_requests // len(questions) + 1))[:num_requests])
+    generate_kwargs = {
+        "max_new_tokens": max_new_tokens,
+        "do_sample": False,
+        "pad_token_id": generator.tokenizer.eos_token_id
+    }
+
+    # Warm up once so the first configuration doesn't pay for lazy initialisation
+    generator(prompts[0], **generate_kwargs)
+
+    print(f"\n=== MICRO-BATCHING BENCHMARK ({num_requests} requests, concurrency {concurrency}, {max_new_tokens} new tokens) ===")
+    print(f"{'engine':<22}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'avg batch':>11}")
+
+    wall, latencies = run_concurrent(lambda p: generator(p, **generate_kwargs), prompts, concurrency)
+    stats = summarize_latencies(latencies)
+    print(f"{'pipeline (unbatched)':<22}{num_requests / wall:>8.2f}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}{1:>11.2f}")
+
+    for window in windows:
+        engine = MicroBatchingGenerator(generator, window_ms=window, max_batch_size=concurrency)
+        wall, latencies = run_concurrent(lambda p: engine(p, **generate_kwargs), prompts, concurrency)
+        stats = summarize_latencies(latencies)
+        label = f"batch window {window:g}ms"
+        print(f"{label:<22}{num_requests / wall:>8.2f}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}{engine.get_stats()['average_batch_size']:>11.2f}")
+
+def benchmark_continuous(concurrency, num_requests, max_new_tokens):
+    """Compare per-request pipeline calls, micro-batching and continuous batching on a mixed workload"""
+    from batch_scheduler import MicroBatchingGenerator
+    from continuous_batching import ContinuousBatchingEngine
+
+    generator = load_pipeline()
+    questions = load_survey_questions()
+    questions = (questions * (num_requests // len(questions) + 1))[:num_requests]
+    short_tokens = max(1, max_new_tokens // 4)
+    workload = build_generation_workload(questions, short_tokens, max_new_tokens)
+    generate_kwargs = {"do_sample": False, "pad_token_id": generator.tokenizer.eos_token_id}
+
+    # Warm up once so the first configuration doesn't pay for lazy initialisation
+    generator(workload[0][0], max_new_tokens=1, **generate_kwargs)
+
+    # Engines are built lazily so their background threads don't compete with each other
+    engines = [
+        ("pipeline (per request)", lambda: generator),
+        ("micro-batch", lambda: MicroBatchingGenerator(generator, max_batch_size=concurrency)),
+        ("continuous", lambda: ContinuousBatchingEngine(generator.model, generator.tokenizer, max_active=concurrency))
+    ]
+
+    print(f"\n=== CONTINUOUS BATCHING BENCHMARK ({num_requests} requests, concurrency {concurrency}, "
+          f"{short_tokens}/{max_new_tokens} new tokens) ===")
+    print(f"{'engine':<24}{'req/s':>8}{'tok/s':>9}{'p50 ms':>10}{'p95 ms':>10}")
+
+    for label, build_engine in engines:
+        engine = build_engine()
+        tokens = []
+
+        def _generate(item):
+            prompt, new_tokens = item
+            output = engine(prompt, max_new_tokens=new_tokens, **generate_kwargs)[0]['generated_text']
+            tokens.append(len(generator.tokenizer(output[len(prompt):])["input_ids"]))
+
+        wall, latencies = run_concurrent(_generate, workload, concurrency)
+        stats = summarize_latencies(latencies)
+        print(f"{label:<24}{num_requests / wall:>8.2f}{sum(tokens) / wall:>9.1f}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}")
+        if hasattr(engine, "get_stats"):
+            print(f"{'':<24}{engine.get_stats()}")
+
+def benchmark_prefix_cache(num_requests, context_chars, concurrency):
+    """
+    Compare time-to-first-token for comprehensive prompts with and without the prefix cache.
+
+    "full prefill" and "prefix cache" make the same model.generate call (same tokenization
+    and decoding), so their difference is only the reused prefix tokens; "pipeline" adds the
+    text-generation pipeline's own overhead and is shown for reference. The concurrent rows
+    compare micro-batching with and without prefix reuse.
+    """
+    import torch
+    import model_manager
+    from batch_scheduler import MicroBatchingGenerator
+    from model_manager import build_prefix_cache, generate_with_prefix
+
+    generator = load_pipeline()
+    info_feed = load_info_feed()
+    questions = load_survey_questions()
+    questions = (questions * (num_requests // len(questions) + 1))[:num_requests]
+    prompts = [build_comprehensive_prompt(q, info_feed, context_chars) for q in questions]
+    generate_kwargs = {"max_new_tokens": 1, "do_sample": False, "pad_token_id": generator.tokenizer.eos_token_id}
+    prompt_tokens = sum(len(generator.tokenizer(p)["input_ids"]) for p in prompts) / len(prompts)
+
+    # Warm up once so the first configuration doesn't pay for lazy initialisation
+    generator(prompts[0], **generate_kwargs)
+    cache = build_prefix_cache(generator.model, generator.tokenizer)
+    model_manager._prefix_cache = cache
+
+    def full_prefill(prompt, **kwargs):
+        # generate_with_prefix's own model.generate call, without the cached past-key-values
+        input_ids = torch.tensor([generator.tokenizer(prompt)["input_ids"]], device=generator.model.device)
+        with torch.inference_mode():
+            output_ids = generator.model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids), **kwargs)
+        return [{"generated_text": prompt + generator.tokenizer.decode(output_ids[0, input_ids.shape[1]:], skip_special_tokens=True)}]
+
+    print(f"\n=== PREFIX CACHE BENCHMARK ({num_requests} prompts, {prompt_tokens:.0f} tokens on average, "
+          f"{sum(cache.get_stats()['prefix_tokens'])} prefix tokens) ===")
+    print(f"{'mode':<26}{'TTFT p50 ms':>13}{'TTFT p95 ms':>13}{'mean ms':>10}")
+    sequential = [
+        ("pipeline", generator),
+        ("full prefill", full_prefill),
+        ("prefix cache", lambda p, **kw: generate_with_prefix(generator, p, **kw)),
+    ]
+    for label, generate in sequential:
+        latencies = []
+        for prompt in prompts:
+            start = time.perf_counter()
+            generate(prompt, **generate_kwargs)
+            latencies.append(time.perf_counter() - start)
+        stats = summarize_latencies(latencies)
+        print(f"{label:<26}{stats['p50_ms']:>13.1f}{stats['p95_ms']:>13.1f}{stats['mean_ms']:>10.1f}")
+
+    # Concurrent requests through the micro-batching engine, as served with GENERATION_ENGINE=micro_batch
+    for label, prefix_cache in [("micro-batch, full prefill", None), ("micro-batch, prefix cache", cache)]:
+        engine = MicroBatchingGenerator(generator, max_batch_size=concurrency, prefix_cache=prefix_cache)
+        wall, latencies = run_concurrent(lambda p: engine(p, **generate_kwargs), prompts, concurrency)
+        stats = summarize_latencies(latencies)
+        print(f"{label:<26}{stats['p50_ms']:>13.1f}{stats['p95_ms']:>13.1f}{stats['mean_ms']:>10.1f}"
+              f"  ({num_requests / wall:.2f} req/s, average batch {engine.get_stats()['average_batch_size']:.2f})")
+    print(f"Prefix cache: {cache.get_stats()}")
+
+def _measure_generation(quantization, prompts, max_new_tokens):
+    """Load the model in one precision and time greedy generation (run in a fresh process)"""
+    import torch
+    from transformers import AutoTokenizer
+    from model_manager import MODEL_NAME, load_causal_lm
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    model = load_causal_lm(MODEL_NAME, quantization=quantization).eval()
+    load_seconds = time.perf_counter() - start
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+
+    outputs = []
+    generated = 0
+    start = time.perf_counter()
+    with torch.inference_mode():
+        for prompt in prompts:
+            input_ids = tokenizer(prompt, return_tensors="pt").input_ids
+            output = model.generate(input_ids, max_new_tokens=max_new_tokens, do_sample=False,
+                                    pad_token_id=tokenizer.eos_token_id)[0, input_ids.shape[1]:].tolist()
+            outputs.append(output)
+            generated += len(output)
+    return {
+        "load_seconds": load_seconds,
+        "tokens_per_second": generated / (time.perf_counter() - start),
+        "rss_mb": current_rss_mb() - rss_before,
+        "outputs": outputs
+    }
+
+def benchmark_quantization(num_requests, max_new_tokens):
+    """Compare fp32 and dynamic int8 models: tokens/sec, RSS and output drift on the survey questions"""
+    import multiprocessing
+    from model_manager import MODEL_NAME
+
+    prompts = build_prompts(load_survey_questions(limit=num_requests))
+    print(f"Benchmarking {MODEL_NAME} on {len(prompts)} survey questions...")
+
+    # Each precision runs in its own process so RSS isn't shared between them
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for mode in ["none", "int8"]:
+        with context.Pool(1) as pool:
+            results[mode] = pool.apply(_measure_generation, (mode, prompts, max_new_tokens))
+
+    baseline = results["none"]["outputs"]
+    print(f"\n=== QUANTIZATION BENCHMARK ({len(prompts)} prompts, {max_new_tokens} new tokens, greedy) ===")
+    print(f"{'mode':<8}{'load s':>8}{'tok/s':>9}{'RSS MB':>9}{'exact':>8}{'token agree':>13}")
+    for mode, result in results.items():
+        exact = sum(a == b for a, b in zip(baseline, result["outputs"])) / len(prompts)
+        matched = sum(sum(x == y for x, y in zip(a, b)) for a, b in zip(baseline, result["outputs"]))
+        agreement = matched / max(1, sum(len(a) for a in baseline))
+        label = "fp32" if mode == "none" else mode
+        print(f"{label:<8}{result['load_seconds']:>8.1f}{result['tokens_per_second']:>9.1f}{result['rss_mb']:>9.0f}"
+              f"{exact:>8.0%}{agreement:>13.1%}")
+
+def benchmark_speculative(num_requests, max_new_tokens, context_chars, draft_name=None):
+    """
+    Compare plain and speculative (draft-assisted) greedy decoding on the comprehensive prompts:
+    tokens/sec, speedup, draft acceptance rate and whether the outputs are identical
+    """
+    import torch
+    from transformers import AutoTokenizer
+    import model_manager
+    from model_manager import MODEL_NAME, SPECULATIVE_NUM_TOKENS, load_causal_lm
+
+    draft_name = draft_name or model_manager.SPECULATIVE_DRAFT_MODEL
+    if not draft_name:
+        print("Set SPECULATIVE_DRAFT_MODEL (or --draft-model) to the draft checkpoint")
+        return
+
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model = load_causal_lm(MODEL_NAME)
+    draft = load_causal_lm(draft_name)
+    max_positions = getattr(model.config, "n_positions", None) or model.config.max_position_embeddings
+
+    info_feed = load_info_feed()
+    prompts = [build_comprehensive_prompt(q, info_feed, context_chars)
+               for q in load_survey_questions(limit=num_requests)]
+    print(f"Benchmarking {MODEL_NAME} with draft {draft_name} on {len(prompts)} prompts...")
+
+    # Count forward passes: each verification step is one main-model forward, each drafted token one draft forward
+    calls = {"model": 0, "draft": 0}
+    model.register_forward_hook(lambda *_: calls.__setitem__("model", calls["model"] + 1))
+    draft.register_forward_hook(lambda *_: calls.__setitem__("draft", calls["draft"] + 1))
+
+    results = {}
+    for mode in ["plain", "speculative"]:
+        outputs, tokens, seconds = [], 0, 0.0
+        calls.update(model=0, draft=0)
+        for prompt in prompts:
+            input_ids = tokenizer(prompt, return_tensors="pt").input_ids[:, -(max_positions - max_new_tokens):]
+            kwargs = {"assistant_model": draft} if mode == "speculative" else {}
+            if mode == "speculative":
+                draft.generation_config.num_assistant_tokens = SPECULATIVE_NUM_TOKENS
+            start = time.perf_counter()
+            with torch.inference_mode():
+                output_ids = model.generate(input_ids, attention_mask=torch.ones_like(input_ids),
+                                            max_new_tokens=max_new_tokens, do_sample=False,
+                                            pad_token_id=tokenizer.eos_token_id, **kwargs)
+            seconds += time.perf_counter() - start
+            new_ids = output_ids[0, input_ids.shape[1]:].tolist()
+            outputs.append(new_ids)
+            tokens += len(new_ids)
+        # Every verification forward yields its accepted draft tokens plus one token of its own
+        verifications = calls["model"]
+        accepted = tokens - verifications
+        results[mode] = {
+            "outputs": outputs,
+            "tokens_per_second": tokens / seconds if seconds else 0.0,
+            "tokens_per_forward": tokens / verifications if verifications else 0.0,
+            "acceptance": accepted / calls["draft"] if mode == "speculative" and calls["draft"] else None
+        }
+
+    plain, speculative = results["plain"], results["speculative"]
+    identical = sum(a == b for a, b in zip(plain["outputs"], speculative["outputs"])) / len(prompts)
+    print(f"\n=== SPECULATIVE DECODING BENCHMARK ({len(prompts)} prompts, {max_new_tokens} new tokens, greedy) ===")
+    print(f"{'mode':<13}{'tok/s':>9}{'tok/forward':>13}{'acceptance':>12}")
+    for mode, result in results.items():
+        acceptance = f"{result['acceptance']:.1%}" if result["acceptance"] is not None else "-"
+        print(f"{mode:<13}{result['tokens_per_second']:>9.1f}{result['tokens_per_forward']:>13.2f}{acceptance:>12}")
+    speedup = speculative["tokens_per_second"] / plain["tokens_per_second"] if plain["tokens_per_second"] else 0.0
+    print(f"Speedup: {speedup:.2f}x | identical outputs: {identical:.0%}")
+
+    # The served path: generate_with_prefix adds the draft to pipeline calls while a prefix cache is loaded
+    from transformers import pipeline
+    model_manager._prefix_cache = model_manager.build_prefix_cache(model, tokenizer)
+    model_manager._draft_model, model_manager._draft_target = draft, model
+    generator = pipeline("text-generation", model=model, tokenizer=tokenizer)
+    served, seconds = [], 0.0
+    calls.update(model=0, draft=0)
+    for prompt in prompts:
+        start = time.perf_counter()
+        output = model_manager.generate_with_prefix(generator, prompt, max_new_tokens=max_new_tokens, do_sample=False,
+                                                    pad_token_id=tokenizer.eos_token_id)
+        seconds += time.perf_counter() - start
+        served.append(output[0]["generated_text"][len(prompt):])
+    expected = [tokenizer.decode(ids, skip_special_tokens=True) for ids in plain["outputs"]]
+    matching = sum(a == b for a, b in zip(served, expected)) / len(prompts)
+    print(f"Served path (generate_with_prefix): {seconds / len(prompts) * 1000:.0f} ms/prompt, "
+          f"draft used: {'yes' if calls['draft'] else 'no'}, matches plain decoding: {matching:.0%}")
+
+def process_pss_mb(pid):
+    """Proportional set size of a process in MB (shared pages split between the processes sharing them)"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def _generate_once(model, tokenizer, prompt, max_new_tokens):
+    """One greedy generation, so every weight page is touched"""
+    import torch
+    input_ids = tokenizer(prompt, return_tensors="pt").input_ids
+    with torch.inference_mode():
+        model.generate(input_ids, attention_mask=torch.ones_like(input_ids), max_new_tokens=max_new_tokens,
+                       do_sample=False, pad_token_id=tokenizer.eos_token_id)
+
+def _independent_worker(weight_loading, prompt, max_new_tokens, ready, done):
+    """A worker started from scratch: import, load the model, generate once, then idle until done"""
+    start = time.perf_counter()
+    os.environ["MODEL_WEIGHT_LOADING"] = weight_loading
+    from transformers import AutoTokenizer
+    from model_manager import MODEL_NAME, load_causal_lm
+    model = load_causal_lm(MODEL_NAME)
+    _generate_once(model, AutoTokenizer.from_pretrained(MODEL_NAME), prompt, max_new_tokens)
+    ready.put(([os.getpid()], [time.perf_counter() - start]))
+    done.wait()
+
+def _preforked_workers(num_workers, prompt, max_new_tokens, ready, done):
+    """Load the memory-mapped model once, then fork the workers (as worker_launcher.py does)"""
+    os.environ["MODEL_WEIGHT_LOADING"] = "mmap"
+    from transformers import AutoTokenizer
+    from model_manager import MODEL_NAME, load_causal_lm
+    model = load_causal_lm(MODEL_NAME)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    _generate_once(model, tokenizer, prompt, max_new_tokens)
+
+    pids, ready_seconds = [os.getpid()], []
+    for _ in range(num_workers):
+        read_fd, write_fd = os.pipe()
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            _generate_once(model, tokenizer, prompt, max_new_tokens)
+            os.write(write_fd, b"1")
+            done.wait()
+            os._exit(0)
+        os.read(read_fd, 1)
+        ready_seconds.append(time.perf_counter() - start)
+        pids.append(pid)
+    ready.put((pids, ready_seconds))
+    done.wait()
+    for pid in pids[1:]:
+        os.waitpid(pid, 0)
+
+def benchmark_workers(num_workers, max_new_tokens):
+    """
+    Compare the memory of N server workers and the time to (re)start one: independently loaded
+    workers (copied or memory-mapped weights) against workers forked from a preloaded master
+    """
+    import multiprocessing
+    from model_manager import MODEL_NAME, load_mmap_model
+
+    prompt = build_prompts(DEFAULT_QUESTIONS[:1])[0]
+    load_mmap_model(MODEL_NAME)  # write the safetensors copy up front so no mode pays for it
+    context = multiprocessing.get_context("spawn")
+    print(f"Benchmarking {num_workers} workers of {MODEL_NAME}...")
+
+    results = {}
+    for mode in ["independent copy", "independent mmap", "preforked mmap"]:
+        ready, done = context.Queue(), context.Event()
+        if mode == "preforked mmap":
+            processes = [context.Process(target=_preforked_workers, args=(num_workers, prompt, max_new_tokens, ready, done))]
+        else:
+            weight_loading = mode.split()[1]
+            processes = [context.Process(target=_independent_worker, args=(weight_loading, prompt, max_new_tokens, ready, done))
+                         for _ in range(num_workers)]
+        for process in processes:
+            process.start()
+        pids, ready_seconds = [], []
+        for _ in processes:
+            worker_pids, seconds = ready.get()
+            pids.extend(worker_pids)
+            ready_seconds.extend(seconds)
+        results[mode] = {
+            "pss_mb": sum(process_pss_mb(pid) for pid in pids),
+            "ready_seconds": sum(ready_seconds) / len(ready_seconds)
+        }
+        done.set()
+        for process in processes:
+            process.join()
+
+    print(f"\n=== WORKER MEMORY BENCHMARK ({num_workers} workers, PSS summed over all processes) ===")
+    print(f"{'mode':<18}{'total PSS MB':>14}{'per worker MB':>15}{'worker start s':>16}")
+    for mode, result in results.items():
+        print(f"{mode:<18}{result['pss_mb']:>14.0f}{result['pss_mb'] / num_workers:>15.0f}{result['ready_seconds']:>16.2f}")
+
+def _measure_backend(backend, prompts, max_new_tokens):
+    """Time startup (imports + model load) and per-token generation for one backend (run in a fresh process)"""
+    os.environ["GENERATION_BACKEND"] = backend
+    start = time.perf_counter()
+    import model_manager
+    generator, tokenizer = model_manager.load_model(lightweight_mode=True)
+    startup_seconds = time.perf_counter() - start
+
+    generated = 0
+    start = time.perf_counter()
+    for prompt in prompts:
+        output = generator(prompt, max_new_tokens=max_new_tokens, do_sample=False,
+                           pad_token_id=tokenizer.eos_token_id)[0]['generated_text']
+        generated += max(1, len(tokenizer(output[len(prompt):])["input_ids"]))
+    elapsed = time.perf_counter() - start
+    return {
+        "startup_seconds": startup_seconds,
+        "ms_per_token": elapsed / generated * 1000,
+        "rss_mb": current_rss_mb(),
+        "torch_imported": "torch" in sys.modules
+    }
+
+def benchmark_onnx(num_requests, max_new_tokens):
+    """Compare PyTorch and ONNX Runtime backends: process startup and per-token latency"""
+    import multiprocessing
+    import model_manager
+    from onnx_backend import MODEL_FILE, export_onnx_model
+
+    onnx_dir = model_manager._cache_path(model_manager.MODEL_NAME, "onnx")
+    if not os.path.exists(os.path.join(onnx_dir, MODEL_FILE)):
+        print(f"Exporting {model_manager.MODEL_NAME} to {onnx_dir}...")
+        export_onnx_model(model_manager.MODEL_NAME, onnx_dir)
+
+    prompts = build_prompts(load_survey_questions(limit=num_requests))
+    context = multiprocessing.get_context("spawn")
+    print(f"\n=== ONNX RUNTIME BENCHMARK ({len(prompts)} prompts, {max_new_tokens} new tokens, greedy) ===")
+    print(f"{'backend':<10}{'startup s':>11}{'ms/token':>10}{'RSS MB':>9}{'torch loaded':>14}")
+    for backend in ["torch", "onnx"]:
+        # Fresh process per backend so startup includes the imports each one needs
+        with context.Pool(1) as pool:
+            result = pool.apply(_measure_backend, (backend, prompts, max_new_tokens))
+        print(f"{backend:<10}{result['startup_seconds']:>11.2f}{result['ms_per_token']:>10.2f}"
+              f"{result['rss_mb']:>9.0f}{str(result['torch_imported']):>14}")
+
+def _keyword_tables():
+    """(name, {category: keywords}) for every keyword-routed decision made per query"""
+    from response_generators import BROAD_TOPIC_KEYWORDS, INTENT_KEYWORDS, CONTACT_KEYWORDS, COMPREHENSIVE_KEYWORDS
+    from data_loader import SUBTOPIC_KEYWORDS
+    from website_links import website_manager
+    routing = {f"broad:{topic}": keywords for topic, keywords in BROAD_TOPIC_KEYWORDS.items()}
+    routing.update({f"intent:{intent}": keywords for intent, keywords in INTENT_KEYWORDS.items()})
+    routing.update({"contact": CONTACT_KEYWORDS, "comprehensive": COMPREHENSIVE_KEYWORDS})
+    links = {link_id: info["keywords"] for link_id, info in website_manager.get_all_links().items()}
+    return [("routing", routing), ("subtopics", SUBTOPIC_KEYWORDS), ("links", links)]
+
+def benchmark_keywords(repeats):
+    """Compare per-list `any(k in text)` loops with one Aho-Corasick scan per keyword table"""
+    from keyword_matcher import KeywordAutomaton
+
+    questions = [q.lower() for q in load_survey_questions()]
+    tables = _keyword_tables()
+    automata = [(name, KeywordAutomaton(categories)) for name, categories in tables]
+
+    def loops(text):
+        results = []
+        for _, categories in tables:
+            hits = {category: {k for k in keywords if k in text} for category, keywords in categories.items()}
+            results.append({category: found for category, found in hits.items() if found})
+        return results
+
+    def automaton(text):
+        return [matcher.scan(text) for _, matcher in automata]
+
+    mismatches = sum(loops(q) != automaton(q) for q in questions)
+    num_keywords = sum(len(keywords) for _, categories in tables for keywords in categories.values())
+    print(f"\n=== KEYWORD MATCHING BENCHMARK ({len(questions)} questions, {num_keywords} keywords, "
+          f"{sum(m.num_states for _, m in automata)} automaton states) ===")
+    print(f"{'method':<12}{'us/query':>10}")
+    for name, match in [("any loops", loops), ("automaton", automaton)]:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for question in questions:
+                match(question)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<12}{elapsed / (repeats * len(questions)) * 1e6:>10.1f}")
+    print(f"Result mismatches: {mismatches}")
+
+def build_facility_listing(facilities, copies=1):
+    """format_response sections describing every facility in full, repeated `copies` times"""
+    sections = []
+    for _ in range(copies):
+        for name, info in facilities.items():
+            points = [("Area", info.get('area', 'N/A')), ("Capacity", info.get('capacity', 'N/A'))]
+            points += [(f"Feature: {feature}", "") for feature in info.get('features', [])]
+            for kind in ("equipment", "hardware", "software"):
+                points += [(f"{kind.title()}: {item}", "") for item in info.get(kind, [])]
+            sections.append({"subtitle": f"{name} - Complete Information", "points": points,
+                             "paragraph": f"Let me know if you want to know about booking procedures or pricing for {name}!"})
+            if info.get('pricing'):
+                sections.append({"subtitle": "Pricing & Fees", "points": list(info['pricing'].items()),
+                                 "paragraph": "Rates vary by user category."})
+    return sections
+
+def benchmark_render(repeats, copies):
+    """Per-response format_response cost on full facility listings"""
+    from data_loader import InformationFeed
+    from response_generators import format_response
+
+    facilities = InformationFeed().get_base_info().get("facilities", {})
+    print(f"\n=== RESPONSE RENDERING BENCHMARK ({len(facilities)} facilities, {repeats} renders each) ===")
+    print(f"{'listing':<18}{'sections':>10}{'points':>8}{'chars':>8}{'ms/response':>13}")
+    for label, n in [("one facility", 0), ("all facilities", 1), (f"all x{copies}", copies)]:
+        sections = build_facility_listing(dict(list(facilities.items())[:1]) if n == 0 else facilities, max(n, 1))
+        format_response("ATL Facilities", sections)  # warm memoized subtitle lookups
+        start = time.perf_counter()
+        for _ in range(repeats):
+            response = format_response("ATL Facilities", sections)
+        elapsed = time.perf_counter() - start
+        points = sum(len(section["points"]) for section in sections)
+        print(f"{label:<18}{len(sections):>10}{points:>8}{len(response):>8}{elapsed / repeats * 1000:>13.3f}")
+
+def _difflib_facility_match(facilities, text):
+    """The per-call difflib matching FacilityResolver replaced, kept as the baseline"""
+    import difflib
+    from facility_resolver import normalize_name
+    norm_input = normalize_name(text)
+    names = list(facilities)
+    norm_names = [normalize_name(name) for name in names]
+    for i, norm_name in enumerate(norm_names):
+        if norm_input == norm_name:
+            return names[i]
+    for i, norm_name in enumerate(norm_names):
+        if norm_input in norm_name or norm_name in norm_input:
+            return names[i]
+    match = difflib.get_close_matches(norm_input, norm_names, n=1, cutoff=0.6)
+    return names[norm_names.index(match[0])] if match else None
+
+def benchmark_resolver(repeats, sizes):
+    """Facility resolution latency vs. number of facility names: per-call difflib scan vs. FacilityResolver"""
+    import random
+    from facility_resolver import FacilityResolver
+
+    real = ['XR Space', 'Seasonal Science and Technology Room', 'Lounge', 'Large Workstation', 'Small Workstation', 'Meeting Room']
+    words = ["studio", "lab", "room", "hall", "space", "suite", "booth", "gallery", "workshop", "theatre",
+             "media", "sound", "motion", "capture", "print", "maker", "digital", "green", "screen", "render"]
+    queries = ["xr space", "tell me about the lounge", "seasonal room", "large work station",
+               "how much is the metting room", "what is the loung", "do you have a dance floor"]
+    rng = random.Random(0)
+    print(f"\n=== FACILITY RESOLVER BENCHMARK ({len(queries)} queries x {repeats}) ===")
+    print(f"{'names':>6}{'difflib us':>12}{'resolver us':>13}{'build ms':>10}{'agree':>7}")
+    for size in sizes:
+        names = list(real)
+        while len(names) < size:
+            name = " ".join(rng.sample(words, rng.randint(2, 3))).title()
+            if name not in names:
+                names.append(name)
+        start = time.perf_counter()
+        resolver = FacilityResolver(names)
+        build_ms = (time.perf_counter() - start) * 1000
+        agree = sum(_difflib_facility_match(names, q) == resolver.resolve(q) for q in queries)
+        timings = []
+        for match in (lambda q: _difflib_facility_match(names, q), resolver.resolve):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                for query in queries:
+                    match(query)
+            timings.append((time.perf_counter() - start) / (repeats * len(queries)) * 1e6)
+        print(f"{size:>6}{timings[0]:>12.1f}{timings[1]:>13.1f}{build_ms:>10.2f}{agree:>5}/{len(queries)}")
+
+def _typo(word, rng):
+    """One random delete, insert, substitution or adjacent transposition"""
+    i = rng.randrange(len(word) - 1)
+    letter = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return rng.choice([
+        word[:i] + word[i + 1:],
+        word[:i] + letter + word[i:],
+        word[:i] + letter + word[i + 1:],
+        word[:i] + word[i + 1] + word[i] + word[i + 2:],
+    ])
+
+def benchmark_spell(num_typos):
+    """Typo correction latency and accuracy: difflib.get_close_matches over the vocabulary vs. the SymSpell index"""
+    import random
+    import difflib
+    from spell_corrector import MIN_SUGGESTION_COUNT
+
+    corrector = load_info_feed().spell_corrector
+    vocabulary = [word for word, count in corrector.counts.items() if count >= MIN_SUGGESTION_COUNT]
+    rng = random.Random(0)
+    targets = rng.sample([word for word in vocabulary if len(word) >= 6], num_typos)
+    typos = [(word, _typo(word, rng)) for word in targets]
+    typos = [(word, typo) for word, typo in typos if not corrector.is_known(typo)]
+
+    print(f"\n=== SPELL CORRECTION BENCHMARK ({len(typos)} typos, {len(vocabulary)} vocabulary words) ===")
+    print(f"{'method':<10}{'us/word':>12}{'recovered':>11}")
+    for name, correct in (("difflib", lambda typo: next(iter(difflib.get_close_matches(typo, vocabulary, n=1, cutoff=0.8)), None)),
+                          ("symspell", corrector.lookup)):
+        start = time.perf_counter()
+        results = [correct(typo) for _, typo in typos]
+        elapsed = (time.perf_counter() - start) / len(typos) * 1e6
+        recovered = sum(result == word for result, (word, _) in zip(results, typos))
+        print(f"{name:<10}{elapsed:>12.1f}{recovered:>6}/{len(typos)}")
+    print(f"Index: {corrector.get_stats()['deletes']} deletes, built in {corrector.build_seconds * 1000:.0f} ms")
+
+def _pairwise_group_similar_points(points):
+    """The previous group_similar_points: word sets rebuilt and compared for every pair"""
+    grouped, used = [], set()
+    for i, point in enumerate(points):
+        if i in used:
+            continue
+        similar = [point]
+        used.add(i)
+        for j, other in enumerate(points[i + 1:], i + 1):
+            if j in used:
+                continue
+            words, other_words = set(point.lower().split()), set(other.lower().split())
+            union = len(words | other_words)
+            if union > 0 and len(words & other_words) / union > 0.6:
+                similar.append(other)
+                used.add(j)
+        grouped.append(max(similar, key=len))
+    return grouped
+
+def benchmark_grouping(sizes):
+    """Near-duplicate point grouping vs. list size: pairwise word sets vs. sparse products / MinHash"""
+    import random
+    import near_duplicates
+    from text_processors import group_similar_points
+
+    info_feed = load_info_feed()
+    facilities = info_feed.get_base_info().get("facilities", {}) if info_feed else {}
+    base = sorted({str(item) for info in facilities.values() if isinstance(info, dict)
+                   for key in ("equipment", "hardware", "software") for item in info.get(key, [])})
+    base = base or ["Unreal Engine 5 for real-time rendering", "Meta Quest 3 headset with controllers"]
+    pool = sorted({word for item in base for word in item.split()})
+    extras = ["with", "for", "and", "pro", "edition", "set", "kit", "(2 units)", "latest", "version"]
+    rng = random.Random(0)
+
+    def variant(text):
+        words = text.split()
+        if len(words) > 2 and rng.random() < 0.5:
+            words.pop(rng.randrange(len(words)))
+        words.insert(rng.randrange(len(words) + 1), rng.choice(extras))
+        return " ".join(words)
+
+    print(f"\n=== POINT GROUPING BENCHMARK (real entries plus synthetic ones from their {len(pool)} words) ===")
+    print(f"{'points':>7}{'pairwise ms':>13}{'vectorized ms':>15}{'path':>10}{'groups':>8}{'agree':>7}")
+    for size in sizes:
+        # About three points per distinct entry, most of them reworded
+        entries = base + [" ".join(rng.sample(pool, rng.randint(3, 6))) for _ in range(max(0, size // 3 - len(base)))]
+        points = [variant(rng.choice(entries)) if rng.random() < 0.7 else rng.choice(entries) for _ in range(size)]
+        pairwise_ms, expected = float("nan"), None
+        if size <= 5000:
+            start = time.perf_counter()
+            expected = _pairwise_group_similar_points(points)
+            pairwise_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        grouped = group_similar_points(points)
+        vectorized_ms = (time.perf_counter() - start) * 1000
+        path = ("sets" if size < near_duplicates.VECTORIZE_MIN_TEXTS else
+                "minhash" if size > near_duplicates.MINHASH_MIN_TEXTS else "sparse")
+        agree = "n/a" if expected is None else ("yes" if grouped == expected else "no")
+        print(f"{size:>7}{pairwise_ms:>13.1f}{vectorized_ms:>15.1f}{path:>10}{len(grouped):>8}{agree:>7}")
+
+def benchmark_intent(repeats):
+    """Intent routing latency: keyword scoring vs. the exported classifier vs. the scikit-learn pipeline it came from"""
+    import numpy as np
+    from intent_classifier import (training_examples, load_intent_classifier, _TOKEN_PATTERN,
+                                   INTENT_CLASSIFIER_C, INTENT_CONFIDENCE_THRESHOLD)
+    from response_generators import detect_intent, _routing_matcher
+
+    questions, intents = training_examples(load_info_feed())
+    questions = questions + load_survey_questions()
+    classifier = load_intent_classifier()
+
+    # The same model fitted as a scikit-learn pipeline, for reference latency and parity
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    labelled = questions[:len(intents)]
+    pipeline = make_pipeline(TfidfVectorizer(sublinear_tf=True, token_pattern=_TOKEN_PATTERN.pattern),
+                             LogisticRegression(C=INTENT_CLASSIFIER_C, max_iter=2000)).fit(labelled, intents)
+
+    print(f"\n=== INTENT ROUTING BENCHMARK ({len(questions)} questions x {repeats}) ===")
+    methods = [
+        ("keywords", lambda q: detect_intent(_routing_matcher.scan(q.lower()))),
+        ("classifier", classifier.predict),
+        ("sklearn", lambda q: pipeline.predict_proba([q])),
+    ]
+    for name, route in methods:
+        runs = repeats if name != "sklearn" else max(1, repeats // 20)
+        start = time.perf_counter()
+        for _ in range(runs):
+            for question in questions:
+                route(question)
+        print(f"{name:<12}{(time.perf_counter() - start) / (runs * len(questions)) * 1e6:>10.1f} us/question")
+
+    exported = np.array([classifier.predict_proba(q) for q in labelled])
+    reference = pipeline.predict_proba(labelled)[:, [list(pipeline.classes_).index(c) for c in classifier.classes]]
+    confident = [classifier.predict(q)[1] >= INTENT_CONFIDENCE_THRESHOLD for q in questions]
+    print(f"Max probability difference vs. scikit-learn: {np.abs(exported - reference).max():.2e}")
+    print(f"Confident (>= {INTENT_CONFIDENCE_THRESHOLD}): {sum(confident)}/{len(questions)} questions")
+
+def benchmark_faq(repeats):
+    """FAQ answer table: share of questions it serves and their latency with and without it"""
+    import io
+    import re
+    import contextlib
+    from faq_index import faq_answers
+    from response_generators import _generate_lightweight_response
+
+    info_feed = load_info_feed()
+    faq_questions = [item["conversations"][0]["content"] for items in info_feed.subtopics.values() for item in items]
+    # Rephrased the way people type: lowercase, no punctuation, without "the"
+    retyped = [" ".join(word for word in re.findall(r"\w+", q.lower()) if word != "the") for q in faq_questions]
+    traffic = {"survey": load_survey_questions(), "faq": faq_questions, "faq retyped": retyped}
+
+    print(f"\n=== FAQ ANSWER TABLE BENCHMARK (near-match threshold {faq_answers.threshold}) ===")
+    print(f"{'questions':<14}{'count':>7}{'exact':>7}{'near':>7}{'served':>8}")
+    served = []
+    for name, questions in traffic.items():
+        matches = [faq_answers.lookup(q, info_feed.facility_resolver) for q in questions]
+        exact = sum(1 for m in matches if m and m["match"] == "exact")
+        near = sum(1 for m in matches if m and m["match"] == "near")
+        served += [q for q, m in zip(questions, matches) if m]
+        print(f"{name:<14}{len(questions):>7}{exact:>7}{near:>7}{(exact + near) / len(questions):>8.1%}")
+
+    def answer_all():
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(repeats):
+                for question in served:
+                    _generate_lightweight_response(None, question, info_feed)
+        return (time.perf_counter() - start) / (repeats * len(served)) * 1000
+
+    with_table = answer_all()
+    faq_answers.rebuild({})
+    without_table = answer_all()
+    faq_answers.rebuild(info_feed.subtopics)
+    print(f"Served questions through the rules path: {without_table:.2f} ms without the table, "
+          f"{with_table:.3f} ms with it")
+
+def benchmark_qa(repeats):
+    """Context Q&A selection: keyword overlap vs. the FAQ embedding index, on FAQ questions with half their words"""
+    import re
+    import random
+    import tempfile
+    from faq_index import FAQEmbeddingIndex
+
+    info_feed = load_info_feed()
+    index = info_feed.faq_embeddings
+    # Without an embedder, top_items ranks by the old keyword overlap
+    keyword_index = FAQEmbeddingIndex(index.subtopics, None, {})
+    random.seed(0)
+    cases = []
+    for subtopic, items in index.subtopics.items():
+        for item in items:
+            words = re.findall(r"\w+", item["conversations"][0]["content"].lower())
+            cases.append((" ".join(random.sample(words, max(2, len(words) // 2))), subtopic, item))
+
+    print(f"\n=== CONTEXT Q&A SELECTION BENCHMARK ({len(cases)} partial FAQ questions x {repeats}, "
+          f"embedder {getattr(index.embedder, 'name', '?')}) ===")
+    print(f"{'ranking':<12}{'us/question':>12}{'top-1':>8}{'top-2':>8}")
+    for name, ranker in (("keywords", keyword_index), ("embeddings", index)):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            picks = [ranker.top_items(question, [subtopic], 2)[subtopic] for question, subtopic, _ in cases]
+        elapsed = (time.perf_counter() - start) / (repeats * len(cases)) * 1e6
+        top1 = sum(top[0] is item for top, (_, _, item) in zip(picks, cases)) / len(cases)
+        top2 = sum(any(t is item for t in top) for top, (_, _, item) in zip(picks, cases)) / len(cases)
+        print(f"{name:<12}{elapsed:>12.1f}{top1:>8.1%}{top2:>8.1%}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "faq_embeddings.npz")
+        for label in ("encode + save", "load"):
+            start = time.perf_counter()
+            FAQEmbeddingIndex.build(index.subtopics, index.embedder, path)
+            print(f"Index {label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for ATL Chatbot generation")
+    parser.add_argument("command", choices=["batching", "continuous", "prefix", "quantization", "onnx", "speculative", "workers", "keywords", "render", "resolver", "spell", "grouping", "intent", "faq", "qa"],
+                        help="Benchmark to run")
+    parser.add_argument("--requests", type=int, default=32,
+                        help="Number of generation requests to send")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Number of concurrent callers")
+    parser.add_argument("--max-new-tokens", type=int, default=32,
+                        help="Tokens to generate per request")
+    parser.add_argument("--windows", type=str, default="0,5,10,25,50",
+                        help="Comma-separated batch windows in milliseconds")
+    parser.add_argument("--context-chars", type=int, default=1500,
+                        help="Context characters kept in comprehensive prompts (prefix/speculative benchmarks)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Number of server worker processes (workers benchmark)")
+    parser.add_argument("--repeats", type=int, default=200,
+                        help="Passes over the questions (keywords/intent/faq/qa benchmarks), renders per listing (render benchmark) or typos (spell benchmark)")
+    parser.add_argument("--sizes", type=str, default="6,50,200,500",
+                        help="Comma-separated facility name counts (resolver benchmark) or point counts (grouping benchmark)")
+    parser.add_argument("--copies", type=int, default=10,
+                        help="Times the full facility listing is repeated in the largest render benchmark response")
+    parser.add_argument("--draft-model", type=str, default=None,
+                        help="Draft checkpoint for the speculative benchmark (default SPECULATIVE_DRAFT_MODEL)")
+
+    args = parser.parse_args()
+
+    if args.command == "batching":
+        windows = [float(w) for w in args.windows.split(',') if w.strip()]
+        benchmark_batching(windows, args.concurrency, args.requests, args.max_new_tokens)
+    elif args.command == "continuous":
+        benchmark_continuous(args.concurrency, args.requests, args.max_new_tokens)
+    elif args.command == "prefix":
+        benchmark_prefix_cache(args.requests, args.context_chars, args.concurrency)
+    elif args.command == "quantization":
+        benchmark_quantization(args.requests, args.max_new_tokens)
+    elif args.command == "onnx":
+        benchmark_onnx(args.requests, args.max_new_tokens)
+    elif args.command == "speculative":
+        benchmark_speculative(args.requests, args.max_new_tokens, args.context_chars, args.draft_model)
+    elif args.command == "workers":
+        benchmark_workers(args.workers, args.max_new_tokens)
+    elif args.command == "keywords":
+        benchmark_keywords(args.repeats)
+    elif args.command == "render":
+        benchmark_render(args.repeats, args.copies)
+    elif args.command == "resolver":
+        benchmark_resolver(args.repeats, [int(n) for n in args.sizes.split(',') if n.strip()])
+    elif args.command == "spell":
+        benchmark_spell(args.repeats)
+    elif args.command == "grouping":
+        benchmark_grouping([int(n) for n in args.sizes.split(',') if n.strip()])
+    elif args.command == "intent":
+        benchmark_intent(args.repeats)
+    elif args.command == "faq":
+        benchmark_faq(args.repeats)
+    elif args.command == "qa":
+        benchmark_qa(args.repeats)
+    else:
+        print(f"Unknown command: {args.command}")
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
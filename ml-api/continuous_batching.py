@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Continuous Batching Module for ATL Chatbot
+
+This module provides an iteration-level (continuous) batching engine around
+the causal language model loaded by model_manager:
+- New requests join the running decode loop at token boundaries
+- Finished sequences leave the batch immediately
+- Each sequence keeps its own KV cache, padded together only for a decode step
+- Cached static prompt prefixes are spliced in so only the rest is prefilled
+"""
+
+import os
+import queue
+import logging
+import weakref
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List
+
+import torch
+
+logger = logging.getLogger("continuous_batching")
+
+# Largest number of sequences decoded together in one step
+MAX_ACTIVE_SEQUENCES = int(os.environ.get("GENERATION_MAX_BATCH", "8"))
+
+# Used when a request sets neither max_new_tokens nor max_length
+DEFAULT_MAX_NEW_TOKENS = int(os.environ.get("GENERATION_DEFAULT_MAX_NEW_TOKENS", "256"))
+
+# Wakes a decode loop whose engine has been garbage-collected, so it exits
+_STOP = object()
+
+# Live engines, held weakly so neither the fork hook nor this set keeps one alive
+_engines = weakref.WeakSet()
+
+def _restart_workers():
+    """Threads don't survive fork(); preforked server workers get a fresh decode loop per engine"""
+    for engine in list(_engines):
+        engine._start_worker()
+
+os.register_at_fork(after_in_child=_restart_workers)
+
+def _serve(engine_ref, pending: queue.Queue):
+    """
+    Decode loop thread body. While idle it holds only a weak reference, so an unused
+    engine can be collected; its finalizer then wakes the thread with _STOP.
+    """
+    with torch.inference_mode():
+        while True:
+            sequence = pending.get()
+            engine = engine_ref()
+            if sequence is _STOP or engine is None:
+                return
+            engine._run(sequence)
+            del engine
+
+def _to_legacy_cache(past_key_values):
+    """Normalise a model's cache output to the tuple-of-(key, value)-per-layer format"""
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache()
+    return past_key_values
+
+class _Sequence:
+    """One request's decoding state: tokens, KV cache and sampling settings"""
+
+    def __init__(self, prompt: str, prompt_ids: List[int], settings: Dict[str, Any],
+                 prefix_length: int = 0, prefix_past=None):
+        self.prompt = prompt
+        self.token_ids = list(prompt_ids)
+        self.prompt_length = len(prompt_ids)
+        self.settings = settings
+        self.prefix_length = prefix_length
+        self.past_key_values = prefix_past
+        self.last_scores = None
+        self.future = Future()
+
+    @property
+    def cache_length(self) -> int:
+        return self.past_key_values[0][0].shape[2]
+
+    @property
+    def num_generated(self) -> int:
+        return len(self.token_ids) - self.prompt_length
+
+class ContinuousBatchingEngine:
+    """
+    Drop-in replacement for a text-generation pipeline that decodes all in-flight
+    requests together, one token at a time.
+
+    Calls block the calling thread until the request's sequence has finished.
+    """
+
+    def __init__(self, model, tokenizer, max_active: int = None, prefix_cache=None):
+        self.model = model.eval()
+        self.tokenizer = tokenizer
+        self.prefix_cache = prefix_cache
+        self.max_active = max(1, max_active or MAX_ACTIVE_SEQUENCES)
+        self.max_positions = getattr(model.config, "n_positions", None) or getattr(model.config, "max_position_embeddings", 1024)
+
+        self._stats = {"admitted": 0, "completed": 0, "failed": 0, "decode_steps": 0, "decoded_tokens": 0}
+        self._start_worker()
+        _engines.add(self)
+
+    def _start_worker(self):
+        """Create the request queues and start the decode loop thread"""
+        self._pending = queue.Queue()
+        self._active: List[_Sequence] = []
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=_serve, args=(weakref.ref(self), self._pending), name="continuous-batcher", daemon=True)
+        self._worker.start()
+        weakref.finalize(self, self._pending.put, _STOP)
+
+    def __call__(self, text_inputs, num_return_sequences=1, **generate_kwargs):
+        """Generate with the same arguments and return value as the text-generation pipeline"""
+        if not isinstance(text_inputs, str):
+            return [self(text, num_return_sequences=num_return_sequences, **generate_kwargs) for text in text_inputs]
+
+        futures = [self.submit(text_inputs, **generate_kwargs) for _ in range(num_return_sequences)]
+        return [{"generated_text": text_inputs + future.result()} for future in futures]
+
+    def submit(self, prompt: str, **generate_kwargs) -> Future:
+        """Queue a prompt; the returned future resolves to the generated continuation"""
+        settings = self._resolve_settings(generate_kwargs)
+        budget = self.max_positions - settings["max_new_tokens"]
+        if budget <= 0:
+            settings["max_new_tokens"] = self.max_positions // 2
+            budget = self.max_positions - settings["max_new_tokens"]
+
+        match = self.prefix_cache.match(prompt) if self.prefix_cache is not None else None
+        if match is not None and len(match[0]) <= budget:
+            prompt_ids, prefix_length, prefix_past = match
+            sequence = _Sequence(prompt, prompt_ids, settings, prefix_length, prefix_past)
+        else:
+            # Keep the most recent context if the prompt would overflow the position embeddings
+            prompt_ids = self.tokenizer(prompt)["input_ids"][-budget:]
+            sequence = _Sequence(prompt, prompt_ids, settings)
+        self._pending.put(sequence)
+        return sequence.future
+
+    def _resolve_settings(self, generate_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Pick out the generation settings the engine understands"""
+        generation_config = getattr(self.model, "generation_config", None)
+        max_new_tokens = generate_kwargs.get("max_new_tokens")
+        if max_new_tokens is None:
+            max_new_tokens = DEFAULT_MAX_NEW_TOKENS
+        eos_token_id = generate_kwargs.get("eos_token_id", self.tokenizer.eos_token_id)
+        return {
+            "max_new_tokens": max_new_tokens,
+            "max_length": generate_kwargs.get("max_length"),
+            "do_sample": generate_kwargs.get("do_sample", getattr(generation_config, "do_sample", False)),
+            "temperature": generate_kwargs.get("temperature") or 1.0,
+            "top_k": generate_kwargs.get("top_k") or 0,
+            "top_p": generate_kwargs.get("top_p") or 1.0,
+            "eos_token_ids": set(eos_token_id) if isinstance(eos_token_id, (list, tuple)) else {eos_token_id},
+            "stopping_criteria": list(generate_kwargs.get("stopping_criteria") or []),
+            "streamer": generate_kwargs.get("streamer")
+        }
+
+    def _run(self, sequence: _Sequence):
+        """Admit a request that arrived while idle, then decode until no sequence is active"""
+        self._admit(sequence)
+        while True:
+            try:
+                self._admit_waiting()
+                if not self._active:
+                    return
+                self._decode_step()
+            except Exception as e:
+                # Never let one failure stop the worker: fail the batch and keep serving the queue
+                logger.error(f"Generation step failed for {len(self._active)} sequence(s): {e}")
+                self._fail_all(self._active, e)
+
+    def _admit_waiting(self):
+        """Let queued requests join the batch at this token boundary"""
+        while len(self._active) < self.max_active:
+            try:
+                sequence = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            self._admit(sequence)
+
+    def _admit(self, sequence: _Sequence):
+        """Prefill a new sequence's KV cache and pick its first token"""
+        try:
+            device = self.model.device
+            if sequence.prefix_length:
+                # Only the tokens after the cached prefix need a forward pass
+                input_ids = torch.tensor([sequence.token_ids[sequence.prefix_length:]], device=device)
+                outputs = self.model(
+                    input_ids=input_ids,
+                    past_key_values=sequence.past_key_values,
+                    attention_mask=torch.ones((1, sequence.prompt_length), dtype=torch.long, device=device),
+                    position_ids=torch.arange(sequence.prefix_length, sequence.prompt_length, device=device).unsqueeze(0),
+                    use_cache=True
+                )
+            else:
+                input_ids = torch.tensor([sequence.token_ids], device=device)
+                outputs = self.model(input_ids=input_ids, use_cache=True)
+            sequence.past_key_values = _to_legacy_cache(outputs.past_key_values)
+            with self._lock:
+                self._stats["admitted"] += 1
+            if sequence.settings["streamer"] is not None:
+                sequence.settings["streamer"].put(torch.tensor([sequence.token_ids]))
+            self._append_token(sequence, outputs.logits[0, -1])
+            finished = self._is_finished(sequence)
+        except Exception as e:
+            logger.error(f"Prefill failed: {e}")
+            self._fail(sequence, e)
+            return
+
+        if not finished:
+            self._active.append(sequence)
+
+    def _decode_step(self):
+        """Run one forward pass over every active sequence's last token"""
+        sequences = self._active
+        cache_lengths = [s.cache_length for s in sequences]
+        longest = max(cache_lengths)
+        batch_size = len(sequences)
+        device = self.model.device
+
+        try:
+            # Left-pad each sequence's cache to the longest one and mask the padding out
+            past_key_values = []
+            for layer in range(len(sequences[0].past_key_values)):
+                keys, values = [], []
+                for sequence, length in zip(sequences, cache_lengths):
+                    key, value = sequence.past_key_values[layer]
+                    if length < longest:
+                        pad_shape = (1, key.shape[1], longest - length, key.shape[3])
+                        key = torch.cat([key.new_zeros(pad_shape), key], dim=2)
+                        value = torch.cat([value.new_zeros(pad_shape), value], dim=2)
+                    keys.append(key)
+                    values.append(value)
+                past_key_values.append((torch.cat(keys, dim=0), torch.cat(values, dim=0)))
+
+            attention_mask = torch.ones((batch_size, longest + 1), dtype=torch.long, device=device)
+            for i, length in enumerate(cache_lengths):
+                attention_mask[i, :longest - length] = 0
+            input_ids = torch.tensor([[s.token_ids[-1]] for s in sequences], device=device)
+            position_ids = torch.tensor([[length] for length in cache_lengths], device=device)
+
+            outputs = self.model(
+                input_ids=input_ids,
+                past_key_values=tuple(past_key_values),
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                use_cache=True
+            )
+        except Exception as e:
+            logger.error(f"Decode step failed for {batch_size} sequence(s): {e}")
+            self._fail_all(sequences, e)
+            return
+
+        new_past = _to_legacy_cache(outputs.past_key_values)
+        still_active = []
+        for i, (sequence, length) in enumerate(zip(sequences, cache_lengths)):
+            # Slice this sequence's cache back out, dropping its padding
+            start = longest - length
+            try:
+                sequence.past_key_values = tuple(
+                    (key[i:i + 1, :, start:, :], value[i:i + 1, :, start:, :]) for key, value in new_past
+                )
+                self._append_token(sequence, outputs.logits[i, -1])
+                finished = self._is_finished(sequence)
+            except Exception as e:
+                # e.g. a failing stopping criterion or streamer: only this sequence is dropped
+                logger.error(f"Sequence failed after {sequence.num_generated} token(s): {e}")
+                self._fail(sequence, e)
+                continue
+            if not finished:
+                still_active.append(sequence)
+        self._active = still_active
+
+        with self._lock:
+            self._stats["decode_steps"] += 1
+            self._stats["decoded_tokens"] += batch_size
+
+    def _append_token(self, sequence: _Sequence, logits: torch.Tensor):
+        """Choose the next token from the logits using the sequence's sampling settings"""
+        settings = sequence.settings
+        logits = logits.float()
+        if settings["do_sample"]:
+            logits = logits / max(settings["temperature"], 1e-5)
+            if settings["top_k"] > 0:
+                kth_value = torch.topk(logits, min(settings["top_k"], logits.shape[-1])).values[-1]
+                logits = logits.masked_fill(logits < kth_value, float("-inf"))
+            if settings["top_p"] < 1.0:
+                sorted_logits, sorted_indices = torch.sort(logits, descending=True)
+                cumulative = torch.softmax(sorted_logits, dim=-1).cumsum(dim=-1)
+                remove = cumulative > settings["top_p"]
+                # Always keep the most likely token
+                remove[1:] = remove[:-1].clone()
+                remove[0] = False
+                logits = logits.masked_fill(remove.scatter(0, sorted_indices, remove), float("-inf"))
+            next_token = int(torch.multinomial(torch.softmax(logits, dim=-1), 1))
+        else:
+            next_token = int(torch.argmax(logits))
+
+        sequence.token_ids.append(next_token)
+        sequence.last_scores = logits
+        if settings["streamer"] is not None:
+            settings["streamer"].put(torch.tensor([next_token]))
+
+    def _is_finished(self, sequence: _Sequence) -> bool:
+        """Check stop conditions and resolve the sequence's future if it is done"""
+        settings = sequence.settings
+        finished = (
+            sequence.token_ids[-1] in settings["eos_token_ids"]
+            or sequence.num_generated >= settings["max_new_tokens"]
+            or (settings["max_length"] is not None and len(sequence.token_ids) >= settings["max_length"])
+            or len(sequence.token_ids) >= self.max_positions
+        )
+        if not finished and settings["stopping_criteria"]:
+            input_ids = torch.tensor([sequence.token_ids])
+            scores = sequence.last_scores.unsqueeze(0)
+            finished = any(bool(criterion(input_ids, scores)) for criterion in settings["stopping_criteria"])
+
+        if finished:
+            generated = sequence.token_ids[sequence.prompt_length:]
+            if generated and generated[-1] in settings["eos_token_ids"]:
+                generated = generated[:-1]
+            sequence.past_key_values = None
+            if settings["streamer"] is not None:
+                settings["streamer"].end()
+            with self._lock:
+                self._stats["completed"] += 1
+            sequence.future.set_result(self.tokenizer.decode(generated, skip_special_tokens=True))
+        return finished
+
+    def _fail(self, sequence: _Sequence, error: Exception):
+        sequence.past_key_values = None
+        if sequence.settings["streamer"] is not None:
+            try:
+                sequence.settings["streamer"].end()
+            except Exception as e:
+                logger.warning(f"Could not close the streamer of a failed sequence: {e}")
+        with self._lock:
+            self._stats["failed"] += 1
+        if not sequence.future.done():
+            sequence.future.set_exception(error)
+
+    def _fail_all(self, sequences: List[_Sequence], error: Exception):
+        """Fail `sequences` and drop them (and anything else) from the active batch"""
+        for sequence in list(sequences):
+            self._fail(sequence, error)
+        self._active = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get engine counters, including the average number of sequences per decode step"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["active"] = len(self._active)
+        stats["waiting"] = self._pending.qsize()
+        stats["max_active"] = self.max_active
+        stats["average_active"] = round(stats["decoded_tokens"] / stats["decode_steps"], 2) if stats["decode_steps"] else 0
+        return stats
@@ -14,9 +14,16 @@ This module handles all data loading operations including:
 import os
 import json
 import logging
-from typing import List, Dict, Any, Optional
+import itertools
+from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 
+from keyword_matcher import KeywordAutomaton
+from facility_resolver import get_facility_resolver
+from spell_corrector import build_spell_corrector, register_keywords
+from query_parser import ParsedQuery, parse_query
+from faq_index import faq_answers, build_faq_embedding_index
+
 # Get the project root directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -30,6 +37,24 @@ except ImportError:
 
 logger = logging.getLogger("data_loader")
 
+# Subtopic keyword mapping, in priority order (FAQ items are filed under the first match)
+SUBTOPIC_KEYWORDS = {
+    "facilities": ["facility", "facilities", "space", "room", "lounge", "xr", "meeting", "research", "seasonal"],
+    "pricing": ["price", "cost", "fee", "rental", "charge", "rate", "pricing", "收費", "租金", "預約", "費用"],
+    "equipment": ["equipment", "hardware", "device", "machine", "projector", "gpu", "workstation"],
+    "software": ["software", "program", "application", "tool", "unreal", "unity", "touchdesigner"],
+    "staff": ["staff", "team", "dr.", "mr.", "engineer", "coordinator", "practitioner", "aiden", "jenny", "kal", "lawrence"],
+    "internships": ["intern", "internship", "position", "job", "apply"],
+    "events": ["event", "activity", "lecture", "workshop", "series", "exhibition", "presentation"],
+    "policies": ["policy", "requirement", "responsibility", "neutral", "reservation", "rule", "guideline", "clean", "damage", "safety", "emergency"],
+    "tools": ["tool", "ai", "ollama", "chatgpt", "notion", "perplexity", "dall", "canva", "designer", "slidesgo", "slidesai", "synthesia", "natural readers", "atlhpc", "hpc", "gpu", "server"],
+}
+_subtopic_matcher = KeywordAutomaton(SUBTOPIC_KEYWORDS)
+register_keywords(SUBTOPIC_KEYWORDS)
+
+# Every data load gets a new version; memoized responses are keyed on it
+_data_versions = itertools.count(1)
+
 class InformationFeed:
     """Enhanced feed method to provide accurate base information to the model with RAG integration"""
     
@@ -54,12 +79,48 @@ class InformationFeed:
         self.base_info_en = self._load_base_information('Arts_Tech_Lab_en.json')
         self.faq_data = self._load_faq_data()
         self.website_data = self._load_website_data()
+        self.facility_resolver = get_facility_resolver(
+            self.base_info_en.get("facilities", {}), self._facility_aliases(self.base_info_en)
+        )
+        # Typo correction vocabulary: everything the chatbot knows about
+        self.spell_corrector = build_spell_corrector(self.base_info_en, self.subtopics, self._load_chunk_texts())
+        # Known FAQ questions are answered straight from this table
+        faq_answers.rebuild(self.subtopics)
+        # Question embeddings per subtopic for picking context Q&A (read from disk when unchanged)
+        self.faq_embeddings = build_faq_embedding_index(self.subtopics)
+        self.data_version = next(_data_versions)
         # Reset MiniLM checkpoint/embeddings
         global _MINILM_FACILITY_EMBS, _MINILM_FACILITY_ALIASES
         _MINILM_FACILITY_EMBS = None
         _MINILM_FACILITY_ALIASES = None
+        # Cached answers were built from the old data
+        from semantic_cache import response_cache
+        from fragment_cache import response_fragments
+        response_cache.clear()
+        response_fragments.clear()
         print("[INFO] All data and semantic search checkpoints reloaded.")
     
+    @staticmethod
+    def _facility_aliases(base_info) -> Dict[str, str]:
+        """Alternative names listed under a facility's "aliases", mapped to the facility"""
+        aliases = {}
+        for name, info in base_info.get("facilities", {}).items():
+            for alias in info.get("aliases", []) if isinstance(info, dict) else []:
+                aliases[alias] = name
+        return aliases
+    
+    def _load_chunk_texts(self) -> List[str]:
+        """Content of the scraped RAG chunks (read directly; the RAG retriever loads after the base data)"""
+        chunks_path = os.path.join(BASE_DIR, "data", "rag_data", "chunks.json")
+        if not os.path.exists(chunks_path):
+            return []
+        try:
+            with open(chunks_path, 'r', encoding='utf-8') as f:
+                return [chunk.get("content", "") for chunk in json.load(f)]
+        except Exception as e:
+            logger.error(f"Error loading RAG chunks: {e}")
+            return []
+    
     def _load_base_information(self, filename) -> Dict[str, Any]:
         """Load accurate base information about ATL including pricing and rental details"""
         base_info = {
@@ -191,28 +252,8 @@ class InformationFeed:
                     for item in faq_data:
                         if "conversations" in item and len(item["conversations"]) >= 2:
                             q = item["conversations"][0]["content"].lower()
-                            a = item["conversations"][1]["content"].lower()
-                            # Heuristic subtopic assignment
-                            if any(k in q for k in ["facility", "room", "space", "lounge", "xr", "meeting", "research", "seasonal"]):
-                                self.subtopics["facilities"].append(item)
-                            elif any(k in q for k in ["price", "cost", "fee", "rental", "charge", "rate", "pricing", "收費", "租金", "預約", "費用"]):
-                                self.subtopics["pricing"].append(item)
-                            elif any(k in q for k in ["equipment", "hardware", "device", "machine", "projector", "gpu", "workstation"]):
-                                self.subtopics["equipment"].append(item)
-                            elif any(k in q for k in ["software", "program", "application", "tool", "unreal", "unity", "touchdesigner"]):
-                                self.subtopics["software"].append(item)
-                            elif any(k in q for k in ["staff", "team", "dr.", "mr.", "engineer", "coordinator", "practitioner", "aiden", "jenny", "kal", "lawrence"]):
-                                self.subtopics["staff"].append(item)
-                            elif any(k in q for k in ["intern", "internship", "position", "job", "apply"]):
-                                self.subtopics["internships"].append(item)
-                            elif any(k in q for k in ["event", "activity", "lecture", "workshop", "series", "exhibition", "presentation"]):
-                                self.subtopics["events"].append(item)
-                            elif any(k in q for k in ["policy", "requirement", "responsibility", "neutral", "reservation", "rule", "guideline", "clean", "damage", "safety", "emergency"]):
-                                self.subtopics["policies"].append(item)
-                            elif any(k in q for k in ["tool", "ai", "ollama", "chatgpt", "notion", "perplexity", "dall", "canva", "designer", "slidesgo", "slidesai", "synthesia", "natural readers", "atlhpc", "hpc", "gpu", "server"]):
-                                self.subtopics["tools"].append(item)
-                            else:
-                                self.subtopics["general"].append(item)
+                            # Heuristic subtopic assignment: first subtopic with a keyword in the question
+                            self.subtopics[_subtopic_matcher.first_match(q, "general")].append(item)
             except Exception as e:
                 logger.error(f"Error loading FAQ data: {e}")
         
@@ -229,28 +270,8 @@ class InformationFeed:
                     for item in web_info.get("conversations", []):
                         if "conversations" in item and len(item["conversations"]) >= 2:
                             q = item["conversations"][0]["content"].lower()
-                            a = item["conversations"][1]["content"].lower()
-                            # Use same heuristics as above
-                            if any(k in q for k in ["facility", "room", "space", "lounge", "xr", "meeting", "research", "seasonal"]):
-                                self.subtopics["facilities"].append(item)
-                            elif any(k in q for k in ["price", "cost", "fee", "rental", "charge", "rate", "pricing", "收費", "租金", "預約", "費用"]):
-                                self.subtopics["pricing"].append(item)
-                            elif any(k in q for k in ["equipment", "hardware", "device", "machine", "projector", "gpu", "workstation"]):
-                                self.subtopics["equipment"].append(item)
-                            elif any(k in q for k in ["software", "program", "application", "tool", "unreal", "unity", "touchdesigner"]):
-                                self.subtopics["software"].append(item)
-                            elif any(k in q for k in ["staff", "team", "dr.", "mr.", "engineer", "coordinator", "practitioner", "aiden", "jenny", "kal", "lawrence"]):
-                                self.subtopics["staff"].append(item)
-                            elif any(k in q for k in ["intern", "internship", "position", "job", "apply"]):
-                                self.subtopics["internships"].append(item)
-                            elif any(k in q for k in ["event", "activity", "lecture", "workshop", "series", "exhibition", "presentation"]):
-                                self.subtopics["events"].append(item)
-                            elif any(k in q for k in ["policy", "requirement", "responsibility", "neutral", "reservation", "rule", "guideline", "clean", "damage", "safety", "emergency"]):
-                                self.subtopics["policies"].append(item)
-                            elif any(k in q for k in ["tool", "ai", "ollama", "chatgpt", "notion", "perplexity", "dall", "canva", "designer", "slidesgo", "slidesai", "synthesia", "natural readers", "atlhpc", "hpc", "gpu", "server"]):
-                                self.subtopics["tools"].append(item)
-                            else:
-                                self.subtopics["general"].append(item)
+                            # Heuristic subtopic assignment: first subtopic with a keyword in the question
+                            self.subtopics[_subtopic_matcher.first_match(q, "general")].append(item)
             except Exception as e:
                 logger.error(f"Error loading website info data: {e}")
         
@@ -272,9 +293,10 @@ class InformationFeed:
         
         return website_data
     
-    def get_context_for_question(self, question: str) -> str:
+    def get_context_for_question(self, question: Union[str, ParsedQuery]) -> str:
         """Get comprehensive context information for a specific question with RAG integration and detailed subtopic Q&A. Always include full facility details if a facility is detected."""
-        question_lower = question.lower()
+        query = parse_query(question)
+        question_lower = query.lower
         base_info = self.get_base_info('english')
         context_parts = []
 
@@ -290,30 +312,15 @@ class InformationFeed:
         # Add RAG retrieved information if available (limit to 1 chunk for speed)
         if self.rag_available and self.rag_retriever:
             try:
-                rag_context = self.rag_retriever.get_context_for_query(question, max_chunks=1)
+                rag_context = self.rag_retriever.get_context_for_query(query, max_chunks=1)
                 if rag_context:
                     context_parts.append(f"\n{rag_context}")
             except Exception as e:
                 logger.error(f"Error using RAG system: {e}")
 
-        # Subtopic keyword mapping
-        subtopic_keywords = {
-            "facilities": ["facility", "facilities", "space", "room", "lounge", "xr", "meeting", "research", "seasonal"],
-            "pricing": ["price", "cost", "fee", "rental", "charge", "rate", "pricing", "收費", "租金", "預約", "費用"],
-            "equipment": ["equipment", "hardware", "device", "machine", "projector", "gpu", "workstation"],
-            "software": ["software", "program", "application", "tool", "unreal", "unity", "touchdesigner"],
-            "staff": ["staff", "team", "dr.", "mr.", "engineer", "coordinator", "practitioner", "aiden", "jenny", "kal", "lawrence"],
-            "internships": ["intern", "internship", "position", "job", "apply"],
-            "events": ["event", "activity", "lecture", "workshop", "series", "exhibition", "presentation"],
-            "policies": ["policy", "requirement", "responsibility", "neutral", "reservation", "rule", "guideline", "clean", "damage", "safety", "emergency"],
-            "tools": ["tool", "ai", "ollama", "chatgpt", "notion", "perplexity", "dall", "canva", "designer", "slidesgo", "slidesai", "synthesia", "natural readers", "atlhpc", "hpc", "gpu", "server"],
-        }
-
         # Detect relevant subtopics
-        matched_subtopics = []
-        for subtopic, keywords in subtopic_keywords.items():
-            if any(k in question_lower for k in keywords):
-                matched_subtopics.append(subtopic)
+        subtopic_hits = query.hits(_subtopic_matcher)
+        matched_subtopics = [subtopic for subtopic in SUBTOPIC_KEYWORDS if subtopic in subtopic_hits]
 
         # If no subtopic matched, treat as general/broad
         if not matched_subtopics:
@@ -326,71 +333,23 @@ class InformationFeed:
             context_parts.append("Ask about specific topics for detailed information.")
 
         # Always include full facility details if a facility is detected
-        # --- New: Direct, substring, and fuzzy match on facility keys ---
-        def find_facility_key(facilities_dict, target_name):
-            for key in facilities_dict.keys():
-                if key.lower() == target_name.lower():
-                    return key
-            for key in facilities_dict.keys():
-                if target_name.lower() in key.lower() or key.lower() in target_name.lower():
-                    return key
-            import difflib
-            keys_lower = [k.lower() for k in facilities_dict.keys()]
-            match = difflib.get_close_matches(target_name.lower(), keys_lower, n=1, cutoff=0.5)
-            if match:
-                idx = keys_lower.index(match[0])
-                return list(facilities_dict.keys())[idx]
-            return None
-
-        # Try to extract a facility name from the question
+        # (exact, substring, then fuzzy match via the resolver built at data load)
         facilities = base_info.get("facilities", {})
-        fallback_info = self.base_info_en if base_info != self.base_info_en else {}
-        facilities_other = fallback_info.get("facilities", {})
-        found_facility_key = None
-        for key in facilities.keys():
-            if key.lower() in question_lower or question_lower in key.lower():
-                found_facility_key = key
-                break
-        if not found_facility_key:
-            for key in facilities_other.keys():
-                if key.lower() in question_lower or question_lower in key.lower():
-                    found_facility_key = key
-                    break
-        if not found_facility_key:
-            # Fuzzy match as last resort
-            import difflib
-            keys_lower = [k.lower() for k in facilities.keys()]
-            match = difflib.get_close_matches(question_lower, keys_lower, n=1, cutoff=0.5)
-            if match:
-                idx = keys_lower.index(match[0])
-                found_facility_key = list(facilities.keys())[idx]
-        if not found_facility_key:
-            keys_lower = [k.lower() for k in facilities_other.keys()]
-            match = difflib.get_close_matches(question_lower, keys_lower, n=1, cutoff=0.5)
-            if match:
-                idx = keys_lower.index(match[0])
-                found_facility_key = list(facilities_other.keys())[idx]
+        found_facility_key = self.facility_resolver.resolve(question_lower, cutoff=0.5)
         if found_facility_key:
             # Add full facility details
-            facility_info = facilities.get(found_facility_key) or facilities_other.get(found_facility_key)
+            facility_info = facilities.get(found_facility_key)
             context_parts.append(f"\n=== FULL DETAILS FOR {found_facility_key.upper()} ===")
             for k, v in facility_info.items():
                 context_parts.append(f"{k}: {v}")
 
         # For each matched subtopic, pull the most relevant Q&A (limit to 2 per subtopic for speed)
+        # Most similar FAQ questions: the question is embedded once, then one product per subtopic matrix
+        top_qas = self.faq_embeddings.top_items(query, matched_subtopics, 2)
         for subtopic in matched_subtopics:
             if hasattr(self, 'subtopics') and self.subtopics.get(subtopic):
                 context_parts.append(f"\n=== {subtopic.upper()} Q&A ===")
-                # Find most relevant Q&A by keyword overlap
-                qas = self.subtopics[subtopic]
-                scored = []
-                for item in qas:
-                    q = item["conversations"][0]["content"].lower()
-                    score = sum(1 for k in question_lower.split() if k in q)
-                    scored.append((score, item))
-                # Sort by score descending, fallback to order
-                scored.sort(key=lambda x: -x[0])
-                for _, item in scored[:2]:  # Reduced from 3 to 2
+                for item in top_qas[subtopic]:
                     context_parts.append(f"Q: {item['conversations'][0]['content']}")
                     context_parts.append(f"A: {item['conversations'][1]['content']}")
 
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Facility Resolver Module for ATL Chatbot
+
+This module resolves free text to a facility name with indexes built once per data load:
+- Exact lookup of the normalized name or alias in a dict
+- Names/aliases contained in the text via an Aho-Corasick trie scan
+- Text contained in a name via character-trigram posting lists
+- Fuzzy matches scored with difflib only on the few names sharing the most trigrams
+"""
+
+import re
+import difflib
+import logging
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+from keyword_matcher import KeywordAutomaton
+
+logger = logging.getLogger("facility_resolver")
+
+# Fuzzy candidates checked with difflib after trigram ranking
+FUZZY_CANDIDATES = 5
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]')
+
+def normalize_name(name: str) -> str:
+    """Lowercase and drop everything but letters and digits ("XR Space" -> "xrspace")"""
+    return _NON_ALNUM.sub('', name.lower())
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class FacilityResolver:
+    """
+    Maps text to one of `facilities` (or an alias of one). Resolution mirrors the old
+    difflib helpers: exact normalized match, then substring either way, then a close
+    match above `cutoff`. Ties go to the facility listed first.
+    """
+
+    def __init__(self, facilities: Iterable[str], aliases: Dict[str, str] = None):
+        self.facilities: List[str] = list(facilities)
+        order = {name: i for i, name in enumerate(self.facilities)}
+
+        # Normalized form -> facility, for every name and alias
+        entries = [(normalize_name(name), name) for name in self.facilities]
+        entries += [(normalize_name(alias), name) for alias, name in (aliases or {}).items() if name in order]
+        self._keys: List[str] = []
+        self._targets: List[str] = []
+        self._exact: Dict[str, str] = {}
+        for key, name in entries:
+            if key and key not in self._exact:
+                self._exact[key] = name
+                self._keys.append(key)
+                self._targets.append(name)
+        self._rank = [order[name] for name in self._targets]
+
+        # Keys inside the text: one scan over a trie of all keys
+        self._contained = KeywordAutomaton({str(i): [key] for i, key in enumerate(self._keys)})
+
+        # Trigram posting sets, for text inside a key and for fuzzy candidates
+        postings: Dict[str, Set[int]] = {}
+        for i, key in enumerate(self._keys):
+            for gram in _trigrams(key):
+                postings.setdefault(gram, set()).add(i)
+        self._postings = {gram: frozenset(ids) for gram, ids in postings.items()}
+        self._num_grams = [len(_trigrams(key)) for key in self._keys]
+
+    def __len__(self):
+        return len(self.facilities)
+
+    def exact(self, text: str) -> Optional[str]:
+        return self._exact.get(normalize_name(text))
+
+    def _first(self, indices: Iterable[int]) -> Optional[str]:
+        best = min(indices, key=lambda i: self._rank[i], default=None)
+        return None if best is None else self._targets[best]
+
+    def substring(self, text: str) -> Optional[str]:
+        """Facility whose name contains the text or is contained in it"""
+        query = normalize_name(text)
+        if not query:
+            return None
+        matches = {int(i) for i in self._contained.scan(query)}
+        grams = _trigrams(query)
+        if grams:
+            # A key containing the query has all of its trigrams
+            lists = sorted((self._postings.get(gram, frozenset()) for gram in grams), key=len)
+            candidates = lists[0].intersection(*lists[1:])
+        else:
+            candidates = range(len(self._keys))
+        matches.update(i for i in candidates if query in self._keys[i])
+        return self._first(matches)
+
+    def fuzzy(self, text: str, cutoff: float = 0.6) -> Optional[str]:
+        """Closest facility by difflib ratio (at least `cutoff`) among the best trigram candidates"""
+        query = normalize_name(text)
+        grams = _trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        # Rank by trigram Dice coefficient, the cheap stand-in for difflib's ratio
+        ranked = sorted(shared, key=lambda i: -shared[i] / (len(grams) + self._num_grams[i]))
+
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(query)  # difflib caches its analysis of the second sequence
+        best, best_ratio = None, cutoff
+        for i in ranked[:FUZZY_CANDIDATES]:
+            key = self._keys[i]
+            # Upper bound on the ratio from the lengths alone (difflib's real_quick_ratio)
+            if 2.0 * min(len(key), len(query)) / (len(key) + len(query)) < best_ratio:
+                continue
+            matcher.set_seq1(key)
+            if matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio < best_ratio:
+                continue
+            if best is None or ratio > best_ratio or self._rank[i] < self._rank[best]:
+                best, best_ratio = i, ratio
+        return None if best is None else self._targets[best]
+
+    def resolve(self, text: str, cutoff: float = 0.6) -> Optional[str]:
+        """Exact, then substring, then fuzzy match; None when nothing is close enough"""
+        if not text:
+            return None
+        return self.exact(text) or self.substring(text) or self.fuzzy(text, cutoff)
+
+@lru_cache(maxsize=8)
+def _resolver_for(names: tuple, aliases: tuple) -> FacilityResolver:
+    return FacilityResolver(names, dict(aliases))
+
+def get_facility_resolver(facilities, aliases: Dict[str, str] = None) -> FacilityResolver:
+    """Resolver for a facilities dict (or name list), built once per distinct set of names"""
+    return _resolver_for(tuple(facilities), tuple(sorted((aliases or {}).items())))
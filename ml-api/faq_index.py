@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+FAQ Index Module for ATL Chatbot
+
+This module compiles the FAQ questions (website_conversations.json, website_info.js)
+into a table that answers known questions directly:
+- Exact matches: a hash table keyed on the normalized question (letters and digits only)
+- Near matches: MinHash signatures of each question's words in LSH buckets; candidates
+  are confirmed with their exact word-set Jaccard similarity, may differ only in filler
+  words (never negations or names) and must be about the same facility
+- Rebuilt by InformationFeed.reload_all_data whenever the FAQ data is loaded
+- Metrics on how many lookups (and so requests) are served from the table
+- An embedding index of the questions per subtopic (one normalised NumPy matrix each)
+  ranks the Q&A pairs added to prompt contexts with one matrix-vector product; the
+  matrices are saved to disk and reused while the questions and embedder are unchanged;
+  reusing them never loads the embedding model, and their vector size is checked against
+  the first question embedded at serving time
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from near_duplicates import minhash_signatures, lsh_band_keys
+from query_parser import ParsedQuery, parse_query
+from semantic_cache import HashingEmbedder, create_embedder
+
+logger = logging.getLogger("faq_index")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAQ_EMBEDDINGS_PATH = os.environ.get(
+    "FAQ_EMBEDDINGS_PATH", os.path.join(BASE_DIR, "data", "models", "faq_embeddings.npz")
+)
+# Question embedder: "model" or "hashing" (see semantic_cache); defaults to SEMANTIC_CACHE_EMBEDDER
+FAQ_EMBEDDER = os.environ.get("FAQ_EMBEDDER")
+
+# Word-set Jaccard similarity a near match needs (distinct FAQ questions overlap at most ~0.73);
+# above 1 only exact matches are served
+FAQ_NEAR_MATCH_THRESHOLD = float(os.environ.get("FAQ_NEAR_MATCH_THRESHOLD", "0.8"))
+
+# Words a near match may add or drop: they don't change what is asked. Negations, question
+# words and names are deliberately absent ("can"/"cannot", "Lounge"/"XR Space" get different answers).
+FILLER_WORDS = frozenset({
+    "a", "an", "the", "of", "to", "in", "on", "at", "for", "from", "by", "with", "about", "into", "as",
+    "and", "or", "is", "are", "was", "were", "be", "been", "am", "do", "does", "did", "i", "you", "we",
+    "my", "your", "our", "me", "us", "it", "its", "this", "that", "these", "those", "there", "please",
+    "any", "some", "so", "just", "also", "s",
+})
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+def _words(text: str) -> List[str]:
+    return _WORD_PATTERN.findall(text.lower())
+
+class FAQAnswerTable:
+    """FAQ questions compiled for exact (normalized key) and near (MinHash/LSH) lookup"""
+
+    def __init__(self, threshold: float = FAQ_NEAR_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._exact: Dict[str, int] = {}
+        self._vocabulary: Dict[str, int] = {}
+        self._word_sets: List[frozenset] = []
+        self._buckets: List[Dict[int, List[int]]] = []
+        self._stats = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "near_rejected": 0, "rebuilds": 0,
+                       "lookup_seconds": 0.0}
+
+    def rebuild(self, subtopics: Dict[str, List[Dict]]):
+        """Compile every FAQ question in `subtopics` (InformationFeed.subtopics); the first answer to a question wins"""
+        from facility_resolver import normalize_name
+
+        entries, exact = [], {}
+        for subtopic, items in subtopics.items():
+            for item in items:
+                question = item["conversations"][0]["content"]
+                key = normalize_name(question)
+                if not key or key in exact:
+                    continue
+                exact[key] = len(entries)
+                entries.append({
+                    "index": len(entries),
+                    "question": question,
+                    "answer": item["conversations"][1]["content"],
+                    "subtopic": subtopic,
+                })
+
+        # Word ids in CSR layout, one row per question, for the MinHash signatures
+        vocabulary, word_sets, ids, indptr = {}, [], [], [0]
+        for entry in entries:
+            words = frozenset(_words(entry["question"]))
+            word_sets.append(words)
+            ids.extend(sorted(vocabulary.setdefault(word, len(vocabulary)) for word in words))
+            indptr.append(len(ids))
+        buckets = []
+        if entries:
+            band_keys = lsh_band_keys(minhash_signatures(np.array(indptr), np.array(ids, dtype=np.int64)))
+            for keys in band_keys.T:
+                band = {}
+                for i, key in enumerate(keys.tolist()):
+                    if word_sets[i]:
+                        band.setdefault(key, []).append(i)
+                buckets.append(band)
+
+        with self._lock:
+            self._entries, self._exact = entries, exact
+            self._vocabulary, self._word_sets, self._buckets = vocabulary, word_sets, buckets
+            self._stats["rebuilds"] += 1
+        logger.info(f"FAQ answer table: {len(entries)} questions, {len(vocabulary)} words")
+
+    def _near_match(self, text: str):
+        words = frozenset(_words(text))
+        ids = sorted(self._vocabulary[word] for word in words if word in self._vocabulary)
+        if not ids or not self._buckets:
+            return None, 0.0
+        keys = lsh_band_keys(minhash_signatures(np.array([0, len(ids)]), np.array(ids, dtype=np.int64)))[0]
+        candidates = set()
+        for band, key in zip(self._buckets, keys.tolist()):
+            candidates.update(band.get(key, ()))
+        best, best_similarity = None, 0.0
+        for i in sorted(candidates):
+            candidate = self._word_sets[i]
+            similarity = len(words & candidate) / len(words | candidate)
+            if similarity > best_similarity:
+                best, best_similarity = i, similarity
+        return best, best_similarity
+
+    @staticmethod
+    def _same_question(query: ParsedQuery, entry: Dict[str, Any], candidate_words: frozenset, facility_resolver) -> bool:
+        """Whether a near match asks the same thing: only filler words differ, and it names the same facility"""
+        if not (frozenset(_words(query.lower)) ^ candidate_words) <= FILLER_WORDS:
+            return False
+        if facility_resolver is not None:
+            return facility_resolver.resolve(query.text) == facility_resolver.resolve(entry["question"])
+        return True
+
+    def lookup(self, question: Union[str, ParsedQuery], facility_resolver=None) -> Optional[Dict[str, Any]]:
+        """
+        The FAQ entry (question, answer, subtopic, index) for `question`, with "match"
+        ("exact" or "near") and "similarity" added; None when no FAQ question is close enough.
+        With a `facility_resolver` (InformationFeed.facility_resolver), near matches must
+        resolve to the same facility as the FAQ question.
+        """
+        query = parse_query(question)
+        start = time.perf_counter()
+        match, similarity, rejected = None, 0.0, False
+        with self._lock:
+            index = self._exact.get(query.normalized) if query.normalized else None
+            if index is not None:
+                match, similarity = "exact", 1.0
+            elif self.threshold <= 1.0:
+                index, similarity = self._near_match(query.lower)
+                if index is not None and similarity >= self.threshold:
+                    match = "near"
+            entry = self._entries[index] if match else None
+            candidate_words = self._word_sets[index] if match == "near" else None
+        if match == "near" and not self._same_question(query, entry, candidate_words, facility_resolver):
+            match, entry, rejected = None, None, True
+        with self._lock:
+            self._stats["lookups"] += 1
+            if match:
+                self._stats[f"{match}_hits"] += 1
+            if rejected:
+                self._stats["near_rejected"] += 1
+            self._stats["lookup_seconds"] += time.perf_counter() - start
+        if entry is None:
+            return None
+        return dict(entry, match=match, similarity=round(similarity, 3))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Share of lookups answered from the table, split into exact and near matches"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["lookups"]
+        stats["threshold"] = self.threshold
+        stats["served_fraction"] = round((stats["exact_hits"] + stats["near_hits"]) / lookups, 3) if lookups else 0.0
+        stats["mean_lookup_ms"] = round(stats.pop("lookup_seconds") / lookups * 1000, 3) if lookups else 0.0
+        return stats
+
+# Global table, rebuilt by every data load (like response_cache, it outlives InformationFeed reloads)
+faq_answers = FAQAnswerTable()
+
+def _question(item: Dict) -> str:
+    return item["conversations"][0]["content"]
+
+class FAQEmbeddingIndex:
+    """
+    Per-subtopic matrices of L2-normalised FAQ question embeddings. Ranking a subtopic's
+    Q&A pairs is one matrix-vector product (cosine similarity) with the question's embedding.
+    """
+
+    def __init__(self, subtopics: Dict[str, List[Dict]], embedder, matrices: Dict[str, np.ndarray],
+                 path: Optional[str] = None, fingerprint: Optional[str] = None):
+        self.subtopics = subtopics
+        self.embedder = embedder
+        self.matrices = matrices
+        self.path = path
+        self._fingerprint = fingerprint
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(subtopics: Dict[str, List[Dict]], embedder) -> str:
+        """
+        Identifies the questions and embedder (kind, model checkpoint, configured vector size)
+        a saved index was built from. Computing it must not load the embedding model.
+        """
+        digest = hashlib.sha1(f"{getattr(embedder, 'name', type(embedder).__name__)}:"
+                              f"{getattr(embedder, 'model_name', '')}:{getattr(embedder, 'dim', '')}".encode())
+        for subtopic, items in subtopics.items():
+            digest.update(f"\0{subtopic}".encode("utf-8"))
+            for item in items:
+                digest.update(f"\n{_question(item)}".encode("utf-8"))
+        return digest.hexdigest()
+
+    @classmethod
+    def build(cls, subtopics: Dict[str, List[Dict]], embedder, path: Optional[str] = FAQ_EMBEDDINGS_PATH) -> "FAQEmbeddingIndex":
+        """Load the saved matrices for these questions from `path`, or embed the questions and save them"""
+        fingerprint = cls.fingerprint(subtopics, embedder)
+        matrices = cls._load(path, fingerprint) if path else None
+        if matrices is None:
+            matrices = cls._embed_questions(subtopics, embedder)
+            if path:
+                cls._save(path, fingerprint, matrices)
+        return cls(subtopics, embedder, matrices, path, fingerprint)
+
+    @staticmethod
+    def _embed_questions(subtopics: Dict[str, List[Dict]], embedder) -> Dict[str, np.ndarray]:
+        start = time.perf_counter()
+        matrices = {
+            subtopic: np.vstack([embedder.embed(_question(item).lower()) for item in items]).astype(np.float32)
+            for subtopic, items in subtopics.items() if items
+        }
+        logger.info(f"Embedded {sum(len(m) for m in matrices.values())} FAQ questions "
+                    f"in {time.perf_counter() - start:.2f}s")
+        return matrices
+
+    @staticmethod
+    def _load(path: str, fingerprint: str) -> Optional[Dict[str, np.ndarray]]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["fingerprint"]) != fingerprint:
+                    return None
+                matrices = {name[len("subtopic_"):]: data[name] for name in data.files if name.startswith("subtopic_")}
+            if len({matrix.shape[1] for matrix in matrices.values()}) > 1:
+                logger.warning(f"FAQ embeddings in {path} have mixed vector sizes, embedding again")
+                return None
+            return matrices
+        except Exception as e:
+            logger.warning(f"Could not read FAQ embeddings from {path}: {e}")
+            return None
+
+    @staticmethod
+    def _save(path: str, fingerprint: str, matrices: Dict[str, np.ndarray]):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "wb") as f:
+                np.savez(f, fingerprint=np.array(fingerprint),
+                         **{f"subtopic_{subtopic}": matrix for subtopic, matrix in matrices.items()})
+            os.replace(temp_path, path)
+        except OSError as e:
+            # Read-only deployments just embed again on the next start
+            logger.warning(f"Could not save FAQ embeddings to {path}: {e}")
+
+    def _check_vector_size(self, size: int):
+        """Embed the questions again if the loaded matrices don't match the embedder's vector size"""
+        if all(matrix.shape[1] == size for matrix in self.matrices.values()):
+            return
+        with self._lock:
+            if all(matrix.shape[1] == size for matrix in self.matrices.values()):
+                return
+            logger.warning(f"Saved FAQ embeddings don't match the embedder's {size}-d vectors, embedding again")
+            matrices = self._embed_questions(self.subtopics, self.embedder)
+            if self.path:
+                self._save(self.path, self._fingerprint, matrices)
+            self.matrices = matrices
+
+    def top_items(self, question: Union[str, ParsedQuery], subtopics: Sequence[str], k: int = 2) -> Dict[str, List[Dict]]:
+        """
+        The `k` Q&A items of each subtopic whose questions are most similar to `question`
+        (ties keep file order). Without an embedder they are ranked by keyword overlap.
+        """
+        query = parse_query(question)
+        vector = None
+        if self.embedder is not None:
+            try:
+                vector = self.embedder.embed(query.lower)
+                self._check_vector_size(len(vector))
+            except Exception as e:
+                logger.warning(f"FAQ question embedding failed, ranking by keyword overlap: {e}")
+        top = {}
+        for subtopic in subtopics:
+            items = self.subtopics.get(subtopic) or []
+            matrix = self.matrices.get(subtopic)
+            if vector is not None and matrix is not None and matrix.shape == (len(items), len(vector)):
+                order = np.argsort(-(matrix @ vector), kind="stable")[:k]
+            else:
+                # Old ranking: how many of the question's words appear in each FAQ question
+                scores = [sum(1 for token in query.tokens if token in _question(item).lower()) for item in items]
+                order = sorted(range(len(items)), key=lambda i: -scores[i])[:k]
+            top[subtopic] = [items[i] for i in order]
+        return top
+
+def build_faq_embedding_index(subtopics: Dict[str, List[Dict]], path: Optional[str] = FAQ_EMBEDDINGS_PATH) -> FAQEmbeddingIndex:
+    """FAQEmbeddingIndex with the configured embedder, or hashed n-grams if that embedder fails"""
+    embedder = create_embedder(FAQ_EMBEDDER)
+    try:
+        return FAQEmbeddingIndex.build(subtopics, embedder, path)
+    except Exception as e:
+        if isinstance(embedder, HashingEmbedder):
+            raise
+        # Embedder model unavailable (e.g. offline): hashed n-grams need no model
+        logger.warning(f"FAQ question embedder failed ({e}), falling back to hashed n-gram embeddings")
+        return FAQEmbeddingIndex.build(subtopics, HashingEmbedder(), path)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Generation Executor Module for ATL Chatbot
+
+This module runs blocking response generation off the asyncio event loop:
+- Bounded worker thread pool for generation calls
+- Configurable queue depth with fast rejection when full
+- Queue wait vs. compute time metrics
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger("generation_executor")
+
+# Worker threads running generation, and how many more requests may wait for one
+GENERATION_WORKERS = int(os.environ.get("GENERATION_WORKERS", "2"))
+GENERATION_QUEUE_DEPTH = int(os.environ.get("GENERATION_QUEUE_DEPTH", "8"))
+
+# Number of recent requests kept for latency percentiles
+METRICS_WINDOW = 1000
+
+class GenerationQueueFull(Exception):
+    """Raised when every worker is busy and the wait queue is at capacity"""
+
+def _summarize_samples(samples) -> Dict[str, float]:
+    """Summarise latency samples (seconds) into milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    count = len(ordered)
+    return {
+        "count": count,
+        "mean_ms": round(sum(ordered) / count * 1000, 2),
+        "p50_ms": round(ordered[int(0.50 * (count - 1))] * 1000, 2),
+        "p95_ms": round(ordered[int(0.95 * (count - 1))] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2)
+    }
+
+class GenerationExecutor:
+    """Run blocking generation calls in a bounded thread pool"""
+
+    def __init__(self, max_workers: int = None, queue_depth: int = None):
+        self.max_workers = max_workers or GENERATION_WORKERS
+        self.queue_depth = GENERATION_QUEUE_DEPTH if queue_depth is None else queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="generation")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._queue_wait = deque(maxlen=METRICS_WINDOW)
+        self._compute = deque(maxlen=METRICS_WINDOW)
+
+    @property
+    def capacity(self) -> int:
+        """Requests that may be running or waiting at once"""
+        return self.max_workers + self.queue_depth
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._counters["failed"] += 1
+            else:
+                self._counters["completed"] += 1
+
+    def submit(self, fn: Callable, *args, **kwargs) -> "asyncio.Future":
+        """
+        Start fn(*args, **kwargs) on a worker thread and return an awaitable for its result.
+
+        Must be called from the event loop. Rejection happens here, before anything is awaited,
+        so callers can still choose their response (e.g. a 429) before streaming begins.
+
+        Raises:
+            GenerationQueueFull: If the pool and its wait queue are full
+        """
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._counters["rejected"] += 1
+                raise GenerationQueueFull(f"Generation queue full ({self._in_flight}/{self.capacity} in flight)")
+            self._in_flight += 1
+            self._counters["submitted"] += 1
+
+        enqueued_at = time.perf_counter()
+
+        def _job():
+            started_at = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                finished_at = time.perf_counter()
+                with self._lock:
+                    self._queue_wait.append(started_at - enqueued_at)
+                    self._compute.append(finished_at - started_at)
+
+        future = self._executor.submit(_job)
+        # Released when the job finishes or is cancelled, even if the caller went away
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on a worker thread and await its result.
+
+        Raises:
+            GenerationQueueFull: If the pool and its wait queue are full
+        """
+        return await self.submit(fn, *args, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue occupancy, counters and queue-wait/compute latency summaries"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self.queue_depth,
+                "in_flight": self._in_flight,
+                **self._counters,
+                "queue_wait": _summarize_samples(list(self._queue_wait)),
+                "compute": _summarize_samples(list(self._compute))
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work and shut down the worker threads"""
+        self._executor.shutdown(wait=wait)
+
+# Global instance
+generation_executor = GenerationExecutor()
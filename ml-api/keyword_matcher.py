@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Keyword Matcher Module for ATL Chatbot
+
+This module matches many keyword lists against a query in a single pass:
+- Keyword lists are grouped by category (intent, subtopic, link, ...)
+- All keywords are compiled once into an Aho-Corasick automaton
+- One scan of the text returns every keyword hit, grouped by category,
+  in time linear in the text length regardless of how many keywords there are
+- Hits use the same substring semantics as `keyword in text`
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over categorised keywords.
+
+    The failure links are folded into a full transition table at build time,
+    so scanning costs one dict lookup per character. Each state also carries
+    the (category, keyword) pairs that end there, including those reached
+    through failure links, so overlapping keywords ("tool", "tools") all match.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self.categories = {category: tuple(keywords) for category, keywords in categories.items()}
+        self._build()
+
+    def _build(self):
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[Set[Tuple[str, str]]] = [set()]
+
+        # Trie of all keywords
+        for category, keywords in self.categories.items():
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                state = 0
+                for char in keyword:
+                    if char not in goto[state]:
+                        goto.append({})
+                        outputs.append(set())
+                        goto[state][char] = len(goto) - 1
+                    state = goto[state][char]
+                outputs[state].add((category, keyword))
+
+        # Breadth-first failure links, folded into the transitions
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])]
+        delta.extend({} for _ in range(len(goto) - 1))
+        queue = list(goto[0].values())
+        for state in queue:
+            delta[state] = dict(delta[fail[state]])
+            delta[state].update(goto[state])
+            outputs[state] |= outputs[fail[state]]
+            for char, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(char, 0)
+                queue.append(child)
+
+        self._delta = delta
+        self._outputs = [tuple(output) for output in outputs]
+        self.num_states = len(goto)
+
+    def scan(self, text: str) -> Dict[str, Set[str]]:
+        """Return {category: matched keywords} for every keyword occurring in `text`"""
+        delta = self._delta
+        outputs = self._outputs
+        state = 0
+        visited = set()
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                visited.add(state)
+
+        hits: Dict[str, Set[str]] = {}
+        for state in visited:
+            for category, keyword in outputs[state]:
+                hits.setdefault(category, set()).add(keyword)
+        return hits
+
+    def first_match(self, text: str, default: str = None) -> str:
+        """The first category (in definition order) with a hit in `text`, or `default`"""
+        hits = self.scan(text)
+        return next((category for category in self.categories if category in hits), default)
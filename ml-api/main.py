@@ -15,6 +15,7 @@ from typing import Optional, Dict, Any
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 # Add current directory to path for imports
@@ -47,12 +48,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+from generation_executor import generation_executor, GenerationQueueFull
+from token_streaming import TokenStream, run_with_token_stream, format_sse
+
 # Copy ML components from original API
 try:
     # Copy these files from /api/src/ to /ml-api/
     from response_generators import generate_lightweight_response
     from data_loader import InformationFeed
-    from model_manager import load_model
+    from model_manager import load_model, start_background_load, get_model_readiness, get_model_info
+    from response_generators import warm_response_fragments
+    from semantic_cache import response_cache
+    from fragment_cache import response_fragments
+    from faq_index import faq_answers
     ML_AVAILABLE = True
 except ImportError as e:
     logger.error(f"ML components not available: {e}")
@@ -72,13 +80,16 @@ def initialize_ml_components():
         return False
     
     try:
-        logger.info("Initializing InformationFeed...")
-        info_feed = InformationFeed()
-        logger.info("InformationFeed initialized successfully")
+        # Already built when a preforking launcher ran startup before forking this worker
+        if info_feed is None:
+            logger.info("Initializing InformationFeed...")
+            info_feed = InformationFeed()
+            logger.info("InformationFeed initialized successfully")
+            warm_response_fragments(info_feed)
         
-        logger.info("Loading model...")
-        model, tokenizer = load_model(lightweight_mode=True)
-        logger.info("Model loaded successfully")
+        # Load the model in a worker thread; requests use the rule-based path until it is ready
+        logger.info("Starting background model load...")
+        start_background_load(lightweight_mode=True)
         
         return True
     except Exception as e:
@@ -86,6 +97,15 @@ def initialize_ml_components():
         logger.error(traceback.format_exc())
         return False
 
+def get_ready_model():
+    """Return the preloaded model, or None while it is still loading"""
+    global model, tokenizer
+    
+    if model is None and ML_AVAILABLE and get_model_readiness()["status"] == "ready":
+        model, tokenizer = load_model(lightweight_mode=True)
+        logger.info("Model loaded successfully")
+    return model
+
 # Request/Response models
 class MLChatRequest(BaseModel):
     message: str
@@ -96,7 +116,7 @@ class MLChatResponse(BaseModel):
     response: str
     session_id: Optional[str] = None
     timestamp: str
-    source: str  # "ml" or "fallback"
+    source: str  # "ml", "rules" (model still loading) or "fallback"
     metadata: Optional[Dict[str, Any]] = None
 
 @app.on_event("startup")
@@ -105,7 +125,7 @@ async def startup_event():
     logger.info("Starting ML API initialization...")
     success = initialize_ml_components()
     if success:
-        logger.info("✅ ML API ready with full capabilities")
+        logger.info("✅ ML API accepting requests (model warming up in background)")
     else:
         logger.warning("⚠️ ML API running with fallback responses")
 
@@ -114,18 +134,34 @@ async def root():
     return {
         "message": "ATL ML Chatbot API is running",
         "status": "healthy",
-        "ml_available": ML_AVAILABLE and model is not None
+        "ml_available": ML_AVAILABLE and get_ready_model() is not None
     }
 
 @app.get("/health")
 async def health_check():
+    # Liveness is always "healthy" once we answer; readiness tracks the model load
+    readiness = get_model_readiness() if ML_AVAILABLE else {"status": "unavailable"}
     return {
         "status": "healthy",
-        "ml_available": ML_AVAILABLE and model is not None,
+        "ready": readiness["status"] == "ready",
+        "ml_available": ML_AVAILABLE and get_ready_model() is not None,
+        "readiness": readiness,
         "timestamp": str(datetime.now()),
         "service": "ATL ML Chatbot API"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Generation queue metrics: occupancy, rejections, queue wait vs. compute time"""
+    return {
+        "timestamp": str(datetime.now()),
+        "generation": generation_executor.get_stats(),
+        "model": get_model_info() if ML_AVAILABLE else {"status": "No model loaded"},
+        "response_cache": response_cache.get_stats() if ML_AVAILABLE else None,
+        "response_fragments": response_fragments.get_stats() if ML_AVAILABLE else None,
+        "faq_answers": faq_answers.get_stats() if ML_AVAILABLE else None
+    }
+
 @app.post("/chat", response_model=MLChatResponse)
 async def ml_chat(request: MLChatRequest):
     """
@@ -134,11 +170,17 @@ async def ml_chat(request: MLChatRequest):
     try:
         logger.info(f"Received ML chat request: {request.message}")
         
+        fallback_reason = "ML unavailable or disabled"
+        
         # Try to use ML components first
-        if ML_AVAILABLE and model is not None and info_feed is not None and request.use_ml:
+        if ML_AVAILABLE and info_feed is not None and request.use_ml:
             try:
-                response = generate_lightweight_response(
-                    generator=model,
+                # Don't block on a cold model: use the rule-based path until it is ready
+                generator = get_ready_model()
+                # Generation blocks for seconds; run it on the bounded worker pool, not the event loop
+                response = await generation_executor.run(
+                    generate_lightweight_response,
+                    generator=generator,
                     user_input=request.message,
                     info_feed=info_feed
                 )
@@ -147,13 +189,17 @@ async def ml_chat(request: MLChatRequest):
                     response=response,
                     session_id=request.session_id,
                     timestamp=datetime.now().isoformat(),
-                    source="ml",
+                    source="ml" if generator is not None else "rules",
                     metadata={
-                        "model_used": True,
+                        "model_used": generator is not None,
+                        "model_status": get_model_readiness()["status"],
                         "message_length": len(request.message),
                         "response_length": len(response)
                     }
                 )
+            except GenerationQueueFull as e:
+                logger.warning(f"Generation queue full, using fallback: {e}")
+                fallback_reason = "Generation queue full"
             except Exception as e:
                 logger.error(f"ML processing failed: {e}")
                 # Fall through to fallback
@@ -167,7 +213,7 @@ async def ml_chat(request: MLChatRequest):
             source="fallback",
             metadata={
                 "model_used": False,
-                "fallback_reason": "ML unavailable or disabled"
+                "fallback_reason": fallback_reason
             }
         )
         
@@ -178,6 +224,78 @@ async def ml_chat(request: MLChatRequest):
             detail=f"Chat processing failed: {str(e)}"
         )
 
+@app.post("/chat/stream")
+async def ml_chat_stream(request: MLChatRequest):
+    """
+    Streaming ML chat endpoint (Server-Sent Events)
+    
+    Emits `token` events as the model generates, then a `done` trailer carrying the
+    final post-processed response in the same shape as the /chat response. When that
+    response doesn't use the streamed text, a `discard` event precedes `done`.
+    """
+    logger.info(f"Received streaming ML chat request: {request.message}")
+    
+    fallback_reason = "ML unavailable or disabled"
+    stream = TokenStream()
+    generator = None
+    generation = None
+    if ML_AVAILABLE and info_feed is not None and request.use_ml:
+        generator = get_ready_model()
+        try:
+            generation = generation_executor.submit(
+                run_with_token_stream,
+                stream,
+                generate_lightweight_response,
+                generator=generator,
+                user_input=request.message,
+                info_feed=info_feed
+            )
+        except GenerationQueueFull as e:
+            logger.warning(f"Generation queue full, using fallback: {e}")
+            fallback_reason = "Generation queue full"
+    
+    async def events():
+        response = None
+        if generation is not None:
+            async for chunk in stream:
+                yield format_sse("token", {"text": chunk})
+            try:
+                response = await generation
+            except Exception as e:
+                logger.error(f"ML processing failed: {e}")
+        
+        if response is not None:
+            trailer = MLChatResponse(
+                response=response,
+                session_id=request.session_id,
+                timestamp=datetime.now().isoformat(),
+                source="ml" if generator is not None else "rules",
+                metadata={
+                    "model_used": generator is not None,
+                    "model_status": get_model_readiness()["status"],
+                    "message_length": len(request.message),
+                    "response_length": len(response),
+                    "streamed_chunks": stream.chunks
+                }
+            )
+        else:
+            trailer = MLChatResponse(
+                response=generate_fallback_response(request.message),
+                session_id=request.session_id,
+                timestamp=datetime.now().isoformat(),
+                source="fallback",
+                metadata={
+                    "model_used": False,
+                    "fallback_reason": fallback_reason if generation is None else "ML processing failed"
+                }
+            )
+        if not stream.kept_in(trailer.response):
+            # The final answer doesn't use the generated text (enhancement rejected, fallback)
+            yield format_sse("discard", {"streamed_chunks": stream.chunks})
+        yield format_sse("done", trailer.dict())
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 def generate_fallback_response(user_input: str) -> str:
     """Generate ATL-specific fallback responses"""
     message_lower = user_input.lower()
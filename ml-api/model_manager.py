@@ -8,10 +8,16 @@ This module handles model loading, caching, and management operations.
 """
 
 import os
-import torch
+import re
+import time
 import logging
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+import threading
 import warnings
+from contextlib import contextmanager
+from datetime import datetime
+
+from model_registry import model_registry, current_rss_mb, estimate_model_memory_mb
+from single_flight import SingleFlight
 
 # Set up environment variables for transformers
 os.environ["TRANSFORMERS_NO_ADVISORY_WARNINGS"] = "1"
@@ -22,49 +28,618 @@ logging.getLogger("torch").setLevel(logging.ERROR)
 
 logger = logging.getLogger("model_manager")
 
+# Get the project root directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generation model; override with a local path or smaller checkpoint if needed
+MODEL_NAME = os.environ.get("ATL_MODEL_NAME", "microsoft/DialoGPT-medium")
+
+# Engine wrapped around the text-generation pipeline:
+# "pipeline" (one generate call per request), "micro_batch" (batches concurrent requests)
+# or "continuous" (requests join and leave a shared decode loop token by token)
+GENERATION_ENGINE = os.environ.get("GENERATION_ENGINE", "pipeline")
+
+# Inference runtime: "torch" or "onnx" (ONNX Runtime; PyTorch is then only needed for the one-time export)
+GENERATION_BACKEND = os.environ.get("GENERATION_BACKEND", "torch")
+
+# Weight precision: "none" (fp32) or "int8" (dynamic int8 quantization of the linear layers)
+MODEL_QUANTIZATION = os.environ.get("MODEL_QUANTIZATION", "none")
+
+# How weights are loaded: "copy" (from_pretrained) or "mmap" (memory-mapped from a local
+# safetensors copy, so processes share one copy of the weights through the page cache)
+MODEL_WEIGHT_LOADING = os.environ.get("MODEL_WEIGHT_LOADING", "copy")
+
+# Optional speculative decoding: a small draft model sharing the tokenizer proposes tokens
+# that the main model verifies in one forward pass (empty disables it)
+SPECULATIVE_DRAFT_MODEL = os.environ.get("SPECULATIVE_DRAFT_MODEL", "")
+SPECULATIVE_NUM_TOKENS = int(os.environ.get("SPECULATIVE_NUM_TOKENS", "5"))
+
+# Converted (e.g. quantized) models are cached here so the conversion only runs once
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", os.path.join(BASE_DIR, "data", "model_cache"))
+
+# Auxiliary models kept in the model registry next to the generator
+EMBEDDING_MODEL_NAME = os.environ.get("ATL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+# Per-request generation limits: wall-clock deadline (seconds) and new-token cap
+GENERATION_DEADLINE_SECONDS = float(os.environ.get("GENERATION_DEADLINE_SECONDS", "10"))
+GENERATION_MAX_NEW_TOKENS = int(os.environ.get("GENERATION_MAX_NEW_TOKENS", "200"))
+
+# Static preamble of the comprehensive response prompt
+ASSISTANT_PROMPT_PREFIX = (
+    "You are an expert assistant for the Arts Technology Lab (ATL) at The University of Hong Kong. \n"
+    "Provide detailed, accurate information about ATL facilities, equipment, pricing, and services."
+)
+
+# Prompt prefixes whose past-key-values are precomputed when the model loads
+PROMPT_PREFIXES = [ASSISTANT_PROMPT_PREFIX]
+
 # Global model cache
 _model_cache = None
 _tokenizer_cache = None
+_prefix_cache = None
+_draft_model = None
+_draft_target = None
+
+# Deadline counters for /metrics
+_deadline_lock = threading.Lock()
+_deadline_stats = {
+    "generations": 0,
+    "deadlines_fired": 0,
+    "partial_responses": 0,
+    "fallback_responses": 0
+}
+_deadline_local = threading.local()
+
+# Concurrent first calls share a single load instead of each loading the model
+_model_loads = SingleFlight()
+
+# Background (warm) loading state
+_preload_lock = threading.Lock()
+_preload_thread = None
+_preload_state = {
+    "status": "not_started",  # not_started -> loading -> ready | failed
+    "error": None,
+    "started_at": None,
+    "load_seconds": None
+}
 
 def load_model(lightweight_mode=False):
     """Load the model and tokenizer with caching"""
-    global _model_cache, _tokenizer_cache
-    
     if _model_cache is not None and _tokenizer_cache is not None:
         logger.info("Using cached model and tokenizer")
         return _model_cache, _tokenizer_cache
     
+    # One loader runs; concurrent callers wait for its result
+    return _model_loads.do("model", _load_model, lightweight_mode)
+
+def _load_model(lightweight_mode):
+    """Load the model and tokenizer (called through the single-flight guard)"""
+    global _model_cache, _tokenizer_cache, _prefix_cache, _draft_model, _draft_target
+    
+    # A load that finished while this caller was queued has already filled the cache
+    if _model_cache is not None and _tokenizer_cache is not None:
+        return _model_cache, _tokenizer_cache
+    
     try:
         # Suppress warnings
         warnings.filterwarnings("ignore", category=UserWarning)
+        rss_before = current_rss_mb()
         
-        if lightweight_mode:
+        if lightweight_mode and GENERATION_BACKEND == "onnx":
+            logger.info("Loading lightweight ONNX Runtime model...")
+            from onnx_backend import load_onnx_generator
+            base_generator = load_onnx_generator(MODEL_NAME, _cache_path(MODEL_NAME, "onnx"), prefixes=PROMPT_PREFIXES)
+            generator = build_generation_engine(base_generator)
+            _model_cache = generator
+            _tokenizer_cache = generator.tokenizer
+            _register_generator(generator, rss_before)
+            return generator, generator.tokenizer
+        elif lightweight_mode:
             logger.info("Loading lightweight model...")
-            model_name = "microsoft/DialoGPT-medium"
-            generator = pipeline('text-generation', model=model_name, tokenizer=model_name)
+            from transformers import pipeline
+            model_name = MODEL_NAME
+            base_generator = pipeline('text-generation', model=load_causal_lm(model_name), tokenizer=model_name)
+            _prefix_cache = build_prefix_cache(base_generator.model, base_generator.tokenizer)
+            if SPECULATIVE_DRAFT_MODEL:
+                _draft_model = load_draft_model(base_generator.model)
+                _draft_target = base_generator.model if _draft_model is not None else None
+            generator = build_generation_engine(base_generator, prefix_cache=_prefix_cache)
             _model_cache = generator
             _tokenizer_cache = generator.tokenizer
+            _register_generator(generator, rss_before)
             return generator, generator.tokenizer
         else:
             logger.info("Loading full model...")
-            model_name = "microsoft/DialoGPT-medium"
+            from transformers import AutoTokenizer
+            model_name = MODEL_NAME
             tokenizer = AutoTokenizer.from_pretrained(model_name)
-            model = AutoModelForCausalLM.from_pretrained(model_name)
+            model = load_causal_lm(model_name)
             
             # Cache the loaded model and tokenizer
             _model_cache = model
             _tokenizer_cache = tokenizer
+            _register_generator(model, rss_before)
             
             return model, tokenizer
     except Exception as e:
         logger.error(f"Error loading model: {e}")
         raise
 
+def _register_generator(generator, rss_before):
+    """Track the cached generator in the model registry; it stays referenced until clear_model_cache"""
+    memory_mb = estimate_model_memory_mb(generator)
+    if memory_mb is None:
+        # No torch parameters to count (e.g. ONNX Runtime): use the RSS growth while loading
+        memory_mb = round(max(current_rss_mb() - rss_before, 0.0), 1)
+    model_registry.put("generator", generator, memory_mb=memory_mb)
+    model_registry.acquire("generator")
+
+def _load_embedder():
+    """Sentence embedding model, loaded through the registry on first use"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu")
+
+model_registry.register("embedder", _load_embedder)
+
+def load_causal_lm(model_name=None, quantization=None):
+    """Load the causal language model in the configured precision"""
+    from transformers import AutoModelForCausalLM
+    model_name = model_name or MODEL_NAME
+    quantization = quantization or MODEL_QUANTIZATION
+    if quantization == "int8":
+        return load_quantized_model(model_name)
+    if quantization != "none":
+        logger.warning(f"Unknown quantization mode '{quantization}', loading fp32 weights")
+    if MODEL_WEIGHT_LOADING == "mmap":
+        return load_mmap_model(model_name)
+    return AutoModelForCausalLM.from_pretrained(model_name)
+
+def load_draft_model(target_model, draft_name=None):
+    """
+    Load the speculative decoding draft model for target_model, or None if it can't be used.
+    
+    Drafts are verified by transformers' assisted generation, which decodes one sequence at a
+    time; batching engines would split that up, so the draft is only used with the pipeline engine.
+    """
+    draft_name = draft_name or SPECULATIVE_DRAFT_MODEL
+    if GENERATION_ENGINE != "pipeline":
+        logger.warning(f"Speculative decoding needs GENERATION_ENGINE=pipeline (got {GENERATION_ENGINE}); draft model not loaded")
+        return None
+    
+    logger.info(f"Loading speculative decoding draft model {draft_name}...")
+    draft = load_causal_lm(draft_name)
+    if draft.config.vocab_size != target_model.config.vocab_size:
+        logger.warning(f"Draft model {draft_name} does not share the main model's vocabulary; speculative decoding disabled")
+        return None
+    # Initial number of draft tokens per step; transformers adapts it to the acceptance rate
+    draft.generation_config.num_assistant_tokens = SPECULATIVE_NUM_TOKENS
+    
+    model_registry.put("draft", draft)
+    model_registry.acquire("draft")
+    return draft
+
+def _conv1d_to_linear(model):
+    """Replace GPT-2 style Conv1D layers with equivalent nn.Linear layers so they can be quantized"""
+    import torch
+    from transformers.pytorch_utils import Conv1D
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight = torch.nn.Parameter(child.weight.detach().t().contiguous())
+                linear.bias = child.bias
+                setattr(parent, name, linear)
+    return model
+
+def _quantize_dynamic_int8(model):
+    """Apply dynamic int8 quantization to every linear layer of the model"""
+    import torch
+    model.eval()
+    _conv1d_to_linear(model)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _cache_path(model_name, suffix):
+    """Location of a converted copy of a model under MODEL_CACHE_DIR"""
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name).strip("_")
+    return os.path.join(MODEL_CACHE_DIR, f"{safe_name}-{suffix}")
+
+def _quantized_cache_path(model_name):
+    """On-disk location of a quantized model; the pickle is tied to the torch and transformers versions"""
+    import torch
+    import transformers
+    torch_version = torch.__version__.split("+")[0]
+    return _cache_path(model_name, f"int8-torch{torch_version}-transformers{transformers.__version__}.pt")
+
+def load_quantized_model(model_name=None):
+    """
+    Load the model with dynamic int8 quantization of its linear layers.
+    
+    The quantized module is cached on disk, so later starts skip the fp32 load and conversion
+    and never hold the fp32 weights in memory.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM
+    
+    model_name = model_name or MODEL_NAME
+    cache_path = _quantized_cache_path(model_name)
+    
+    if os.path.exists(cache_path):
+        try:
+            start = time.time()
+            # Written by this function only; quantized modules can't be restored from weights alone
+            model = torch.load(cache_path, map_location="cpu", weights_only=False)
+            model.eval()
+            logger.info(f"Loaded int8 model from {cache_path} in {time.time() - start:.1f}s")
+            return model
+        except Exception as e:
+            logger.warning(f"Quantized model cache unusable, rebuilding: {e}")
+    
+    start = time.time()
+    model = _quantize_dynamic_int8(AutoModelForCausalLM.from_pretrained(model_name))
+    logger.info(f"Quantized {model_name} to int8 in {time.time() - start:.1f}s")
+    
+    try:
+        os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+        temp_path = cache_path + ".tmp"
+        torch.save(model, temp_path)
+        os.replace(temp_path, cache_path)
+        logger.info(f"Cached int8 model at {cache_path}")
+    except Exception as e:
+        logger.warning(f"Could not cache quantized model: {e}")
+    return model
+
+# safetensors dtype codes -> torch dtype names
+_SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool"
+}
+
+def mmap_safetensors(path):
+    """
+    Memory-map a safetensors file and return its tensors as views into the mapping.
+    
+    The mapping is private (copy-on-write), so pages stay shared with the page cache, and
+    with every other process mapping the same file, for as long as they are only read.
+    """
+    import json
+    import mmap
+    import struct
+    import torch
+    
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    
+    data_start = 8 + header_size
+    tensors = {}
+    for name, meta in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = getattr(torch, _SAFETENSORS_DTYPES[meta["dtype"]])
+        begin, end = meta["data_offsets"]
+        count = (end - begin) // torch.empty(0, dtype=dtype).element_size()
+        if count:
+            tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + begin)
+        else:
+            tensor = torch.empty(0, dtype=dtype)
+        tensors[name] = tensor.reshape(meta["shape"])
+    return tensors
+
+@contextmanager
+def _parameters_on_meta():
+    """Create module parameters on the meta device (no memory, no init); buffers stay on the CPU"""
+    import torch
+    register_parameter = torch.nn.Module.register_parameter
+    
+    def _register_on_meta(module, name, param):
+        register_parameter(module, name, param)
+        if param is not None:
+            module._parameters[name] = torch.nn.Parameter(param.to("meta"), requires_grad=param.requires_grad)
+    
+    torch.nn.Module.register_parameter = _register_on_meta
+    try:
+        yield
+    finally:
+        torch.nn.Module.register_parameter = register_parameter
+
+def load_mmap_model(model_name=None):
+    """
+    Load the model with its weights memory-mapped from a local safetensors copy.
+    
+    The copy is written on first use. Weights are never copied into process memory, so
+    server workers (see worker_launcher.py) share one set of weight pages.
+    """
+    import shutil
+    from transformers import AutoConfig, AutoModelForCausalLM, GenerationConfig
+    
+    model_name = model_name or MODEL_NAME
+    model_dir = _cache_path(model_name, "safetensors")
+    weights_path = os.path.join(model_dir, "model.safetensors")
+    
+    if not os.path.exists(weights_path):
+        start = time.time()
+        temp_dir = model_dir + ".tmp"
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        # A single (unsharded) file keeps the whole model in one mapping
+        AutoModelForCausalLM.from_pretrained(model_name).save_pretrained(
+            temp_dir, safe_serialization=True, max_shard_size="1000GB")
+        shutil.rmtree(model_dir, ignore_errors=True)
+        os.replace(temp_dir, model_dir)
+        logger.info(f"Saved safetensors copy of {model_name} to {model_dir} in {time.time() - start:.1f}s")
+    
+    start = time.time()
+    config = AutoConfig.from_pretrained(model_dir)
+    with _parameters_on_meta():
+        model = AutoModelForCausalLM.from_config(config)
+    model.load_state_dict(mmap_safetensors(weights_path), strict=False, assign=True)
+    model.tie_weights()
+    
+    missing = [name for name, param in model.named_parameters() if param.is_meta]
+    if missing:
+        raise RuntimeError(f"Weights missing from {weights_path}: {', '.join(missing[:5])}")
+    try:
+        model.generation_config = GenerationConfig.from_pretrained(model_dir)
+    except OSError:
+        pass
+    model.eval()
+    logger.info(f"Memory-mapped {model_name} weights from {weights_path} in {time.time() - start:.2f}s")
+    return model
+
+def build_generation_engine(generator, engine=None, prefix_cache=None):
+    """Wrap a text-generation pipeline in the configured generation engine"""
+    engine = engine or GENERATION_ENGINE
+    backend = getattr(generator, "backend", "torch")
+    if engine in ("micro_batch", "continuous") and backend != "torch":
+        # Both engines batch PyTorch calls (per-request deadlines ride on a logits processor);
+        # other backends run a batch one prompt at a time, so there is nothing to gain
+        logger.warning(f"The {engine} generation engine needs a PyTorch model, using the {backend} generator directly")
+        return generator
+    if engine == "micro_batch":
+        from batch_scheduler import MicroBatchingGenerator
+        logger.info("Using micro-batching generation engine")
+        return MicroBatchingGenerator(generator, prefix_cache=prefix_cache)
+    if engine == "continuous":
+        from continuous_batching import ContinuousBatchingEngine
+        logger.info("Using continuous batching generation engine")
+        return ContinuousBatchingEngine(generator.model, generator.tokenizer, prefix_cache=prefix_cache)
+    if engine != "pipeline":
+        logger.warning(f"Unknown generation engine '{engine}', using the plain pipeline")
+    return generator
+
+class PrefixCache:
+    """
+    Past-key-values for static prompt prefixes, computed once per model so that
+    each request only prefills the text that follows the prefix.
+    """
+    
+    def __init__(self, model, tokenizer):
+        self.model = model
+        self.tokenizer = tokenizer
+        self._entries = {}  # prefix text -> (token ids, past_key_values)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "reused_tokens": 0}
+    
+    def register(self, prefix):
+        """Run the prefix through the model once and keep its past-key-values"""
+        import torch
+        if prefix in self._entries:
+            return
+        token_ids = self.tokenizer(prefix)["input_ids"]
+        with torch.inference_mode():
+            outputs = self.model(input_ids=torch.tensor([token_ids], device=self.model.device), use_cache=True)
+        past_key_values = outputs.past_key_values
+        if hasattr(past_key_values, "to_legacy_cache"):
+            past_key_values = past_key_values.to_legacy_cache()
+        with self._lock:
+            self._entries[prefix] = (token_ids, past_key_values)
+        logger.info(f"Cached {len(token_ids)} prefix tokens")
+    
+    def match(self, prompt):
+        """
+        Find the longest registered prefix of a prompt.
+        
+        Returns:
+            (prompt token ids, prefix token count, prefix past_key_values), or None
+        """
+        with self._lock:
+            prefix = max((p for p in self._entries if prompt.startswith(p)), key=len, default=None)
+            if prefix is None:
+                self._stats["misses"] += 1
+                return None
+            prefix_ids, past_key_values = self._entries[prefix]
+        
+        prompt_ids = self.tokenizer(prompt)["input_ids"]
+        if prompt_ids[:len(prefix_ids)] != prefix_ids:
+            # The tokenizer merged across the boundary; encode the rest on its own
+            prompt_ids = prefix_ids + self.tokenizer(prompt[len(prefix):], add_special_tokens=False)["input_ids"]
+        if len(prompt_ids) <= len(prefix_ids):
+            # Nothing left to prefill
+            return None
+        
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["reused_tokens"] += len(prefix_ids)
+        return prompt_ids, len(prefix_ids), past_key_values
+    
+    def get_stats(self):
+        """Get hit/miss counters and the cached prefix lengths"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["prefix_tokens"] = [len(token_ids) for token_ids, _ in self._entries.values()]
+        return stats
+
+def build_prefix_cache(model, tokenizer, prefixes=None):
+    """Create a prefix cache for a model and precompute the static prompt prefixes"""
+    cache = PrefixCache(model, tokenizer)
+    for prefix in (PROMPT_PREFIXES if prefixes is None else prefixes):
+        try:
+            cache.register(prefix)
+        except Exception as e:
+            logger.warning(f"Could not precompute prompt prefix: {e}")
+    return cache
+
+def generate_with_prefix(generator, prompt, **generate_kwargs):
+    """
+    Call generator(prompt, **generate_kwargs), reusing the cached past-key-values of a
+    static prompt prefix when one matches. Returns the pipeline's output format.
+    
+    Tokens are also forwarded to the calling thread's TokenStream, if it has one.
+    """
+    from token_streaming import create_streamer
+    streamer = create_streamer(generator.tokenizer)
+    if streamer is not None:
+        generate_kwargs["streamer"] = streamer
+    
+    # Speculative decoding (single sequences only): the draft proposes, the model verifies
+    if (_draft_model is not None and getattr(generator, "model", None) is _draft_target
+            and generate_kwargs.get("num_return_sequences", 1) == 1):
+        generate_kwargs.setdefault("assistant_model", _draft_model)
+    
+    cache = _prefix_cache
+    if (cache is None or "assistant_model" in generate_kwargs or getattr(generator, "model", None) is not cache.model
+            or getattr(generator, "prefix_cache", None) is cache
+            or generate_kwargs.get("num_return_sequences", 1) != 1):
+        # No cache for this model, the engine (micro-batching, continuous batching) splices prefixes in
+        # itself, or assisted generation, which can't start from a precomputed cache (the draft keeps its own)
+        return generator(prompt, **generate_kwargs)
+    
+    match = cache.match(prompt)
+    if match is None:
+        return generator(prompt, **generate_kwargs)
+    
+    import torch
+    prompt_ids, _, past_key_values = match
+    generate_kwargs.pop("num_return_sequences", None)
+    input_ids = torch.tensor([prompt_ids], device=cache.model.device)
+    with torch.inference_mode():
+        output_ids = cache.model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=past_key_values,
+            **generate_kwargs
+        )
+    completion = cache.tokenizer.decode(output_ids[0, input_ids.shape[1]:], skip_special_tokens=True)
+    return [{"generated_text": prompt + completion}]
+
+class DeadlineStoppingCriteria:
+    """
+    Stopping criterion that ends generation once a wall-clock deadline has passed.
+    
+    Follows the transformers StoppingCriteria call signature without importing it, so it
+    also works with the continuous batching engine and the ONNX generator.
+    """
+    
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+        self.fired = False
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        if not self.fired and time.monotonic() >= self.deadline:
+            self.fired = True
+        return self.fired
+
+def generate_with_deadline(generator, prompt, deadline_seconds=None, **generate_kwargs):
+    """
+    Call generate_with_prefix() with a latency deadline and a max_new_tokens cap.
+    
+    Returns (outputs, timed_out). When the deadline fires, outputs hold the text generated
+    up to that point; the caller decides whether it is usable (see record_deadline_outcome).
+    """
+    if deadline_seconds is None:
+        deadline_seconds = GENERATION_DEADLINE_SECONDS
+    generate_kwargs.setdefault("max_new_tokens", GENERATION_MAX_NEW_TOKENS)
+    
+    # A plain list: transformers' generate() merges it with its own criteria. The batching
+    # engines apply it to this request's sequence only, so deadlines don't split batches.
+    criterion = DeadlineStoppingCriteria(deadline_seconds)
+    generate_kwargs["stopping_criteria"] = list(generate_kwargs.get("stopping_criteria") or []) + [criterion]
+    
+    try:
+        outputs = generate_with_prefix(generator, prompt, **generate_kwargs)
+    finally:
+        with _deadline_lock:
+            _deadline_stats["generations"] += 1
+            if criterion.fired:
+                _deadline_stats["deadlines_fired"] += 1
+    
+    if criterion.fired:
+        _deadline_local.fired = True
+        logger.warning(f"Generation deadline of {deadline_seconds:.1f}s reached, returning partial output")
+    return outputs, criterion.fired
+
+def clear_deadline_flag():
+    """Reset the current thread's deadline flag (at the start of a request)"""
+    _deadline_local.fired = False
+
+def deadline_fired():
+    """Whether a generation deadline fired on the current thread since clear_deadline_flag()"""
+    return getattr(_deadline_local, "fired", False)
+
+def record_deadline_outcome(used_partial):
+    """Count whether a timed-out generation was answered with its partial text or a fallback"""
+    with _deadline_lock:
+        _deadline_stats["partial_responses" if used_partial else "fallback_responses"] += 1
+
+def get_deadline_stats():
+    """Get the generation deadline counters"""
+    with _deadline_lock:
+        stats = dict(_deadline_stats)
+    stats["deadline_seconds"] = GENERATION_DEADLINE_SECONDS
+    stats["max_new_tokens"] = GENERATION_MAX_NEW_TOKENS
+    stats["fired_rate"] = round(stats["deadlines_fired"] / stats["generations"], 3) if stats["generations"] else 0.0
+    return stats
+
+def start_background_load(lightweight_mode=False):
+    """Start loading the model in a worker thread so startup and requests don't block on it"""
+    global _preload_thread
+    
+    def _preload():
+        _preload_state["status"] = "loading"
+        _preload_state["started_at"] = datetime.now().isoformat()
+        start = time.time()
+        try:
+            load_model(lightweight_mode=lightweight_mode)
+            _preload_state["status"] = "ready"
+            logger.info(f"Model preloaded in {time.time() - start:.1f}s")
+        except Exception as e:
+            _preload_state["status"] = "failed"
+            _preload_state["error"] = str(e)
+            logger.error(f"Background model load failed: {e}")
+        finally:
+            _preload_state["load_seconds"] = round(time.time() - start, 2)
+    
+    # Concurrent first requests must not start a second preload thread
+    with _preload_lock:
+        if _preload_thread is None:
+            _preload_thread = threading.Thread(target=_preload, name="model-preload", daemon=True)
+            _preload_thread.start()
+        return _preload_thread
+
+def is_model_ready():
+    """Check whether the model has finished loading and can serve requests"""
+    return _model_cache is not None and _tokenizer_cache is not None
+
+def get_model_readiness():
+    """Get the readiness state of the (background) model load"""
+    readiness = dict(_preload_state)
+    if is_model_ready():
+        readiness["status"] = "ready"
+    return readiness
+
 def clear_model_cache():
     """Clear the model cache to free up memory"""
-    global _model_cache, _tokenizer_cache
+    global _model_cache, _tokenizer_cache, _preload_thread, _prefix_cache, _draft_model, _draft_target
     _model_cache = None
     _tokenizer_cache = None
+    _prefix_cache = None
+    _draft_model = None
+    _draft_target = None
+    _preload_thread = None
+    _preload_state.update(status="not_started", error=None, started_at=None, load_seconds=None)
+    model_registry.clear()
     logger.info("Model cache cleared")
 
 def get_model_info():
@@ -72,7 +647,7 @@ def get_model_info():
     global _model_cache, _tokenizer_cache
     
     if _model_cache is None or _tokenizer_cache is None:
-        return {"status": "No model loaded"}
+        return {"status": "No model loaded", "registry": model_registry.get_stats()}
     
     info = {
         "status": "Model loaded",
@@ -84,4 +659,21 @@ def get_model_info():
     if hasattr(_model_cache, 'device'):
         info["device"] = str(_model_cache.device)
     
+    # Add generation engine counters (e.g. batching) if available
+    if hasattr(_model_cache, 'get_stats'):
+        info["engine"] = _model_cache.get_stats()
+    
+    if _prefix_cache is not None:
+        info["prefix_cache"] = _prefix_cache.get_stats()
+    
+    if _draft_model is not None:
+        info["speculative"] = {
+            "draft_model": SPECULATIVE_DRAFT_MODEL,
+            "num_assistant_tokens": _draft_model.generation_config.num_assistant_tokens
+        }
+    
+    info["deadline"] = get_deadline_stats()
+    info["registry"] = model_registry.get_stats()
+    info["loads"] = _model_loads.get_stats()
+    
     return info 
\ No newline at end of file
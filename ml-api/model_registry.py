@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Model Registry Module for ATL Chatbot
+
+This module keeps several models loaded side by side in one process:
+- Named models (generator, embedder, intent classifier) loaded on first use
+- Loads run outside the registry lock (one per name, concurrent callers wait for it),
+  so stats and other models stay available while a model loads
+- Reference counting so models in use are never unloaded
+- Least-recently-used eviction of idle models against a resident memory (RSS) budget
+- Per-model memory accounting for get_model_info and /metrics
+"""
+
+import gc
+import os
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("model_registry")
+
+# Resident memory budget for the process in MB; 0 disables eviction
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get("MODEL_MEMORY_BUDGET_MB", "0"))
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # Peak rather than current RSS where /proc is unavailable (kilobytes on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def estimate_model_memory_mb(model):
+    """Size of a model's parameters and buffers in MB (follows pipeline/engine .model attributes)"""
+    seen = set()
+    while model is not None and id(model) not in seen:
+        seen.add(id(model))
+        if hasattr(model, "parameters"):
+            try:
+                total = sum(p.numel() * p.element_size() for p in model.parameters())
+                if hasattr(model, "buffers"):
+                    total += sum(b.numel() * b.element_size() for b in model.buffers())
+                return round(total / (1024 * 1024), 1)
+            except Exception:
+                return None
+        model = getattr(model, "model", None)
+    return None
+
+class _Entry:
+    """A registered model and its bookkeeping"""
+
+    def __init__(self, name: str, loader: Optional[Callable[[], Any]], unload: Optional[Callable[[Any], None]]):
+        self.name = name
+        self.loader = loader
+        self.unload = unload
+        self.model = None
+        self.refcount = 0
+        self.memory_mb = None
+        self.loads = 0
+        self.load_seconds = None
+        self.last_used = None
+        self.loading: Optional[Future] = None  # set while a load is in flight
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+class ModelRegistry:
+    """
+    Holds named models with reference counts. Idle (refcount 0) models are evicted in
+    least-recently-used order whenever process RSS exceeds the budget, and are
+    reloaded through their loader the next time they are acquired.
+    """
+
+    def __init__(self, budget_mb: float = None):
+        self.budget_mb = MODEL_MEMORY_BUDGET_MB if budget_mb is None else budget_mb
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()  # least recently used first
+        self._lock = threading.RLock()
+        self.evictions = 0
+
+    def register(self, name: str, loader: Callable[[], Any], unload: Callable[[Any], None] = None):
+        """Register a model that is loaded by calling loader() on first use"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self._entries[name] = _Entry(name, loader, unload)
+            else:
+                entry.loader = loader
+                entry.unload = unload
+
+    def put(self, name: str, model: Any, memory_mb: float = None, unload: Callable[[Any], None] = None):
+        """Add an already loaded model (replacing any previous one under that name)"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = _Entry(name, None, unload)
+            elif entry.loaded and entry.model is not model:
+                self._unload(entry)
+            entry.model = model
+            entry.unload = unload or entry.unload
+            entry.memory_mb = memory_mb if memory_mb is not None else estimate_model_memory_mb(model)
+            entry.loads += 1
+            self._touch(entry)
+            self._evict_over_budget()
+
+    def acquire(self, name: str) -> Any:
+        """Get a model (loading it if needed) and hold a reference until release()"""
+        while True:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is None:
+                    raise KeyError(f"Unknown model: {name}")
+                if entry.loaded:
+                    entry.refcount += 1
+                    self._touch(entry)
+                    return entry.model
+                loading = entry.loading
+                if loading is None:
+                    if entry.loader is None:
+                        raise KeyError(f"Model {entry.name} was evicted and has no loader")
+                    if entry.memory_mb:
+                        # Reloading: free room for its known size first
+                        self._evict_over_budget(extra_mb=entry.memory_mb)
+                    entry.loading = Future()
+                    break
+            # Another caller is loading it: wait (raising its error), then take a reference
+            loading.result()
+
+        # The loader runs without the registry lock held
+        try:
+            model, load_seconds, memory_mb = self._load(entry)
+        except BaseException as e:
+            self._finish(entry, None, e)
+            raise
+        with self._lock:
+            entry.model = model
+            entry.load_seconds = load_seconds
+            entry.memory_mb = memory_mb
+            entry.loads += 1
+            entry.refcount += 1
+            self._touch(entry)
+            self._evict_over_budget()
+        self._finish(entry, model, None)
+        return model
+
+    def release(self, name: str):
+        """Drop a reference taken by acquire()"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.refcount == 0:
+                return
+            entry.refcount -= 1
+            if entry.refcount == 0:
+                self._evict_over_budget()
+
+    @contextmanager
+    def use(self, name: str):
+        """Context manager around acquire()/release()"""
+        model = self.acquire(name)
+        try:
+            yield model
+        finally:
+            self.release(name)
+
+    def peek(self, name: str) -> Any:
+        """Get a model only if it is already loaded, without taking a reference"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or not entry.loaded:
+                return None
+            self._touch(entry)
+            return entry.model
+
+    def evict(self, name: str, force: bool = False) -> bool:
+        """Unload a model; models still referenced are kept unless force is set"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or not entry.loaded or (entry.refcount and not force):
+                return False
+            entry.refcount = 0
+            self._unload(entry)
+            return True
+
+    def clear(self):
+        """Unload every model"""
+        with self._lock:
+            for name in list(self._entries):
+                self.evict(name, force=True)
+
+    def _touch(self, entry: _Entry):
+        entry.last_used = time.time()
+        self._entries.move_to_end(entry.name)
+
+    def _load(self, entry: _Entry):
+        """Run the entry's loader: (model, load seconds, memory MB)"""
+        logger.info(f"Loading model '{entry.name}'...")
+        gc.collect()
+        rss_before = current_rss_mb()
+        start = time.time()
+        model = entry.loader()
+        load_seconds = round(time.time() - start, 2)
+
+        estimated = estimate_model_memory_mb(model)
+        measured = round(max(current_rss_mb() - rss_before, 0.0), 1)
+        memory_mb = estimated if estimated is not None else measured
+        logger.info(f"Model '{entry.name}' loaded in {load_seconds}s (~{memory_mb} MB)")
+        return model, load_seconds, memory_mb
+
+    def _finish(self, entry: _Entry, model: Any, error: Optional[BaseException]):
+        """Clear the in-flight marker and wake the callers waiting for this load"""
+        with self._lock:
+            loading, entry.loading = entry.loading, None
+        if loading is not None:
+            if error is not None:
+                loading.set_exception(error)
+            else:
+                loading.set_result(model)
+
+    def _unload(self, entry: _Entry):
+        model, entry.model = entry.model, None
+        if entry.unload is not None:
+            try:
+                entry.unload(model)
+            except Exception as e:
+                logger.warning(f"Error unloading model '{entry.name}': {e}")
+        del model
+        gc.collect()
+        logger.info(f"Model '{entry.name}' unloaded")
+
+    def _evict_over_budget(self, extra_mb: float = 0.0):
+        """Evict idle models, least recently used first, until RSS (+extra_mb) fits the budget"""
+        if not self.budget_mb:
+            return
+        projected = current_rss_mb() + extra_mb
+        for entry in list(self._entries.values()):
+            if projected <= self.budget_mb:
+                break
+            if not entry.loaded or entry.refcount:
+                continue
+            freed = entry.memory_mb or 0.0
+            self._unload(entry)
+            self.evictions += 1
+            logger.info(f"Evicted idle model '{entry.name}' (~{freed} MB) to stay under {self.budget_mb:.0f} MB")
+            # Freed memory is not always returned to the OS right away, so use the estimate too
+            projected = min(current_rss_mb() + extra_mb, projected - freed)
+        if projected > self.budget_mb:
+            logger.warning(f"RSS {projected:.0f} MB exceeds the {self.budget_mb:.0f} MB model budget; no idle model left to evict")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-model memory and usage, plus the process RSS against the budget"""
+        with self._lock:
+            models = {
+                entry.name: {
+                    "loaded": entry.loaded,
+                    "loading": entry.loading is not None,
+                    "refcount": entry.refcount,
+                    "memory_mb": entry.memory_mb,
+                    "loads": entry.loads,
+                    "load_seconds": entry.load_seconds,
+                    "last_used": entry.last_used
+                }
+                for entry in self._entries.values()
+            }
+            return {
+                "rss_mb": round(current_rss_mb(), 1),
+                "budget_mb": self.budget_mb or None,
+                "loaded_mb": round(sum(m["memory_mb"] or 0.0 for m in models.values() if m["loaded"]), 1),
+                "evictions": self.evictions,
+                "models": models
+            }
+
+# Global registry instance
+model_registry = ModelRegistry()
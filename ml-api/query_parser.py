@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Query Parser Module for ATL Chatbot
+
+This module parses a user message once per request for every stage of the pipeline:
+- Stripped and lowercased text, whitespace tokens and the token set
+- Normalized form (letters and digits only) used for name lookups
+- Script/language (Chinese vs. English) and the non-text (numbers/symbols only) check
+- Keyword automaton scans, cached per automaton so each one runs at most once
+- Functions that take a query accept either a string or a ParsedQuery (see parse_query)
+"""
+
+import re
+from typing import Dict, FrozenSet, Set, Tuple, Union
+
+from facility_resolver import normalize_name
+
+_CJK_PATTERN = re.compile(r'[\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff]')
+# Digits and non-word characters only (no letters in any script)
+_NON_TEXT_PATTERN = re.compile(r'[\d\W]+')
+
+class ParsedQuery:
+    """A user message and everything the pipeline derives from its text"""
+
+    __slots__ = ("raw", "text", "lower", "tokens", "token_set", "normalized",
+                 "cjk_chars", "language", "is_non_text", "_hits")
+
+    def __init__(self, raw: str):
+        self.raw: str = raw or ""
+        self.text: str = self.raw.strip()
+        self.lower: str = self.text.lower()
+        self.tokens: Tuple[str, ...] = tuple(self.lower.split())
+        self.token_set: FrozenSet[str] = frozenset(self.tokens)
+        self.normalized: str = normalize_name(self.text)
+        self.cjk_chars: int = len(_CJK_PATTERN.findall(self.raw))
+        # Chinese when more than 15% of the characters are Chinese (the terminology rule)
+        self.language: str = "zh" if self.cjk_chars > len(self.raw) * 0.15 else "en"
+        self.is_non_text: bool = not self.text or _NON_TEXT_PATTERN.fullmatch(self.text) is not None
+        self._hits: Dict[int, Dict[str, Set[str]]] = {}
+
+    def hits(self, matcher) -> Dict[str, Set[str]]:
+        """matcher.scan(self.lower), scanned once per KeywordAutomaton"""
+        hits = self._hits.get(id(matcher))
+        if hits is None:
+            hits = self._hits[id(matcher)] = matcher.scan(self.lower)
+        return hits
+
+    def __str__(self):
+        return self.raw
+
+    def __repr__(self):
+        return f"ParsedQuery({self.raw!r})"
+
+def parse_query(query: Union[str, ParsedQuery]) -> ParsedQuery:
+    """The ParsedQuery for `query`, parsing it only if it is still a string"""
+    return query if isinstance(query, ParsedQuery) else ParsedQuery(query)
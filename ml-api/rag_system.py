@@ -13,10 +13,13 @@ This module provides Retrieval-Augmented Generation capabilities by:
 import os
 import sys
 import json
+import math
 import time
+import socket
 import logging
 import requests
-from typing import List, Dict, Any, Optional
+from collections import Counter
+from typing import List, Dict, Any, Optional, Union
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 import re
@@ -26,17 +29,152 @@ from datetime import datetime
 # Add src to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from query_parser import ParsedQuery, parse_query
+
 # Get the project root directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # Set up logging
 logger = logging.getLogger("rag_system")
 
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+class CrawlTelemetry:
+    """Record per-URL crawl timings and summarise them into percentile histograms"""
+    
+    TIMING_FIELDS = ['dns_seconds', 'connect_seconds', 'ttfb_seconds', 'download_seconds', 'parse_seconds', 'total_seconds']
+    SIZE_FIELDS = ['bytes_transferred', 'content_bytes']
+    PERCENTILES = [50, 90, 95, 99]
+    LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0]
+    
+    def __init__(self, log_path: str = None, connect_timeout: float = 5.0):
+        if log_path is None:
+            log_path = os.path.join(BASE_DIR, "data", "rag_data", "crawl_telemetry.jsonl")
+        self.log_path = log_path
+        self.connect_timeout = connect_timeout
+        self.records = []
+        self._probed_hosts = set()
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        # Each crawl starts a fresh log
+        open(self.log_path, 'w', encoding='utf-8').close()
+    
+    def probe_host(self, url: str) -> Dict[str, Optional[float]]:
+        """
+        Measure DNS resolution and TCP connect time for the host of a URL.
+        
+        The scraper session keeps connections alive, so these costs are only paid
+        on the first request to each host; later requests report None.
+        """
+        timings = {'dns_seconds': None, 'connect_seconds': None}
+        parsed = urlparse(url)
+        host = parsed.hostname
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        if not host or (host, port) in self._probed_hosts:
+            return timings
+        self._probed_hosts.add((host, port))
+        
+        try:
+            start = time.perf_counter()
+            addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            timings['dns_seconds'] = time.perf_counter() - start
+            
+            family, socktype, proto, _, sockaddr = addresses[0]
+            start = time.perf_counter()
+            with socket.socket(family, socktype, proto) as sock:
+                sock.settimeout(self.connect_timeout)
+                sock.connect(sockaddr)
+            timings['connect_seconds'] = time.perf_counter() - start
+        except OSError as e:
+            logger.debug(f"Could not probe {host}:{port}: {e}")
+        
+        return timings
+    
+    def record(self, stats: Dict[str, Any]):
+        """Store one URL's stats and append it to the JSONL log"""
+        self.records.append(stats)
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(stats, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"Error writing crawl telemetry: {e}")
+    
+    def summarize(self) -> Dict[str, Any]:
+        """Summarise the recorded crawl into percentiles, status codes and a latency histogram"""
+        summary = {
+            'total_urls': len(self.records),
+            'failed_urls': sum(1 for r in self.records if r.get('error')),
+            'ssl_fallbacks': sum(1 for r in self.records if r.get('ssl_fallback')),
+            'status_codes': dict(Counter(str(r.get('status_code')) for r in self.records)),
+            'percentiles': {},
+            'total_seconds_histogram': {},
+            'slowest_urls': []
+        }
+        
+        for field in self.TIMING_FIELDS + self.SIZE_FIELDS:
+            values = sorted(r[field] for r in self.records if r.get(field) is not None)
+            if not values:
+                continue
+            stats = {'count': len(values), 'max': values[-1]}
+            for pct in self.PERCENTILES:
+                stats[f'p{pct}'] = _percentile(values, pct)
+            summary['percentiles'][field] = stats
+        
+        # Non-cumulative bucket counts; upper bounds are inclusive
+        histogram = {f"<={bound}s": 0 for bound in self.LATENCY_BUCKETS}
+        histogram[f">{self.LATENCY_BUCKETS[-1]}s"] = 0
+        for r in self.records:
+            total = r.get('total_seconds')
+            if total is None:
+                continue
+            for bound in self.LATENCY_BUCKETS:
+                if total <= bound:
+                    histogram[f"<={bound}s"] += 1
+                    break
+            else:
+                histogram[f">{self.LATENCY_BUCKETS[-1]}s"] += 1
+        summary['total_seconds_histogram'] = histogram
+        
+        slowest = sorted(self.records, key=lambda r: r.get('total_seconds') or 0, reverse=True)[:5]
+        summary['slowest_urls'] = [
+            {'url': r['url'], 'total_seconds': r.get('total_seconds'), 'status_code': r.get('status_code')}
+            for r in slowest
+        ]
+        
+        return summary
+    
+    def format_summary(self, summary: Dict[str, Any] = None) -> str:
+        """Render a crawl summary as printable text"""
+        if summary is None:
+            summary = self.summarize()
+        
+        lines = [
+            f"- URLs fetched: {summary['total_urls']} ({summary['failed_urls']} failed, {summary['ssl_fallbacks']} SSL fallbacks)",
+            f"- Status codes: {', '.join(f'{code}: {count}' for code, count in sorted(summary['status_codes'].items()))}"
+        ]
+        for field, stats in summary['percentiles'].items():
+            if field.endswith('_seconds'):
+                values = ' '.join(f"p{pct}={stats[f'p{pct}'] * 1000:.0f}ms" for pct in self.PERCENTILES)
+                lines.append(f"- {field}: {values} max={stats['max'] * 1000:.0f}ms (n={stats['count']})")
+            else:
+                values = ' '.join(f"p{pct}={stats[f'p{pct}'] / 1024:.1f}KB" for pct in self.PERCENTILES)
+                lines.append(f"- {field}: {values} max={stats['max'] / 1024:.1f}KB (n={stats['count']})")
+        lines.append(f"- Total time histogram: {', '.join(f'{bucket}: {count}' for bucket, count in summary['total_seconds_histogram'].items())}")
+        for item in summary['slowest_urls']:
+            lines.append(f"  slow: {item['url']} ({(item['total_seconds'] or 0):.2f}s, status {item['status_code']})")
+        
+        return "\n".join(lines)
+
 class WebScraper:
     """Scrape information from the ATL website"""
     
-    def __init__(self, base_url: str = "https://www.atlab.hku.hk/"):
+    def __init__(self, base_url: str = "https://www.atlab.hku.hk/", telemetry: Optional[CrawlTelemetry] = None):
         self.base_url = base_url
+        self.telemetry = telemetry
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
@@ -46,10 +184,25 @@ class WebScraper:
     
     def scrape_page(self, url: str) -> Dict[str, Any]:
         """Scrape a single page and extract structured information"""
+        stats = {
+            'url': url,
+            'status_code': None,
+            'ssl_fallback': False,
+            'scraped_at': datetime.now().isoformat()
+        }
+        start = time.perf_counter()
+        
         try:
-            # First try with SSL verification
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
+            try:
+                # First try with SSL verification
+                response = self._fetch(url, stats)
+            except requests.exceptions.SSLError as ssl_e:
+                logger.warning(f"SSL Error for {url}, trying without verification: {ssl_e}")
+                stats['ssl_fallback'] = True
+                # Retry without SSL verification for problematic certificates
+                response = self._fetch(url, stats, verify=False)
+            
+            parse_start = time.perf_counter()
             soup = BeautifulSoup(response.content, 'html.parser')
             
             page_info = {
@@ -57,34 +210,52 @@ class WebScraper:
                 'title': self._extract_title(soup),
                 'content': self._extract_content(soup),
                 'metadata': self._extract_metadata(soup),
-                'scraped_at': datetime.now().isoformat()
+                'scraped_at': stats['scraped_at']
             }
+            if stats['ssl_fallback']:
+                page_info['ssl_warning'] = 'Scraped without SSL verification'
+            stats['parse_seconds'] = time.perf_counter() - parse_start
             
             return page_info
             
-        except requests.exceptions.SSLError as ssl_e:
-            logger.warning(f"SSL Error for {url}, trying without verification: {ssl_e}")
-            try:
-                # Retry without SSL verification for problematic certificates
-                response = self.session.get(url, timeout=10, verify=False)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                page_info = {
-                    'url': url,
-                    'title': self._extract_title(soup),
-                    'content': self._extract_content(soup),
-                    'metadata': self._extract_metadata(soup),
-                    'scraped_at': datetime.now().isoformat(),
-                    'ssl_warning': 'Scraped without SSL verification'
-                }
-                return page_info
-            except Exception as retry_e:
-                logger.error(f"Error scraping {url} even without SSL verification: {retry_e}")
-                return None
         except Exception as e:
-            logger.error(f"Error scraping {url}: {e}")
+            stats['error'] = str(e)
+            if stats['ssl_fallback']:
+                logger.error(f"Error scraping {url} even without SSL verification: {e}")
+            else:
+                logger.error(f"Error scraping {url}: {e}")
             return None
+        finally:
+            stats['total_seconds'] = time.perf_counter() - start
+            if self.telemetry is not None:
+                self.telemetry.record(stats)
+    
+    def _fetch(self, url: str, stats: Dict[str, Any], verify: bool = True) -> requests.Response:
+        """GET a URL, recording connection, first-byte and download timings into stats"""
+        if self.telemetry is not None:
+            for field, value in self.telemetry.probe_host(url).items():
+                # Keep the first measurement when the SSL fallback retries the same host
+                if stats.get(field) is None:
+                    stats[field] = value
+        
+        # Stream so that headers (TTFB) and body (download) can be timed separately
+        request_start = time.perf_counter()
+        response = self.session.get(url, timeout=10, verify=verify, stream=True)
+        stats['ttfb_seconds'] = time.perf_counter() - request_start
+        stats['status_code'] = response.status_code
+        
+        download_start = time.perf_counter()
+        content = response.content
+        stats['download_seconds'] = time.perf_counter() - download_start
+        stats['content_bytes'] = len(content)
+        try:
+            # Bytes read off the wire, before any gzip/deflate decoding
+            stats['bytes_transferred'] = response.raw.tell() or len(content)
+        except Exception:
+            stats['bytes_transferred'] = len(content)
+        
+        response.raise_for_status()
+        return response
     
     def _extract_title(self, soup: BeautifulSoup) -> str:
         """Extract page title"""
@@ -431,13 +602,12 @@ class RAGRetriever:
         """Get base information about facilities, staff, events, etc."""
         return self._base_info
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: Union[str, ParsedQuery], top_k: int = 5) -> List[Dict[str, Any]]:
         """Search for relevant chunks based on query"""
         if not self.chunks:
             return []
         
-        query_lower = query.lower()
-        query_words = set(query_lower.split())
+        query_words = parse_query(query).token_set
         
         scored_chunks = []
         for chunk in self.chunks:
@@ -458,7 +628,7 @@ class RAGRetriever:
         scored_chunks.sort(key=lambda x: x['score'], reverse=True)
         return [item['chunk'] for item in scored_chunks[:top_k]]
     
-    def get_context_for_query(self, query: str, max_chunks: int = 3) -> str:
+    def get_context_for_query(self, query: Union[str, ParsedQuery], max_chunks: int = 3) -> str:
         """Get formatted context for a query"""
         relevant_chunks = self.search(query, top_k=max_chunks)
         
@@ -595,7 +765,8 @@ def update_rag_data_from_config(config_path: str = None):
     """Update RAG data using URLs from configuration file"""
     print("Starting RAG data update from configuration...")
     
-    scraper = WebScraper()
+    telemetry = CrawlTelemetry()
+    scraper = WebScraper(telemetry=telemetry)
     info_manager = InformationManager()
     
     config = scraper.load_url_config(config_path)
@@ -603,9 +774,11 @@ def update_rag_data_from_config(config_path: str = None):
         print(f"Loaded configuration with {len(config.get('additional_urls', []))} additional URLs")
     
     scraped_pages = scraper.scrape_from_config(config_path)
+    crawl_summary = telemetry.summarize()
     
     if not scraped_pages:
         print("No pages scraped. Check your internet connection and URL configuration.")
+        print(telemetry.format_summary(crawl_summary))
         return
     
     info_manager.save_scraped_data(scraped_pages)
@@ -622,7 +795,8 @@ def update_rag_data_from_config(config_path: str = None):
         'additional_urls': config.get('additional_urls', []),
         'external_domains': config.get('external_domains', []),
         'chunk_size': 1000,
-        'overlap': 200
+        'overlap': 200,
+        'crawl_summary': crawl_summary
     }
     info_manager.save_metadata(metadata)
     
@@ -630,6 +804,8 @@ def update_rag_data_from_config(config_path: str = None):
     print(f"- Scraped {len(scraped_pages)} pages")
     print(f"- Created {len(chunks)} chunks")
     print(f"- Data saved to {info_manager.data_dir}")
+    print(f"\nCrawl telemetry (per-URL log: {telemetry.log_path}):")
+    print(telemetry.format_summary(crawl_summary))
 
 if __name__ == "__main__":
     update_rag_data() 
\ No newline at end of file
@@ -12,11 +12,13 @@ This module handles all response generation functions including:
 - Structured response formatting
 """
 
+import re
 import logging
 import time
 import random
 import os
 import json
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
@@ -33,15 +35,107 @@ except ImportError:
         return None
 
 from text_processors import (
-    extract_facility_from_question, find_best_facility_match,
+    extract_facility_from_question, find_best_facility_match, normalize_facility_name,
     extract_staff_names_from_text, get_friendly_non_text_response
 )
+from keyword_matcher import KeywordAutomaton
+from fragment_cache import data_fragment, response_fragments
+from spell_corrector import register_keywords
+from query_parser import parse_query
+from intent_classifier import classify_intent, INTENT_CONFIDENCE_THRESHOLD, INTENT_SKIP_MODEL_CONFIDENCE, SUBTOPIC_INTENTS
+from faq_index import faq_answers
 
 logger = logging.getLogger("response_generators")
 
 # Add at the top, after imports
 RESPONSE_LANGUAGE = "english"  # Change to 'chinese' for all Chinese output
 
+# Routing keywords for generate_lightweight_response (substring matches on the lowercased input)
+BROAD_TOPIC_KEYWORDS = {
+    "facilities": ["all facilities", "facilities", "what facilities", "facility", "spaces", "rooms"],
+    "events": ["all events", "events", "event", "exhibitions", "workshops", "lectures", "activities"],
+    "staff": ["all staff", "staff", "team", "members", "who are working here"],
+    "equipment": ["all equipment", "equipment", "devices", "hardware", "machines"],
+    "software": ["all software", "software", "programs", "applications", "tools"],
+    "pricing": ["all pricing", "pricing", "cost", "fees", "rates"],
+    "booking": ["booking", "book", "reserve", "reservation", "schedule", "appointment"],
+    "internships": ["internship", "internships", "intern", "positions", "job opportunities"],
+    "policies": ["policies", "policy", "rules", "guidelines", "requirements"],
+    "tools": ["ai tools", "tools", "ai", "ollama", "chatgpt", "notion", "perplexity", "dall", "canva", "designer", "slidesgo", "slidesai", "synthesia", "natural readers", "atlhpc", "hpc", "gpu", "server"],
+}
+CONTACT_KEYWORDS = [
+    "contact", "how do i contact", "how can i contact", "how do i reach", "how can i reach", "reach staff", "contact staff", "contact you", "contact info", "contact information", "email", "phone", "call", "reach you", "get in touch", "how do i get in touch", "how can i get in touch", "who can i contact", "ways to contact", "how to contact"
+]
+# Intent categories; the intent with the most keyword hits wins, ties go to the earlier one
+INTENT_KEYWORDS = {
+    "facility": ["facility", "room", "space", "lounge", "xr", "meeting", "research"],
+    "pricing": ["price", "cost", "fee", "rental", "charge", "rate"],
+    "booking": ["book", "booking", "reserve", "reservation", "schedule", "appointment"],
+    "equipment": ["equipment", "hardware", "device", "machine", "gpu"],
+    "software": ["software", "program", "application", "tool"],
+    "staff": ["staff", "team", "dr.", "mr.", "engineer", "coordinator", "practitioner", "aiden", "jenny", "kal", "lawrence"],
+    "internship": ["intern", "internship", "position", "job"],
+    "event": ["event", "activity", "lecture", "workshop", "exhibition", "presentation"],
+    "policy": ["policy", "requirement", "responsibility", "rule"],
+    "tool": ["tool", "ai", "ollama", "chatgpt", "atlhpc"],
+    "general": ["what", "how", "when", "where", "who", "tell me"]
+}
+COMPREHENSIVE_KEYWORDS = ["all", "everything", "list", "overview", "summary", "complete", "comprehensive"]
+
+# All routing keywords in one automaton, so each query is scanned once
+_routing_matcher = KeywordAutomaton({
+    **{f"broad:{topic}": keywords for topic, keywords in BROAD_TOPIC_KEYWORDS.items()},
+    **{f"intent:{intent}": keywords for intent, keywords in INTENT_KEYWORDS.items()},
+    "contact": CONTACT_KEYWORDS,
+    "comprehensive": COMPREHENSIVE_KEYWORDS,
+})
+
+# Small-talk inputs, matched only when they are the whole message
+GREETING_PHRASES = frozenset([
+    "hi", "hello", "hey", "yo", "sup", "what's up", "howdy", "greetings",
+    "good morning", "good afternoon", "good evening", "morning", "afternoon", "evening",
+    "hola", "bonjour", "ciao", "你好", "嗨", "哈囉", "早安", "午安", "晚安"
+])
+FAREWELL_PHRASES = frozenset([
+    "bye", "goodbye", "see you", "take care", "later", "farewell", "ciao", "adios",
+    "good night", "goodbye for now", "catch you later", "peace out"
+])
+APPRECIATION_PHRASES = frozenset([
+    "thank you", "thanks", "appreciate", "grateful", "cheers", "much appreciated",
+    "thanks a lot", "thank you so much", "thank you very much", "many thanks"
+])
+
+# Typos are corrected towards the words the routing tables look for
+register_keywords(BROAD_TOPIC_KEYWORDS, CONTACT_KEYWORDS, INTENT_KEYWORDS, COMPREHENSIVE_KEYWORDS,
+                  GREETING_PHRASES, FAREWELL_PHRASES, APPRECIATION_PHRASES)
+
+# generate_response's keyword cascade, in priority order, for when the intent classifier is unsure
+RESPONSE_INTENT_CASCADE = [
+    ("staff", ["staff", "team", "member", "people", "person"]),
+    ("event", ["event", "activity", "workshop", "seminar"]),
+    ("pricing", ["price", "cost", "fee", "rent", "rental", "booking"]),
+    ("facility", ["facility", "room", "space"]),
+]
+
+def detect_intent(keyword_hits):
+    """Pick the intent with the most keyword hits (ties go to the earlier intent)"""
+    detected_intent = "general"
+    max_score = 0
+    for intent in INTENT_KEYWORDS:
+        score = len(keyword_hits.get(f"intent:{intent}", ()))
+        if score > max_score:
+            max_score = score
+            detected_intent = intent
+    return detected_intent
+
+def route_intent(query, keyword_hits):
+    """(intent, classifier confidence): the trained classifier's intent if confident enough, else keyword scoring"""
+    intent, confidence = classify_intent(query)
+    # Only a handful of FAQ questions are about booking, too few to learn it: booking words keep keyword routing
+    if intent is None or confidence < INTENT_CONFIDENCE_THRESHOLD or "intent:booking" in keyword_hits:
+        return detect_intent(keyword_hits), confidence
+    return intent, confidence
+
 def organize_events_by_category(event_titles):
     """Organize events into categories with subtitles for better readability"""
     if not event_titles:
@@ -124,18 +218,58 @@ def organize_events_by_category(event_titles):
     return response
 
 def generate_lightweight_response(generator, user_input, info_feed=None):
-    """Generate a lightweight response using the pipeline"""
+    """Generate a lightweight response, answering paraphrases of recent questions from the semantic cache"""
+    from semantic_cache import response_cache
+    from model_manager import clear_deadline_flag, deadline_fired
+
+    # Typos are fixed for routing only: every matcher sees the intended words, while the
+    # cache key and the model prompt keep the user's own text
+    spell_corrector = getattr(info_feed, "spell_corrector", None)
+    routed_input = spell_corrector.correct(user_input) if spell_corrector is not None else user_input
+    # Parsed once here and shared by every stage below
+    query = parse_query(routed_input)
+
+    # Model and rule-based answers to the same question differ, so they are cached apart
+    mode = ("model" if generator is not None else "rules") + ("" if info_feed is not None else "-nodata")
+    cached = response_cache.lookup(user_input, mode)
+    if cached is not None:
+        return cached
+    
+    start_time = time.time()
+    clear_deadline_flag()
+    response = _generate_lightweight_response(generator, user_input, info_feed, query)
+    # Answers cut short by the generation deadline are not worth repeating
+    if not deadline_fired():
+        response_cache.store(user_input, response, mode, compute_seconds=time.time() - start_time)
+    return response
+
+def _generate_lightweight_response(generator, user_input, info_feed=None, query=None):
+    """
+    Generate a lightweight response using the pipeline. `query` is the ParsedQuery routing
+    works on (user_input's, or its spell-corrected text), if already parsed.
+    """
     # Start timing
     start_time = time.time()
 
     # Import here to avoid circular imports
     from text_processors import is_non_text_input, get_friendly_non_text_response
 
+    query = query or parse_query(user_input)
+    # Matching works on the parsed (spell-corrected) text; the model prompt gets the user's own words
+    original_input, user_input = user_input, query.raw
+
     # Check for non-text input first
-    if is_non_text_input(user_input):
+    if is_non_text_input(query):
         return get_friendly_non_text_response()
 
-    user_lower = user_input.lower().strip()
+    # A known FAQ question (or a near copy of one) is answered directly, without context or generation
+    if info_feed is not None:
+        faq_entry = faq_answers.lookup(query, getattr(info_feed, "facility_resolver", None))
+        if faq_entry is not None:
+            return render_faq_answer(info_feed, faq_entry, query)
+
+    user_lower = query.lower
+    keyword_hits = query.hits(_routing_matcher)
 
     # Check for specific website link queries first
     try:
@@ -144,34 +278,32 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
     except ImportError:
         WEBSITE_LINKS_AVAILABLE = False
         website_manager = None
-        def add_website_links_to_response(response, user_input):
+        def add_website_links_to_response(response, query):
             return response
         def get_website_link_response(user_input):
             return None
 
     if WEBSITE_LINKS_AVAILABLE and website_manager:
-        relevant_links = website_manager.find_relevant_links(user_input)
+        relevant_links = website_manager.find_relevant_links(query)
         if relevant_links:
             is_contact_query = any('contact' in link['keywords'] for link in relevant_links)
             # --- FACILITIES ---
             facilities = info_feed.get_base_info().get("facilities", {})
             facility_names = [name.lower() for name in facilities.keys()]
-            broad_facility_keywords = ["all facilities", "facilities", "what facilities", "facility", "spaces", "rooms"]
-            if any(k in user_lower for k in broad_facility_keywords):
+            if "broad:facilities" in keyword_hits:
                 facility_list = "\n".join(f"• {name}" for name in facilities.keys())
                 response = f"Here are the main facilities at ATL:\n\n{facility_list}\n\nLet me know if you'd like more details about any specific facility!"
-                response = add_website_links_to_response(response, user_input)
+                response = add_website_links_to_response(response, query)
                 return response
             # --- EVENTS ---
             if info_feed and hasattr(info_feed, 'rag_retriever') and info_feed.rag_retriever:
                 try:
                     event_titles = info_feed.rag_retriever.get_all_event_titles()
-                    broad_event_keywords = ["all events", "events", "event", "exhibitions", "workshops", "lectures", "activities"]
-                    if any(k in user_lower for k in broad_event_keywords):
+                    if "broad:events" in keyword_hits:
                         if event_titles:
                             organized_events = organize_events_by_category(event_titles)
                             response = organized_events
-                            response = add_website_links_to_response(response, user_input)
+                            response = add_website_links_to_response(response, query)
                             return response
                 except:
                     pass
@@ -179,18 +311,16 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
             if info_feed and hasattr(info_feed, 'rag_retriever') and info_feed.rag_retriever:
                 try:
                     staff_names_roles = get_all_staff_names(info_feed)
-                    broad_staff_keywords = ["all staff", "staff", "team", "members", "who are working here"]
-                    if any(k in user_lower for k in broad_staff_keywords):
+                    if "broad:staff" in keyword_hits:
                         if staff_names_roles:
                             staff_list_str = "\n".join(f"• {name}" for name in staff_names_roles)
                             response = f"Here are some of the staff members at ATL:\n\n{staff_list_str}\n\nYou can find more details about their roles on the ATL website. 👥"
-                            response = add_website_links_to_response(response, user_input)
+                            response = add_website_links_to_response(response, query)
                             return response
                 except:
                     pass
             # --- EQUIPMENT ---
-            broad_equipment_keywords = ["all equipment", "equipment", "devices", "hardware", "machines"]
-            if any(k in user_lower for k in broad_equipment_keywords):
+            if "broad:equipment" in keyword_hits:
                 equipment_set = set()
                 for facility_info in facilities.values():
                     for eq in facility_info.get('equipment', []):
@@ -200,11 +330,10 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
                 if equipment_set:
                     equipment_list = "\n".join(f"• {eq}" for eq in sorted(equipment_set))
                     response = f"Here is a list of equipment and hardware available at ATL:\n\n{equipment_list}\n\nLet me know if you'd like more details about any specific equipment!"
-                    response = add_website_links_to_response(response, user_input)
+                    response = add_website_links_to_response(response, query)
                     return response
             # --- SOFTWARE ---
-            broad_software_keywords = ["all software", "software", "programs", "applications", "tools"]
-            if any(k in user_lower for k in broad_software_keywords):
+            if "broad:software" in keyword_hits:
                 software_set = set()
                 for facility_info in facilities.values():
                     for sw in facility_info.get('software', []):
@@ -212,37 +341,32 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
                 if software_set:
                     software_list = "\n".join(f"• {sw}" for sw in sorted(software_set))
                     response = f"Here is a list of software tools available at ATL:\n\n{software_list}\n\nLet me know if you'd like more details about any specific software!"
-                    response = add_website_links_to_response(response, user_input)
+                    response = add_website_links_to_response(response, query)
                     return response
             # --- PRICING ---
-            broad_pricing_keywords = ["all pricing", "pricing", "cost", "fees", "rates"]
-            if any(k in user_lower for k in broad_pricing_keywords):
+            if "broad:pricing" in keyword_hits:
                 response = generate_all_facilities_pricing(info_feed, user_input)
-                response = add_website_links_to_response(response, user_input)
+                response = add_website_links_to_response(response, query)
                 return response
             # --- BOOKING ---
-            broad_booking_keywords = ["booking", "book", "reserve", "reservation", "schedule", "appointment"]
-            if any(k in user_lower for k in broad_booking_keywords):
+            if "broad:booking" in keyword_hits:
                 response = generate_booking_response(info_feed, user_input)
-                response = add_website_links_to_response(response, user_input)
+                response = add_website_links_to_response(response, query)
                 return response
             # --- INTERNSHIPS ---
-            broad_internship_keywords = ["internship", "internships", "intern", "positions", "job opportunities"]
-            if any(k in user_lower for k in broad_internship_keywords):
+            if "broad:internships" in keyword_hits:
                 response = "ATL offers internship opportunities for students interested in arts and technology. You can find more details and application info on the ATL website."
-                response = add_website_links_to_response(response, user_input)
+                response = add_website_links_to_response(response, query)
                 return response
             # --- POLICIES ---
-            broad_policy_keywords = ["policies", "policy", "rules", "guidelines", "requirements"]
-            if any(k in user_lower for k in broad_policy_keywords):
+            if "broad:policies" in keyword_hits:
                 response = "ATL has clear policies and guidelines for lab use, booking, and safety. You can find more details on the ATL website."
-                response = add_website_links_to_response(response, user_input)
+                response = add_website_links_to_response(response, query)
                 return response
             # --- TOOLS ---
-            broad_tool_keywords = ["ai tools", "tools", "ai", "ollama", "chatgpt", "notion", "perplexity", "dall", "canva", "designer", "slidesgo", "slidesai", "synthesia", "natural readers", "atlhpc", "hpc", "gpu", "server"]
-            if any(k in user_lower for k in broad_tool_keywords):
+            if "broad:tools" in keyword_hits:
                 response = "ATL provides access to a variety of AI tools and creative software. You can find more details and tutorials on the ATL website."
-                response = add_website_links_to_response(response, user_input)
+                response = add_website_links_to_response(response, query)
                 return response
             # Otherwise, for other categories, just append the link after the normal answer
             # (fall through to normal logic, and the link will be appended at the end)
@@ -252,13 +376,8 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
                 pass
 
     # Check for greetings first
-    greeting_keywords = [
-        "hi", "hello", "hey", "yo", "sup", "what's up", "howdy", "greetings",
-        "good morning", "good afternoon", "good evening", "morning", "afternoon", "evening",
-        "hola", "bonjour", "ciao", "你好", "嗨", "哈囉", "早安", "午安", "晚安"
-    ]
     # Only trigger greeting if the input is exactly a greeting or matches a greeting phrase
-    if user_lower in greeting_keywords or any(user_lower.strip() == greeting for greeting in greeting_keywords):
+    if user_lower in GREETING_PHRASES:
         # Return casual greeting response
         casual_greetings = [
             "Hey there! 👋✨ How can I help you with ATL today? 🚀",
@@ -272,11 +391,7 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
         return random.choice(casual_greetings)
 
     # Check for farewell messages
-    farewell_keywords = [
-        "bye", "goodbye", "see you", "take care", "later", "farewell", "ciao", "adios",
-        "good night", "goodbye for now", "catch you later", "peace out"
-    ]
-    if user_lower in farewell_keywords or any(user_lower.strip() == farewell for farewell in farewell_keywords):
+    if user_lower in FAREWELL_PHRASES:
         # Return casual farewell response
         casual_farewells = [
             "Goodbye! 👋✨ Have a great day! 🌟",
@@ -290,11 +405,7 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
         return random.choice(casual_farewells)
     
     # Check for appreciation messages
-    appreciation_keywords = [
-        "thank you", "thanks", "appreciate", "grateful", "cheers", "much appreciated",
-        "thanks a lot", "thank you so much", "thank you very much", "many thanks"
-    ]
-    if user_lower in appreciation_keywords or any(user_lower.strip() == appreciation for appreciation in appreciation_keywords):
+    if user_lower in APPRECIATION_PHRASES:
         # Return casual appreciation response
         casual_appreciations = [
             "You're welcome! 😊✨ I'm glad I could help! 🚀",
@@ -308,10 +419,7 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
         return random.choice(casual_appreciations)
     
     # Check for contact-related queries
-    contact_keywords = [
-        "contact", "how do i contact", "how can i contact", "how do i reach", "how can i reach", "reach staff", "contact staff", "contact you", "contact info", "contact information", "email", "phone", "call", "reach you", "get in touch", "how do i get in touch", "how can i get in touch", "who can i contact", "ways to contact", "how to contact"
-    ]
-    if any(k in user_lower for k in contact_keywords):
+    if "contact" in keyword_hits:
         sections = [{
             "subtitle": "Contact Information",
             "points": [
@@ -323,35 +431,7 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
         return format_response("Arts Tech Lab Contact Information", sections)
 
     # --- NEW: Route to facility info if input matches any facility name ---
-    facilities = info_feed.get_base_info().get("facilities", {})
-    # Define the helper function locally to avoid import issues
-    def find_best_facility_match_here(facilities, user_input):
-        """Find the best matching facility from user input"""
-        if not facilities:
-            return None
-            
-        user_lower = user_input.lower()
-        facility_names = list(facilities.keys())
-        
-        # Direct substring match
-        for facility in facility_names:
-            if facility.lower() in user_lower or user_lower in facility.lower():
-                return facility
-        
-        # Fuzzy matching
-        import difflib
-        best_match = None
-        best_ratio = 0
-        
-        for facility in facility_names:
-            ratio = difflib.SequenceMatcher(None, facility.lower(), user_lower).ratio()
-            if ratio > best_ratio and ratio > 0.6:  # Threshold for acceptable match
-                best_ratio = ratio
-                best_match = facility
-        
-        return best_match
-    
-    matched_facility = find_best_facility_match_here(facilities, user_input)
+    matched_facility = info_feed.facility_resolver.resolve(user_input, cutoff=0.6)
     if matched_facility:
         return generate_facility_response(info_feed, user_input, qa_sections=None)
 
@@ -361,28 +441,8 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
 
     # Simple intent classification for response selection
     try:
-        # Create intent categories based on keywords
-        intent_keywords = {
-            "facility": ["facility", "room", "space", "lounge", "xr", "meeting", "research"],
-            "pricing": ["price", "cost", "fee", "rental", "charge", "rate"],
-            "booking": ["book", "booking", "reserve", "reservation", "schedule", "appointment"],
-            "equipment": ["equipment", "hardware", "device", "machine", "gpu"],
-            "software": ["software", "program", "application", "tool"],
-            "staff": ["staff", "team", "dr.", "mr.", "engineer", "coordinator", "practitioner", "aiden", "jenny", "kal", "lawrence"],
-            "internship": ["intern", "internship", "position", "job"],
-            "event": ["event", "activity", "lecture", "workshop", "exhibition", "presentation"],
-            "policy": ["policy", "requirement", "responsibility", "rule"],
-            "tool": ["tool", "ai", "ollama", "chatgpt", "atlhpc"],
-            "general": ["what", "how", "when", "where", "who", "tell me"]
-        }
-        # Determine intent
-        detected_intent = "general"
-        max_score = 0
-        for intent, keywords in intent_keywords.items():
-            score = sum(1 for k in keywords if k in user_lower)
-            if score > max_score:
-                max_score = score
-                detected_intent = intent
+        # Determine intent with the classifier, or the keyword hits when it is unsure
+        detected_intent, intent_confidence = route_intent(query, keyword_hits)
         # --- NEW: Handle specific intents with structured RAG data ---
         if detected_intent == "staff":
             return generate_staff_response(info_feed, user_input)
@@ -391,15 +451,14 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
             return generate_event_response(info_feed, user_input)
 
         # Check for comprehensive questions that need bullet points
-        comprehensive_keywords = ["all", "everything", "list", "overview", "summary", "complete", "comprehensive"]
-        is_comprehensive = any(k in user_lower for k in comprehensive_keywords)
+        is_comprehensive = "comprehensive" in keyword_hits
 
         # Try direct match logic first (e.g., direct facility lookup, direct Q&A, etc.)
         # ... (your direct match logic here) ...
         response = None
         # If no direct match, then use info_feed as fallback
         if not response and info_feed:
-            context = info_feed.get_context_for_question(user_input)
+            context = info_feed.get_context_for_question(query)
             # Extract relevant Q&A from context
             lines = context.split('\n')
             qa_sections = []
@@ -420,9 +479,12 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
             elif detected_intent == "facility":
                 response = generate_facility_response(info_feed, user_input, qa_sections)
             elif is_comprehensive:
-                response = generate_comprehensive_response(generator, user_input, context, info_feed)
+                response = generate_comprehensive_response(generator, original_input, context, info_feed)
             else:
-                response = extract_enhanced_qa_response(generator, qa_sections, detected_intent, context)
+                # A confidently classified question is answered from the FAQ as is; model enhancement
+                # is only worth its latency when the intent is uncertain
+                enhancer = generator if intent_confidence < INTENT_SKIP_MODEL_CONFIDENCE else None
+                response = extract_enhanced_qa_response(enhancer, qa_sections, detected_intent, context)
         if not response:
             response = "I don't have specific information about that. Please try asking about ATL facilities, equipment, pricing, staff, internships, events, policies, or tools. If you need further assistance, please contact ATL staff."
         # Calculate timing
@@ -433,26 +495,53 @@ def generate_lightweight_response(generator, user_input, info_feed=None):
         # Log timing information to file
         timing_logger = logging.getLogger("timing")
         timing_logger.info(timing_info)
-        # Standardize terminology
-        try:
-            from terminology import TerminologyStandardizer
-            standardizer = TerminologyStandardizer()
-            response = standardizer.standardize_text(response, "english")
-        except ImportError:
-            pass
-        # Post-processing for specific phrases and spacing issues
-        response = response.replace('TheUniversityofHongKong', 'The University of Hong Kong')
-        response = response.replace('artsandtechnology', 'arts and technology')
+        response = standardize_response(response)
         
         # Add website links if available
         if WEBSITE_LINKS_AVAILABLE:
-            response = add_website_links_to_response(response, user_input)
+            response = add_website_links_to_response(response, query)
         
         return response
     except Exception as e:
         logger.error(f"Error in lightweight response generation: {e}")
         return "I'm having trouble processing your request. Please try again."
 
+def standardize_response(response):
+    """Standardize terminology and fix known spacing issues in a finished response"""
+    try:
+        from terminology import TerminologyStandardizer
+        standardizer = TerminologyStandardizer()
+        response = standardizer.standardize_text(response, "english")
+    except ImportError:
+        pass
+    # Post-processing for specific phrases and spacing issues
+    response = response.replace('TheUniversityofHongKong', 'The University of Hong Kong')
+    response = response.replace('artsandtechnology', 'arts and technology')
+    return response
+
+def render_faq_answer(info_feed, faq_entry, query):
+    """
+    A faq_answers entry as the Q&A path would answer it without model enhancement.
+    The formatted answer is built once per data load; only the links depend on the question.
+    """
+    intent = SUBTOPIC_INTENTS.get(faq_entry["subtopic"], "general")
+    key = ("faq_answer", getattr(info_feed, "data_version", None), faq_entry["index"])
+    response = response_fragments.get_or_build(
+        key, lambda: standardize_response(format_qa_answer(faq_entry["answer"], intent))
+    )
+    if WEBSITE_LINKS_AVAILABLE:
+        response = add_website_links_to_response(response, query)
+    return response
+
+def format_qa_answer(answer, detected_intent):
+    """A Q&A answer under the "<Intent> Information" title used by extract_enhanced_qa_response"""
+    sections = [{
+        "subtitle": f"Information about {detected_intent}",
+        "points": [(answer, "")],
+        "paragraph": f"Let me know if you need more specific details about {detected_intent}!"
+    }]
+    return format_response(f"{detected_intent.title()} Information", sections)
+
 def extract_qa_response(qa_sections, detected_intent):
     """Extract and structure Q&A response from sections"""
     if not qa_sections:
@@ -498,12 +587,22 @@ def extract_qa_response(qa_sections, detected_intent):
     
     return "\n\n".join(response_parts)
 
+def trim_to_last_sentence(text):
+    """Cut a partial (timed-out) generation back to its last complete sentence, if it has one"""
+    match = re.search(r'^.*[.!?。！？](?=\s|$)', text, re.DOTALL)
+    return match.group(0) if match else text
+
 def generate_comprehensive_response(generator, user_input, context, info_feed):
     """Generate a comprehensive response using the model"""
+    if generator is None:
+        # Model not loaded (yet) - answer from the structured data only
+        return generate_structured_fallback_response(user_input, context, info_feed)
+    
     try:
-        # Enhanced prompt for better responses
-        system_prompt = f"""You are an expert assistant for the Arts Technology Lab (ATL) at The University of Hong Kong. 
-Provide detailed, accurate information about ATL facilities, equipment, pricing, and services.
+        from model_manager import ASSISTANT_PROMPT_PREFIX, generate_with_deadline, record_deadline_outcome
+        
+        # Enhanced prompt for better responses; the static preamble's KV cache is reused
+        system_prompt = ASSISTANT_PROMPT_PREFIX + f"""
 
 Relevant Information:
 {context}
@@ -512,18 +611,24 @@ User Question: {user_input}
 
 Please provide a comprehensive, well-structured response with specific details. Use bullet points and clear formatting where appropriate."""
         
-        # Generate response
-        outputs = generator(system_prompt, num_return_sequences=1, temperature=0.6, do_sample=True, pad_token_id=generator.tokenizer.eos_token_id)
+        # Generate response (stops early at the latency deadline)
+        outputs, timed_out = generate_with_deadline(generator, system_prompt, num_return_sequences=1, temperature=0.6, do_sample=True, pad_token_id=generator.tokenizer.eos_token_id)
         
         if outputs and len(outputs) > 0:
             response = outputs[0]['generated_text']
             # Extract only the new part
             if system_prompt in response:
                 response = response.replace(system_prompt, "").strip()
+            if timed_out:
+                response = trim_to_last_sentence(response)
             
             if response and len(response) > 20:
+                if timed_out:
+                    record_deadline_outcome(used_partial=True)
                 return response
         
+        if timed_out:
+            record_deadline_outcome(used_partial=False)
         # Fallback to structured response
         return generate_structured_fallback_response(user_input, context, info_feed)
         
@@ -546,53 +651,47 @@ def generate_structured_fallback_response(user_input, context, info_feed):
         # Simple context-based response
         return f"Based on available information:\n\n{context[:500]}..."
 
+RESPONSE_FOOTER = "If you have more questions, feel free to ask! 😊\nFor further assistance, you may contact ATL staff. 📧"
+
 def format_response(title, sections):
     """
     Format the chatbot response with a title, subtitles, bullet points, and friendly explanations.
     sections: List of dicts, each with 'subtitle', 'points' (list of (point, explanation)), and optional 'paragraph'.
     """
-    response = f"**{title}** 🎯\n\n"
+    # Pieces are collected in a list and joined once; subtitle emojis and summaries are memoized
+    parts = [f"**{title}** 🎯\n\n"]
+    append = parts.append
     
-    for i, section in enumerate(sections):
+    for section in sections:
         if 'subtitle' in section:
             # Add emoji based on subtitle content
-            emoji = get_section_emoji(section['subtitle'])
-            response += f"__{section['subtitle']}__ {emoji}\n\n"
+            append(f"__{section['subtitle']}__ {get_section_emoji(section['subtitle'])}\n\n")
         
-        if 'points' in section and section['points']:
-            grouped_points = group_similar_points(section['points'])
-            for group_title, items in grouped_points.items():
+        points = section.get('points')
+        if points:
+            for group_title, items in group_similar_points(points).items():
                 # If only one item and it's a long paragraph, print as plain text
                 if len(items) == 1 and len(items[0][0]) > 120:
-                    response += f"{items[0][0]}"
-                    if items[0][1]:
-                        response += f" {items[0][1]}"
-                    response += "\n"
+                    point, explanation = items[0]
+                    append(f"{point} {explanation}\n" if explanation else f"{point}\n")
                 elif group_title == "General":
-                    for point, explanation in items:
-                        response += f"• **{point}**"
-                        if explanation:
-                            response += f": {explanation}"
-                        response += "\n"
+                    parts.extend(f"• **{point}**: {explanation}\n" if explanation else f"• **{point}**\n"
+                                 for point, explanation in items)
                 else:
                     # Always show group title for non-General groups, even for single items
-                    category_emoji = get_category_emoji(group_title)
-                    response += f"**{group_title}** {category_emoji}\n"
-                    for point, explanation in items:
-                        response += f"  • {point}"
-                        if explanation:
-                            response += f": {explanation}"
-                        response += "\n"
-                    response += "\n"
-            response += "\n"
+                    append(f"**{group_title}** {get_category_emoji(group_title)}\n")
+                    parts.extend(f"  • {point}: {explanation}\n" if explanation else f"  • {point}\n"
+                                 for point, explanation in items)
+                    append("\n")
+            append("\n")
         if 'paragraph' in section:
-            response += f"{section['paragraph']}\n\n"
-        if 'points' in section and len(section['points']) > 2:
-            summary = generate_section_summary(section['subtitle'], section['points'])
+            append(f"{section['paragraph']}\n\n")
+        if points and len(points) > 2:
+            summary = generate_section_summary(section['subtitle'], points)
             if summary:
-                response += f"**Summary** 📝: {summary}\n\n"
-    response += "If you have more questions, feel free to ask! 😊\nFor further assistance, you may contact ATL staff. 📧"
-    return response
+                append(f"**Summary** 📝: {summary}\n\n")
+    append(RESPONSE_FOOTER)
+    return "".join(parts)
 
 def extract_and_structure_context(context, user_input):
     """Extract and structure context into organized sections"""
@@ -651,29 +750,29 @@ def extract_enhanced_qa_response(generator, qa_sections, detected_intent, contex
                 try:
                     if generator and hasattr(generator, 'model'):
                         enhancement_prompt = f"Enhance and expand this answer about {detected_intent} in English, with bullet points: {base_response}"
-                        result = generator(enhancement_prompt, num_return_sequences=1, do_sample=True, temperature=0.5, top_p=0.9, pad_token_id=generator.tokenizer.eos_token_id)
+                        from model_manager import generate_with_deadline, record_deadline_outcome
+                        result, timed_out = generate_with_deadline(generator, enhancement_prompt, num_return_sequences=1, do_sample=True, temperature=0.5, top_p=0.9, pad_token_id=generator.tokenizer.eos_token_id)
                         enhanced_response = result[0]['generated_text']
                         
                         # Remove the prompt from the enhanced response to prevent prompt leakage
                         if enhancement_prompt in enhanced_response:
                             enhanced_response = enhanced_response.replace(enhancement_prompt, "").strip()
+                        if timed_out:
+                            enhanced_response = trim_to_last_sentence(enhanced_response)
                         
                         if len(enhanced_response) > len(base_response) * 0.8 and enhanced_response.strip() != enhancement_prompt.strip():
                             response = enhanced_response
                         else:
                             response = base_response
+                        if timed_out:
+                            record_deadline_outcome(used_partial=response is enhanced_response)
                     else:
                         response = base_response
                 except:
                     response = base_response
                 
                 # Structure the response using format_response
-                sections = [{
-                    "subtitle": f"Information about {detected_intent}",
-                    "points": [(response, "")],
-                    "paragraph": f"Let me know if you need more specific details about {detected_intent}!"
-                }]
-                return format_response(f"{detected_intent.title()} Information", sections)
+                return format_qa_answer(response, detected_intent)
             else:
                 sections = [{
                     "subtitle": f"About {detected_intent}",
@@ -708,17 +807,23 @@ def generate_response(model, tokenizer, user_input, thinking_mode=False, info_fe
         if is_non_text_input(user_input):
             return get_friendly_non_text_response()
         
-        # Handle special cases
-        if any(keyword in user_input.lower() for keyword in ["staff", "team", "member", "people", "person"]):
+        # Handle special cases: classifier intent when confident, else the first keyword match
+        user_lower = user_input.lower()
+        intent, confidence = classify_intent(user_lower)
+        if confidence < INTENT_CONFIDENCE_THRESHOLD:
+            intent = next((name for name, keywords in RESPONSE_INTENT_CASCADE
+                           if any(keyword in user_lower for keyword in keywords)), None)
+        
+        if intent == "staff":
             return generate_staff_response(info_feed, user_input)
         
-        if any(keyword in user_input.lower() for keyword in ["event", "activity", "workshop", "seminar"]):
+        if intent == "event":
             return generate_event_response(info_feed, user_input)
         
-        if any(keyword in user_input.lower() for keyword in ["price", "cost", "fee", "rent", "rental", "booking"]):
+        if intent in ("pricing", "booking"):
             return generate_pricing_response(info_feed, user_input)
         
-        if any(keyword in user_input.lower() for keyword in ["facility", "room", "space"]):
+        if intent == "facility":
             context = info_feed.get_context_for_question(user_input) if info_feed else ""
             return generate_facility_response(info_feed, user_input, [context] if context else [])
         
@@ -813,6 +918,7 @@ def generate_specific_facility_pricing(info_feed, facility_name, user_input):
         # Fallback: show all facilities
         return generate_all_facilities_pricing(info_feed, user_input)
 
+@data_fragment
 def generate_all_facilities_pricing(info_feed, user_input):
     from text_processors import detect_language
     lang = detect_language(user_input)
@@ -868,6 +974,7 @@ def generate_all_facilities_pricing(info_feed, user_input):
     })
     return format_response("ATL Facilities and Pricing Overview", sections)
 
+@data_fragment
 def generate_booking_response(info_feed, user_input):
     from text_processors import detect_language
     lang = detect_language(user_input)
@@ -956,66 +1063,14 @@ def generate_facility_response(info_feed, user_input, qa_sections):
     user_lower = user_input.lower()
     facilities = info_feed.get_base_info().get("facilities", {})
     
-    # Define local helper functions to match original
-    def normalize_facility_name_local(name):
-        """Normalize facility name for matching (lowercase, remove spaces and special chars)"""
-        import re
-        return re.sub(r'[^a-z0-9]', '', name.lower())
-
-    def extract_facility_from_question_local(user_input):
-        """Extract the facility/entity name from natural language questions like 'what is ...', 'tell me about ...', etc."""
-        import re
-        patterns = [
-            r"what is (.+)",
-            r"tell me about (.+)",
-            r"describe (.+)",
-            r"give me information about (.+)",
-            r"can you explain (.+)",
-            r"(.+) information",
-        ]
-        user_lower = user_input.lower()
-        for pattern in patterns:
-            match = re.search(pattern, user_lower)
-            if match:
-                # Remove trailing punctuation
-                entity = match.group(1).strip().rstrip('?.!')
-                return entity
-        return None
-
-    def find_best_facility_match_local(facilities, user_input):
-        """Find the best matching facility name from the facilities dict given the user input."""
-        import difflib
-        norm_input = normalize_facility_name_local(user_input)
-        facility_names = list(facilities.keys())
-        norm_names = [normalize_facility_name_local(name) for name in facility_names]
-        # Direct match
-        for i, norm_name in enumerate(norm_names):
-            if norm_input == norm_name:
-                return facility_names[i]
-        # Substring match
-        for i, norm_name in enumerate(norm_names):
-            if norm_input in norm_name or norm_name in norm_input:
-                return facility_names[i]
-        # Fuzzy match
-        match = difflib.get_close_matches(norm_input, norm_names, n=1, cutoff=0.6)
-        if match:
-            idx = norm_names.index(match[0])
-            return facility_names[idx]
-        return None
-    
     # Debug: print available facilities and normalized user input
     print("[DEBUG] User input:", user_input)
-    print("[DEBUG] Normalized user input:", normalize_facility_name_local(user_input))
+    print("[DEBUG] Normalized user input:", normalize_facility_name(user_input))
     print("[DEBUG] Available facilities:", list(facilities.keys()))
-    print("[DEBUG] Normalized facility names:", [normalize_facility_name_local(name) for name in facilities.keys()])
     # Try to extract facility/entity from natural language question
-    facility_query = extract_facility_from_question_local(user_input)
-    specific_facility = None
-    if facility_query:
-        specific_facility = find_best_facility_match_local(facilities, facility_query)
-    else:
-        # Try to match any facility name in the user input
-        specific_facility = find_best_facility_match_local(facilities, user_input)
+    facility_query = extract_facility_from_question(user_input)
+    # Otherwise try to match any facility name in the user input
+    specific_facility = info_feed.facility_resolver.resolve(facility_query or user_input)
     if specific_facility:
         return generate_specific_facility_info(info_feed, specific_facility, user_input)
     else:
@@ -1031,29 +1086,8 @@ def generate_specific_facility_info(info_feed, facility_name, user_input):
     # Remove language detection and Chinese handling
     facilities = info_feed.get_base_info().get("facilities", {})
     
-    def normalize_facility_name_local(name):
-        """Normalize facility name for matching (lowercase, remove spaces and special chars)"""
-        import re
-        return re.sub(r'[^a-z0-9]', '', name.lower())
-    
     # Use robust matching
-    target_name = facility_name
-    def find_facility_key(facilities_dict, target_name):
-        norm_target = normalize_facility_name_local(target_name)
-        for key in facilities_dict.keys():
-            if normalize_facility_name_local(key) == norm_target:
-                return key
-        for key in facilities_dict.keys():
-            if norm_target in normalize_facility_name_local(key) or normalize_facility_name_local(key) in norm_target:
-                return key
-        import difflib
-        norm_keys = [normalize_facility_name_local(k) for k in facilities_dict.keys()]
-        match = difflib.get_close_matches(norm_target, norm_keys, n=1, cutoff=0.6)
-        if match:
-            idx = norm_keys.index(match[0])
-            return list(facilities_dict.keys())[idx]
-        return None
-    facility_key = find_facility_key(facilities, target_name)
+    facility_key = info_feed.facility_resolver.resolve(facility_name)
     facility_info = facilities.get(facility_key) if facility_key else None
     if facility_key and facility_info:
         points = [
@@ -1128,6 +1162,7 @@ def generate_specific_facility_info(info_feed, facility_name, user_input):
         }]
         return format_response("Facility Not Found", sections)
 
+@data_fragment
 def generate_all_facilities_structured(info_feed, user_input):
     """Generate structured information about all facilities."""
     base_info = info_feed.get_base_info('english')
@@ -1159,48 +1194,6 @@ def generate_all_facilities_structured(info_feed, user_input):
     
     return response
 
-def generate_all_equipment_structured(info_feed, user_input):
-    """Generate structured information about all equipment."""
-    base_info = info_feed.get_base_info('english')
-    equipment = base_info.get("equipment", {})
-    
-    if not equipment:
-        return "I don't have equipment information available. Please contact ATL for details about available equipment."
-    
-    response = "## 🔧 ATL Equipment\n\n"
-    
-    for category, items in equipment.items():
-        response += f"### {category}\n"
-        if isinstance(items, list):
-            for item in items:
-                response += f"• {item}\n"
-        elif isinstance(items, str):
-            response += f"• {items}\n"
-        response += "\n"
-    
-    return response
-
-def generate_all_software_structured(info_feed, user_input):
-    """Generate structured information about all software."""
-    base_info = info_feed.get_base_info('english')
-    software = base_info.get("software", {})
-    
-    if not software:
-        return "I don't have software information available. Please contact ATL for details about available software."
-    
-    response = "## 💻 ATL Software\n\n"
-    
-    for category, items in software.items():
-        response += f"### {category}\n"
-        if isinstance(items, list):
-            for item in items:
-                response += f"• {item}\n"
-        elif isinstance(items, str):
-            response += f"• {items}\n"
-        response += "\n"
-    
-    return response
-
 def get_all_staff_names(info_feed):
     """Extract all staff names from the available data sources."""
     try:
@@ -1269,67 +1262,50 @@ def generate_event_response(info_feed, user_input):
     except:
         return "I can't access event information at the moment. Please check the ATL website for the latest updates! 🎪"
 
+# Prefixes that put a point under a group heading (the prefix is dropped from the point)
+POINT_PREFIX_GROUPS = [
+    ("feature:", "Key Features"),
+    ("hardware:", "Hardware"),
+    ("software:", "Software"),
+    ("equipment:", "Equipment"),
+    ("key feature:", "Key Features"),
+]
+# Keywords that put a point under a group heading as-is, checked after the prefixes
+POINT_KEYWORD_GROUPS = [
+    (["external", "non-ugc", "ugc", "waived", "dollars/hour", "hong kong"], "Pricing"),
+    (["area", "capacity", "square meters", "people"], "Basic Information"),
+    (["permit", "permission", "requirement"], "Requirements"),
+]
+
+@lru_cache(maxsize=4096)
+def classify_point(point):
+    """(group title, point as displayed) for a point; memoized since the same points recur in every listing"""
+    point_lower = point.lower()
+    for prefix, group in POINT_PREFIX_GROUPS:
+        if point_lower.startswith(prefix):
+            return group, point[len(prefix):].strip()
+    for keywords, group in POINT_KEYWORD_GROUPS:
+        if any(keyword in point_lower for keyword in keywords):
+            return group, point
+    # Regular point without grouping
+    return "General", point
+
 def group_similar_points(points):
     """
     Group similar points to avoid repetitive prefixes.
     Returns a dict with group titles as keys and lists of (point, explanation) as values.
     """
     grouped = {}
-    
     for point, explanation in points:
-        # Check for common prefixes that should be grouped
-        point_lower = point.lower()
-        
-        if point_lower.startswith("feature:"):
-            clean_point = point[8:].strip()  # Remove "Feature:" prefix
-            if "Key Features" not in grouped:
-                grouped["Key Features"] = []
-            grouped["Key Features"].append((clean_point, explanation))
-        elif point_lower.startswith("hardware:"):
-            clean_point = point[9:].strip()  # Remove "Hardware:" prefix
-            if "Hardware" not in grouped:
-                grouped["Hardware"] = []
-            grouped["Hardware"].append((clean_point, explanation))
-        elif point_lower.startswith("software:"):
-            clean_point = point[9:].strip()  # Remove "Software:" prefix
-            if "Software" not in grouped:
-                grouped["Software"] = []
-            grouped["Software"].append((clean_point, explanation))
-        elif point_lower.startswith("equipment:"):
-            clean_point = point[10:].strip()  # Remove "Equipment:" prefix
-            if "Equipment" not in grouped:
-                grouped["Equipment"] = []
-            grouped["Equipment"].append((clean_point, explanation))
-        elif point_lower.startswith("key feature:"):
-            clean_point = point[12:].strip()  # Remove "Key Feature:" prefix
-            if "Key Features" not in grouped:
-                grouped["Key Features"] = []
-            grouped["Key Features"].append((clean_point, explanation))
-        elif any(keyword in point_lower for keyword in ["external", "non-ugc", "ugc", "waived", "dollars/hour", "hong kong"]):
-            # Pricing information
-            if "Pricing" not in grouped:
-                grouped["Pricing"] = []
-            grouped["Pricing"].append((point, explanation))
-        elif any(keyword in point_lower for keyword in ["area", "capacity", "square meters", "people"]):
-            # Basic information
-            if "Basic Information" not in grouped:
-                grouped["Basic Information"] = []
-            grouped["Basic Information"].append((point, explanation))
-        elif any(keyword in point_lower for keyword in ["permit", "permission", "requirement"]):
-            # Requirements
-            if "Requirements" not in grouped:
-                grouped["Requirements"] = []
-            grouped["Requirements"].append((point, explanation))
-        else:
-            # Regular point without grouping
-            if "General" not in grouped:
-                grouped["General"] = []
-            grouped["General"].append((point, explanation))
-    
+        group, clean_point = classify_point(point)
+        if group not in grouped:
+            grouped[group] = []
+        grouped[group].append((clean_point, explanation))
     return grouped
 
+@lru_cache(maxsize=1024)
 def get_section_emoji(subtitle):
-    """Get appropriate emoji for section subtitle"""
+    """Get appropriate emoji for section subtitle (memoized: subtitles repeat across responses)"""
     subtitle_lower = subtitle.lower()
     
     if "basic information" in subtitle_lower or "overview" in subtitle_lower:
@@ -1363,8 +1339,9 @@ def get_section_emoji(subtitle):
     else:
         return "📌"
 
+@lru_cache(maxsize=256)
 def get_category_emoji(category):
-    """Get appropriate emoji for category titles"""
+    """Get appropriate emoji for category titles (memoized)"""
     category_lower = category.lower()
     
     if "pricing" in category_lower or "cost" in category_lower or "fee" in category_lower:
@@ -1390,16 +1367,11 @@ def generate_section_summary(subtitle, points):
     """Generate a summary paragraph for a section based on its points"""
     if not points:
         return None
-    
-    # Extract key information from points
-    key_info = []
-    for point, explanation in points:
-        if explanation:
-            key_info.append(f"{point} ({explanation})")
-        else:
-            key_info.append(point)
-    
-    # Generate appropriate summary based on subtitle
+    return get_subtitle_summary(subtitle)
+
+@lru_cache(maxsize=1024)
+def get_subtitle_summary(subtitle):
+    """Summary sentence for a section subtitle (memoized: it depends on the subtitle alone)"""
     subtitle_lower = subtitle.lower()
     
     if "basic information" in subtitle_lower:
@@ -1447,6 +1419,7 @@ def generate_section_summary(subtitle, points):
     else:
         return f"This section provides important information about {subtitle}! 📌💡"
 
+@data_fragment
 def generate_all_equipment_structured(info_feed, user_input):
     """Generate structured information about all equipment."""
     base_info = info_feed.get_base_info('english')
@@ -1468,6 +1441,7 @@ def generate_all_equipment_structured(info_feed, user_input):
     
     return response
 
+@data_fragment
 def generate_all_software_structured(info_feed, user_input):
     """Generate structured information about all software."""
     base_info = info_feed.get_base_info('english')
@@ -1489,4 +1463,18 @@ def generate_all_software_structured(info_feed, user_input):
     
     return response
 
- 
\ No newline at end of file
+# Responses built from info_feed data alone, memoized per data version
+DATA_FRAGMENT_GENERATORS = [
+    generate_all_facilities_pricing, generate_booking_response, generate_all_facilities_structured,
+    generate_all_equipment_structured, generate_all_software_structured
+]
+
+def warm_response_fragments(info_feed):
+    """Build the data-only responses up front so the first "list everything" questions hit the cache"""
+    start = time.time()
+    for generator in DATA_FRAGMENT_GENERATORS:
+        try:
+            generator(info_feed, "")
+        except Exception as e:
+            logger.warning(f"Could not prebuild {generator.__name__}: {e}")
+    logger.info(f"Prebuilt {len(DATA_FRAGMENT_GENERATORS)} response fragments in {time.time() - start:.3f}s")
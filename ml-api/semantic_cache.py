@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Semantic Cache Module for ATL Chatbot
+
+This module caches finished answers by question meaning, so paraphrases
+("how much is the XR lab", "XR lab price") skip response generation:
+- Questions are embedded with the registry's sentence embedder, or a hashed
+  word/character n-gram embedder when sentence-transformers is unavailable
+- Lookups are one matrix-vector product over a NumPy matrix of cached questions
+- A hit also needs the same numbers and names ("room 101" vs "room 102", "Vive Pro" vs
+  "Vive Pro 2"), which embeddings barely tell apart; hashed n-grams need a stricter threshold
+- Least-recently-used eviction, a TTL, and invalidation when the data is reloaded
+- Hit-rate and latency-saved metrics
+"""
+
+import os
+import re
+import time
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("semantic_cache")
+
+# Cached answers (0 disables the cache), cosine similarity needed for a hit, and entry lifetime
+SEMANTIC_CACHE_SIZE = int(os.environ.get("SEMANTIC_CACHE_SIZE", "512"))
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+# Hashed n-grams score one-word edits of long questions above 0.9 and real paraphrases far
+# below it, so without a sentence model only near-verbatim repeats are served
+SEMANTIC_CACHE_HASHING_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_HASHING_THRESHOLD", "0.97"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+
+# Question embedder: "model" (registry sentence embedder) or "hashing" (no model needed)
+SEMANTIC_CACHE_EMBEDDER = os.environ.get("SEMANTIC_CACHE_EMBEDDER", "model")
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+_common_words = None
+
+def key_tokens(question: str) -> frozenset:
+    """Tokens a cache hit must share exactly: numbers and words outside the English dictionary (names)"""
+    global _common_words
+    if _common_words is None:
+        from spell_corrector import load_dictionary
+        _common_words = load_dictionary()
+    return frozenset(
+        token for token in _TOKEN_PATTERN.findall(question.lower())
+        if any(c.isdigit() for c in token) or (token not in _common_words and token.rstrip("s") not in _common_words)
+    )
+
+class HashingEmbedder:
+    """Embeds text as L2-normalised hashed counts of words, word bigrams and character trigrams"""
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_PATTERN.findall(text.lower())
+        features = [f"w:{w}" for w in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            vector[zlib.crc32(feature.encode("utf-8")) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class SentenceEmbedder:
+    """Embeds text with the model registry's sentence-transformers embedder"""
+
+    name = "model"
+
+    @property
+    def model_name(self) -> str:
+        """Checkpoint the registry loads (ATL_EMBEDDING_MODEL)"""
+        from model_manager import EMBEDDING_MODEL_NAME
+        return EMBEDDING_MODEL_NAME
+
+    def embed(self, text: str) -> np.ndarray:
+        from model_registry import model_registry
+        with model_registry.use("embedder") as model:
+            vector = model.encode(text, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vector, dtype=np.float32)
+
+def create_embedder(kind: str = None):
+    """Embedder for `kind`, falling back to hashing when sentence-transformers is missing"""
+    kind = kind or SEMANTIC_CACHE_EMBEDDER
+    if kind == "model":
+        try:
+            import sentence_transformers  # noqa: F401
+            return SentenceEmbedder()
+        except ImportError:
+            logger.info("sentence-transformers not installed, semantic cache uses hashed n-gram embeddings")
+    return HashingEmbedder()
+
+class _CacheEntry:
+    """A cached answer"""
+
+    def __init__(self, question: str, response: Any, mode: str, compute_seconds: float):
+        self.question = question
+        self.key_tokens = key_tokens(question)
+        self.response = response
+        self.mode = mode
+        self.compute_seconds = compute_seconds
+        self.created = time.time()
+        self.hits = 0
+
+class SemanticResponseCache:
+    """
+    Answers keyed by question embedding. Each entry owns a row of a preallocated
+    matrix; a lookup scores every row at once and takes the best one above the threshold.
+    Entries also carry a mode (e.g. model vs rule-based answers) and only match that mode.
+    """
+
+    def __init__(self, capacity: int = None, threshold: float = None, ttl_seconds: float = None, embedder=None):
+        self.capacity = SEMANTIC_CACHE_SIZE if capacity is None else capacity
+        self._threshold = threshold
+        self.ttl_seconds = SEMANTIC_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.embedder = embedder
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "stores": 0, "evictions": 0, "invalidations": 0,
+                       "latency_saved_seconds": 0.0, "lookup_seconds": 0.0}
+        self._reset()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    @property
+    def threshold(self) -> float:
+        """Similarity needed for a hit: the configured one, or the default for the current embedder"""
+        if self._threshold is not None:
+            return self._threshold
+        if isinstance(self.embedder, HashingEmbedder):
+            return SEMANTIC_CACHE_HASHING_THRESHOLD
+        return SEMANTIC_CACHE_THRESHOLD
+
+    def _reset(self):
+        self._matrix = None  # allocated on the first store, once the embedding size is known
+        self._valid = np.zeros(self.capacity, dtype=bool)
+        self._modes = np.empty(self.capacity, dtype=object)
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()  # row -> entry, least recent first
+
+    def _embed(self, question: str) -> np.ndarray:
+        if self.embedder is None:
+            self.embedder = create_embedder()
+        try:
+            return self.embedder.embed(question)
+        except Exception as e:
+            if isinstance(self.embedder, HashingEmbedder):
+                raise
+            # Embedder model unavailable (e.g. offline): switch to hashing for good
+            logger.warning(f"Question embedder failed ({e}), falling back to hashed n-gram embeddings")
+            with self._lock:
+                self.embedder = HashingEmbedder()
+                self._reset()
+            return self.embedder.embed(question)
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        return " ".join(question.lower().split())
+
+    def lookup(self, question: str, mode: str = "default") -> Optional[Any]:
+        """Return the cached answer for a question with the same meaning, or None"""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        vector = self._embed(self._normalize(question))
+        keys = key_tokens(question)
+        threshold = self.threshold
+        with self._lock:
+            self._stats["lookups"] += 1
+            response = None
+            if self._matrix is not None and self._matrix.shape[1] == vector.shape[0] and self._entries:
+                scores = self._matrix @ vector
+                scores[~(self._valid & (self._modes == mode))] = -1.0
+                # Best-scoring entry above the threshold that names the same things
+                candidates = np.flatnonzero(scores >= threshold)
+                row = next((int(r) for r in candidates[np.argsort(-scores[candidates], kind="stable")]
+                            if self._entries[int(r)].key_tokens == keys), None)
+                if row is not None:
+                    entry = self._entries[row]
+                    if time.time() - entry.created > self.ttl_seconds:
+                        self._remove(row)
+                    else:
+                        self._entries.move_to_end(row)
+                        entry.hits += 1
+                        response = entry.response
+            elapsed = time.perf_counter() - start
+            self._stats["lookup_seconds"] += elapsed
+            if response is not None:
+                self._stats["hits"] += 1
+                self._stats["latency_saved_seconds"] += max(entry.compute_seconds - elapsed, 0.0)
+            return response
+
+    def store(self, question: str, response: Any, mode: str = "default", compute_seconds: float = 0.0):
+        """Cache an answer, evicting the least recently used entry when full"""
+        if not self.enabled or not response:
+            return
+        vector = self._embed(self._normalize(question))
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                self._reset()
+                self._matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+            if len(self._entries) >= self.capacity:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+            row = int(np.argmin(self._valid))  # first free row
+            self._matrix[row] = vector
+            self._valid[row] = True
+            self._modes[row] = mode
+            self._entries[row] = _CacheEntry(question, response, mode, compute_seconds)
+            self._stats["stores"] += 1
+
+    def _remove(self, row: int):
+        self._valid[row] = False
+        self._modes[row] = None
+        self._entries.pop(row, None)
+
+    def clear(self):
+        """Drop every entry (e.g. after the underlying data was reloaded)"""
+        with self._lock:
+            self._valid[:] = False
+            self._modes[:] = None
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+        logger.info("Semantic response cache cleared")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate, latency saved and occupancy"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["lookups"]
+        stats["capacity"] = self.capacity
+        stats["threshold"] = self.threshold
+        stats["embedder"] = getattr(self.embedder, "name", SEMANTIC_CACHE_EMBEDDER)
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["latency_saved_seconds"] = round(stats["latency_saved_seconds"], 3)
+        stats["mean_lookup_ms"] = round(stats.pop("lookup_seconds") / lookups * 1000, 3) if lookups else 0.0
+        return stats
+
+# Global cache in front of generate_lightweight_response
+response_cache = SemanticResponseCache()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Spell Corrector Module for ATL Chatbot
+
+This module fixes typos in user questions before any keyword or facility matching:
+- The vocabulary comes from the ATL data (base info, FAQ conversations, RAG chunks)
+- A symmetric-delete (SymSpell) index maps every word's deletions to the word, built once per data load
+- Correcting a word is a handful of hash lookups plus a bounded edit-distance check,
+  independent of the vocabulary size
+- Routing keyword tables are registered into the vocabulary, so typos correct towards them
+- Short words (acronyms like "xr", "hpc"), known words and their inflections are left alone;
+  a general English word list (data/config/english_words.txt) also counts as known, so
+  valid words outside the ATL data ("tours", "movie") are never rewritten into ATL words
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("spell_corrector")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# General English words: known (never corrected) but never suggested
+SPELL_DICTIONARY_PATH = os.environ.get(
+    "SPELL_DICTIONARY_PATH", os.path.join(BASE_DIR, "data", "config", "english_words.txt")
+)
+
+# Largest edit distance corrected (0 disables correction)
+SPELL_CORRECTION_MAX_DISTANCE = int(os.environ.get("SPELL_CORRECTION_MAX_DISTANCE", "2"))
+
+# Only the first characters of a word are indexed (SymSpell's prefix length)
+PREFIX_LENGTH = 7
+
+# Words seen fewer times in the data are known but never suggested (names, URL fragments, typos in the data)
+MIN_SUGGESTION_COUNT = 2
+
+# Registered keywords count as this many occurrences, so they win ties against data words
+KEYWORD_WEIGHT = 10
+
+# Endings stripped before deciding a word is unknown ("classes" is fine if "class" is known)
+INFLECTION_SUFFIXES = ("s", "es", "ed", "ing", "ly", "er", "ers")
+
+_WORD_PATTERN = re.compile(r"[a-z]+")
+_QUERY_WORD_PATTERN = re.compile(r"[A-Za-z]+")
+
+# Keyword tables registered by the routing modules, added to every corrector built afterwards
+_keyword_tables: List = []
+
+def register_keywords(*tables):
+    """Make the words of these keyword tables (dicts/lists/sets of keywords) part of the vocabulary"""
+    _keyword_tables.extend(tables)
+
+def _stems(word: str) -> Iterable[str]:
+    """`word` and the base forms it may be an inflection of ("closing" -> "close", "studies" -> "study")"""
+    yield word
+    for suffix in INFLECTION_SUFFIXES:
+        if word.endswith(suffix) and len(word) > len(suffix) + 1:
+            stem = word[:-len(suffix)]
+            yield stem
+            yield stem + "e"
+            if stem[-1] == stem[-2]:
+                yield stem[:-1]
+            if stem.endswith("i"):
+                yield stem[:-1] + "y"
+
+def load_dictionary(path: str = None) -> Set[str]:
+    """Words of a one-word-per-line list (SPELL_DICTIONARY_PATH by default); empty if it can't be read"""
+    path = path or SPELL_DICTIONARY_PATH
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {line.strip().lower() for line in f if line.strip()}
+    except OSError as e:
+        logger.warning(f"Could not load the spelling dictionary from {path}: {e}")
+        return set()
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """All strings reachable from `word` by deleting up to `distance` characters (including `word`)"""
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - results
+        results |= frontier
+    return results
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance (adjacent transpositions count once), or max_distance + 1 if larger"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+class SymSpellCorrector:
+    """Word-level typo correction against a fixed vocabulary"""
+
+    def __init__(self, max_distance: int = None):
+        self.max_distance = SPELL_CORRECTION_MAX_DISTANCE if max_distance is None else max_distance
+        self.counts: Counter = Counter()
+        self.dictionary: Set[str] = set()
+        self._deletes: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "corrected_queries": 0, "corrected_words": 0}
+        self.build_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_distance > 0 and bool(self.counts)
+
+    def add_text(self, text: str, weight: int = 1):
+        """Count the words of `text` into the vocabulary (call build() afterwards)"""
+        for word in _WORD_PATTERN.findall(text.lower()):
+            self.counts[word] += weight
+
+    def build(self):
+        """Index the deletions of every vocabulary word"""
+        start = time.perf_counter()
+        deletes: Dict[str, List[str]] = {}
+        for word, count in self.counts.items():
+            if count < MIN_SUGGESTION_COUNT:
+                continue
+            for delete in _deletes(word[:PREFIX_LENGTH], self.max_distance):
+                deletes.setdefault(delete, []).append(word)
+        self._deletes = deletes
+        self.build_seconds = time.perf_counter() - start
+        logger.info(f"Spell correction index: {len(self.counts)} words, {len(deletes)} deletes "
+                    f"in {self.build_seconds:.2f}s")
+
+    @staticmethod
+    def allowed_distance(length: int) -> int:
+        """Edits tolerated for a word of this length: none up to 4 letters, 1 up to 8, then 2"""
+        if length <= 4:
+            return 0
+        return 1 if length <= 8 else 2
+
+    def is_known(self, word: str) -> bool:
+        """Whether `word`, or its base form, is in the vocabulary or the English dictionary"""
+        return any(stem in self.counts or stem in self.dictionary for stem in _stems(word))
+
+    def lookup(self, word: str) -> Optional[str]:
+        """Closest vocabulary word to a lowercase `word`, or None (known words return themselves)"""
+        if self.is_known(word):
+            return word
+        max_distance = min(self.max_distance, self.allowed_distance(len(word)))
+        if max_distance == 0:
+            return None
+        best: Optional[Tuple[int, int, str]] = None
+        seen = set()
+        for delete in _deletes(word[:PREFIX_LENGTH], max_distance):
+            for candidate in self._deletes.get(delete, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = edit_distance(word, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                # Closest first, then the most frequent in the ATL data
+                key = (distance, -self.counts[candidate], candidate)
+                if best is None or key < best:
+                    best = key
+        return best[2] if best else None
+
+    def correct(self, text: str) -> str:
+        """Replace misspelled words in `text`, keeping everything else (and capitalisation) as is"""
+        if not self.enabled:
+            return text
+        corrected = 0
+
+        def _fix(match):
+            nonlocal corrected
+            word = match.group(0)
+            lower = word.lower()
+            replacement = self.lookup(lower)
+            if not replacement or replacement == lower:
+                return word
+            corrected += 1
+            return replacement.capitalize() if word[0].isupper() else replacement
+
+        result = _QUERY_WORD_PATTERN.sub(_fix, text)
+        with self._lock:
+            self._stats["queries"] += 1
+            if corrected:
+                self._stats["corrected_queries"] += 1
+                self._stats["corrected_words"] += corrected
+        if corrected:
+            logger.debug(f"Spell-corrected {text!r} -> {result!r}")
+        return result
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["vocabulary"] = len(self.counts)
+        stats["dictionary"] = len(self.dictionary)
+        stats["deletes"] = len(self._deletes)
+        stats["build_seconds"] = round(self.build_seconds, 3)
+        return stats
+
+def _strings(value) -> Iterable[str]:
+    """Every string key and value inside nested JSON data"""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield str(key)
+            yield from _strings(item)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            yield from _strings(item)
+
+def build_spell_corrector(*sources, max_distance: int = None) -> SymSpellCorrector:
+    """
+    Corrector whose vocabulary is every word in the given (nested JSON-like) sources plus
+    registered keywords, with the English dictionary as known words
+    """
+    corrector = SymSpellCorrector(max_distance)
+    if corrector.max_distance <= 0:
+        return corrector
+    corrector.dictionary = load_dictionary()
+    for source in sources:
+        for text in _strings(source):
+            corrector.add_text(text)
+    for table in _keyword_tables:
+        for text in _strings(table):
+            corrector.add_text(text, KEYWORD_WEIGHT)
+    corrector.build()
+    return corrector
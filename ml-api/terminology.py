@@ -11,7 +11,9 @@ in the model's responses according to configurable rules.
 import os
 import json
 import re
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union
+
+from query_parser import ParsedQuery, parse_query
 
 # Default path to the terminology configuration file
 DEFAULT_CONFIG_PATH = os.path.join(
@@ -189,24 +191,18 @@ class TerminologyStandardizer:
         
         return result
     
-    def _detect_language(self, text: str) -> str:
+    def _detect_language(self, text: Union[str, ParsedQuery]) -> str:
         """
         Detect the language of the text.
         
         Args:
-            text (str): Text to detect language from
+            text (str or ParsedQuery): Text to detect language from
             
         Returns:
             str: "zh" for Chinese, "en" for English or other languages
         """
-        # Simple detection: if there are many Chinese characters, consider it Chinese
-        chinese_pattern = re.compile(r'[\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff]')
-        chinese_chars = re.findall(chinese_pattern, text)
-        
-        # If more than 15% of characters are Chinese, consider it Chinese
-        if len(chinese_chars) > len(text) * 0.15:
-            return "zh"
-        return "en"
+        # More than 15% Chinese characters counts as Chinese (computed once per ParsedQuery)
+        return parse_query(text).language
     
     def add_rule(self, language: str, pattern: str, replacement: str) -> bool:
         """
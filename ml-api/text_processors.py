@@ -12,10 +12,13 @@ This module handles text processing utilities including:
 """
 
 import re
-import difflib
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 
+from facility_resolver import normalize_name, get_facility_resolver
+from query_parser import parse_query
+from near_duplicates import group_near_duplicates
+
 # Import terminology standardizer
 try:
     from terminology import TerminologyStandardizer
@@ -35,29 +38,11 @@ def detect_language(text):
 
 def is_non_text_input(user_input):
     """
-    Check if the user input is only numbers or symbols.
-    Returns True only for pure numbers or pure symbols.
+    Check if the user input (a string or ParsedQuery) is only numbers or symbols.
+    Returns True for empty input and for pure numbers and/or symbols.
     All other text (including random letters) goes to general intent.
     """
-    if not user_input or len(user_input.strip()) == 0:
-        return True
-    
-    user_clean = user_input.strip()
-    
-    # Check for pure numbers only
-    if re.match(r'^\d+$', user_clean):
-        return True
-    
-    # Check for pure symbols only (no letters or numbers)
-    if re.match(r'^[^\w\s]+$', user_clean):
-        return True
-    
-    # Check for numbers mixed with symbols only (no letters)
-    if re.match(r'^[\d\W]+$', user_clean) and not re.search(r'[a-zA-Z]', user_clean):
-        return True
-    
-    # Everything else (including random letters, mixed text, etc.) goes to general intent
-    return False
+    return parse_query(user_input).is_non_text
 
 def extract_facility_from_question(user_input):
     """Extract the facility/entity name from natural language questions like 'what is ...', 'tell me about ...', etc."""
@@ -80,29 +65,12 @@ def extract_facility_from_question(user_input):
 
 def normalize_facility_name(name):
     """Normalize facility name for matching (lowercase, remove spaces and special chars)"""
-    import re
-    return re.sub(r'[^a-z0-9]', '', name.lower())
+    return normalize_name(name)
 
 def find_best_facility_match(facilities, user_input):
     """Find the best matching facility name from the facilities dict given the user input."""
-    import difflib
-    norm_input = normalize_facility_name(user_input)
-    facility_names = list(facilities.keys())
-    norm_names = [normalize_facility_name(name) for name in facility_names]
-    # Direct match
-    for i, norm_name in enumerate(norm_names):
-        if norm_input == norm_name:
-            return facility_names[i]
-    # Substring match
-    for i, norm_name in enumerate(norm_names):
-        if norm_input in norm_name or norm_name in norm_input:
-            return facility_names[i]
-    # Fuzzy match
-    match = difflib.get_close_matches(norm_input, norm_names, n=1, cutoff=0.6)
-    if match:
-        idx = norm_names.index(match[0])
-        return facility_names[idx]
-    return None
+    # The resolver index is built once per set of facility names and reused
+    return get_facility_resolver(facilities).resolve(user_input, cutoff=0.6)
 
 def extract_staff_names_from_text(text):
     """Extract staff names from text using regex patterns."""
@@ -197,38 +165,11 @@ def group_similar_points(points):
     if not points:
         return []
     
-    grouped = []
-    used_indices = set()
-    
-    for i, point in enumerate(points):
-        if i in used_indices:
-            continue
-            
-        similar_points = [point]
-        used_indices.add(i)
-        
-        # Find similar points
-        for j, other_point in enumerate(points[i+1:], i+1):
-            if j in used_indices:
-                continue
-                
-            # Check similarity (simple word overlap)
-            point_words = set(point.lower().split())
-            other_words = set(other_point.lower().split())
-            
-            # If significant overlap, group them
-            overlap = len(point_words & other_words)
-            total_unique = len(point_words | other_words)
-            
-            if total_unique > 0 and overlap / total_unique > 0.6:
-                similar_points.append(other_point)
-                used_indices.add(j)
-        
-        # Use the longest/most informative point from the group
-        best_point = max(similar_points, key=len)
-        grouped.append(best_point)
+    # Points sharing more than 60% of their words (Jaccard), found with one matrix product
+    groups = group_near_duplicates(points, threshold=0.6)
     
-    return grouped
+    # Use the longest/most informative point from each group
+    return [max((points[i] for i in group), key=len) for group in groups]
 
 def translate_response(response, target_lang):
     """Simplified translation function - just return the response as-is since we're English-only now."""
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Token Streaming Module for ATL Chatbot
+
+This module forwards model tokens to streaming chat endpoints as they are generated:
+- TokenStream hands text chunks from a generation thread to the event loop
+- The active stream is bound to the worker thread running the response generator
+- Generation calls pick it up through a streamer with the transformers put()/end() protocol
+- Server-Sent Events formatting for the chunks and the final trailer
+- Endpoints check whether the final response still uses the streamed text, and tell
+  clients to discard it when it doesn't (rejected enhancement, structured fallback)
+"""
+
+import json
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger("token_streaming")
+
+_END = object()
+_local = threading.local()
+
+class TokenStream:
+    """Text chunks produced on a worker thread, consumed with `async for` on the event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None):
+        self._loop = loop or asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self.chunks = 0
+        self._parts = []
+
+    def push(self, text: str):
+        """Add a chunk (called from the generation thread)"""
+        self.chunks += 1
+        self._parts.append(text)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, text)
+
+    def kept_in(self, response: str) -> bool:
+        """Whether the final response still contains the streamed text (whitespace aside)"""
+        streamed = " ".join("".join(self._parts).split())
+        return not streamed or streamed in " ".join((response or "").split())
+
+    def close(self):
+        """Mark the end of the stream (called from the generation thread)"""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, _END)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        item = await self._queue.get()
+        if item is _END:
+            raise StopAsyncIteration
+        return item
+
+def run_with_token_stream(stream: TokenStream, fn: Callable, *args, **kwargs) -> Any:
+    """Call fn(*args, **kwargs) with `stream` receiving every token generated on this thread"""
+    _local.stream = stream
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _local.stream = None
+        stream.close()
+
+def get_active_stream():
+    """Get the TokenStream bound to the current thread, if any"""
+    return getattr(_local, "stream", None)
+
+class _TokenStreamForwarder:
+    """
+    Streamer with the transformers put()/end() protocol that decodes tokens and pushes
+    whole words to a TokenStream. The first put() (the prompt) is skipped.
+    """
+
+    def __init__(self, tokenizer, stream: TokenStream):
+        self.tokenizer = tokenizer
+        self.stream = stream
+        self._token_ids = []
+        self._emitted = 0
+        self._prompt_seen = False
+
+    def put(self, value):
+        token_ids = value.tolist() if hasattr(value, "tolist") else list(value)
+        if token_ids and isinstance(token_ids[0], list):
+            token_ids = token_ids[0]
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        self._token_ids.extend(token_ids)
+        text = self.tokenizer.decode(self._token_ids, skip_special_tokens=True)
+        # Hold back a partial word (or an incomplete multi-byte character) until it is finished
+        if text.endswith("\ufffd"):
+            return
+        boundary = max(text.rfind(" "), text.rfind("\n")) + 1
+        if boundary > self._emitted:
+            self.stream.push(text[self._emitted:boundary])
+            self._emitted = boundary
+
+    def end(self):
+        text = self.tokenizer.decode(self._token_ids, skip_special_tokens=True)
+        if len(text) > self._emitted:
+            self.stream.push(text[self._emitted:])
+        self._token_ids = []
+        self._emitted = 0
+        self._prompt_seen = False
+
+def create_streamer(tokenizer):
+    """Create a streamer forwarding to the current thread's TokenStream, or None when not streaming"""
+    stream = get_active_stream()
+    if stream is None:
+        return None
+    return _TokenStreamForwarder(tokenizer, stream)
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -9,7 +9,10 @@ when users ask about specific topics.
 """
 
 import re
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
+
+from keyword_matcher import KeywordAutomaton
+from query_parser import ParsedQuery, parse_query
 
 class WebsiteLinkManager:
     """Manages website links and provides friendly responses with relevant URLs"""
@@ -101,25 +104,20 @@ class WebsiteLinkManager:
                 "description": "Access our high-performance computing resources"
             }
         }
+        # All link keywords compiled once; a query is scanned a single time
+        self._link_matcher = KeywordAutomaton(
+            {link_id: link_info["keywords"] for link_id, link_info in self.website_links.items()}
+        )
     
-    def find_relevant_links(self, user_input: str) -> List[Dict]:
+    def find_relevant_links(self, user_input: Union[str, ParsedQuery]) -> List[Dict]:
         """
-        Find relevant website links based on user input
+        Find relevant website links based on user input (a string or ParsedQuery)
         Returns a list of relevant link information
         """
-        user_lower = user_input.lower()
-        relevant_links = []
-        
-        for link_id, link_info in self.website_links.items():
-            # Check if any keywords match
-            for keyword in link_info["keywords"]:
-                if keyword in user_lower:
-                    relevant_links.append(link_info)
-                    break
-        
-        return relevant_links
+        hits = parse_query(user_input).hits(self._link_matcher)
+        return [link_info for link_id, link_info in self.website_links.items() if link_id in hits]
     
-    def generate_link_response(self, user_input: str) -> Optional[str]:
+    def generate_link_response(self, user_input: Union[str, ParsedQuery]) -> Optional[str]:
         """
         Generate a friendly response with relevant website links
         Returns None if no relevant links found
@@ -160,7 +158,7 @@ class WebsiteLinkManager:
 # Global instance
 website_manager = WebsiteLinkManager()
 
-def add_website_links_to_response(response: str, user_input: str) -> str:
+def add_website_links_to_response(response: str, user_input: Union[str, ParsedQuery]) -> str:
     """
     Add relevant website links to an existing response
     """
@@ -171,7 +169,7 @@ def add_website_links_to_response(response: str, user_input: str) -> str:
     
     return response
 
-def get_website_link_response(user_input: str) -> Optional[str]:
+def get_website_link_response(user_input: Union[str, ParsedQuery]) -> Optional[str]:
     """
     Get a standalone website link response
     """
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Worker Launcher Module for ATL Chatbot
+
+This module serves the API from several worker processes sharing one loaded model:
+- Loads the model and runs the app's startup once, in the master process
+- Forks the uvicorn workers afterwards, so read-only weights are shared copy-on-write
+  (and through the page cache when MODEL_WEIGHT_LOADING=mmap)
+- Restarts workers that exit by forking again, without reloading the model
+
+Usage:
+    python worker_launcher.py main:app --workers 4 --port 8000
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+import importlib
+
+# Add src directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger("worker_launcher")
+
+# The tokenizer is used before forking; its thread pool must not be inherited by the workers
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+# Number of forked server processes
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "2"))
+
+def preload_app(app_path: str, lightweight_mode: bool = True):
+    """Import the app, load the model and run the app's startup handlers before any fork"""
+    module_name, _, attribute = app_path.partition(":")
+    app = getattr(importlib.import_module(module_name), attribute or "app")
+
+    from model_manager import start_background_load, get_model_readiness
+    start = time.time()
+    start_background_load(lightweight_mode=lightweight_mode).join()
+    readiness = get_model_readiness()
+    if readiness["status"] != "ready":
+        logger.error(f"Model preload failed, workers will use the rule-based path: {readiness.get('error')}")
+    else:
+        logger.info(f"Model preloaded in {time.time() - start:.1f}s")
+
+    # Startup handlers (data loading etc.) run here once; workers rerun them against the loaded state
+    asyncio.run(_run_startup_handlers(app))
+    return app
+
+async def _run_startup_handlers(app):
+    """Run the app's on_startup handlers (sync or async)"""
+    for handler in getattr(app.router, "on_startup", []):
+        result = handler()
+        if asyncio.iscoroutine(result):
+            await result
+
+class WorkerLauncher:
+    """Forks uvicorn workers sharing a listening socket and replaces any that exit"""
+
+    def __init__(self, app, sock: socket.socket, workers: int = None, log_level: str = "info"):
+        self.app = app
+        self.sock = sock
+        self.num_workers = max(1, workers or WEB_WORKERS)
+        self.log_level = log_level
+        self.workers = {}  # pid -> fork time
+        self.restarts = 0
+        self._stopping = False
+
+    def spawn(self) -> int:
+        """Fork one worker process"""
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            self._serve()
+            os._exit(0)
+        self.workers[pid] = time.time()
+        logger.info(f"Started worker {pid}")
+        return pid
+
+    def _serve(self):
+        import uvicorn
+        config = uvicorn.Config(self.app, log_level=self.log_level, lifespan="on")
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def stop(self, *_):
+        """Terminate all workers (signal handler in the master)"""
+        self._stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        """Start the workers and supervise them until the master is told to stop"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.num_workers):
+            self.spawn()
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            started = self.workers.pop(pid, None)
+            if started is None or self._stopping:
+                continue
+            uptime = time.time() - started
+            logger.warning(f"Worker {pid} exited with status {status} after {uptime:.0f}s, restarting")
+            self.restarts += 1
+            self.spawn()
+        logger.info("All workers stopped")
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Listening socket shared by all workers"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the ATL Chatbot API from preforked workers")
+    parser.add_argument("app", help="App to serve, as module:attribute (e.g. main:app or api:app)")
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS, help="Number of worker processes")
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)), help="Port to bind")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sock = bind_socket(args.host, args.port)
+    app = preload_app(args.app)
+    WorkerLauncher(app, sock, args.workers).run()
+
+if __name__ == "__main__":
+    main()